@@ -4,15 +4,28 @@ import configparser
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog, Menu, Toplevel
 import threading
+import concurrent.futures
 import time
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from collections import defaultdict, Counter
 import json
 import traceback
 import collections
+import itertools
+import bisect
 import math # For size conversion
 import sys # To get base path for PyInstaller
 import re
+import fnmatch
+import hashlib
+import shutil
+import stat
+import csv
+import gzip
+import io
+import mmap
+import struct
+import sqlite3
 
 # --- Matplotlib Check ---
 try:
@@ -49,16 +62,28 @@ except ImportError:
 try:
     from clouddrive import CloudDriveClient, CloudDriveFileSystem
 except ImportError:
-    # Required dependency missing, inform user and exit
-    print("ERROR: The 'clouddrive' library is not installed. Please install it using: pip install clouddrive")
-    try: # Attempt to show GUI error even if library is missing
-        root_tk_err = tk.Tk()
-        root_tk_err.withdraw()
-        messagebox.showerror("Missing Library", "The 'clouddrive' library is not installed.\nPlease install it using: pip install clouddrive", master=root_tk_err)
-        root_tk_err.destroy()
-    except Exception:
-        pass
-    sys.exit("Required 'clouddrive' library not found.") # Exit cleanly
+    if __name__ == "__main__" and "--benchmark-rules" in sys.argv:
+        CloudDriveClient = CloudDriveFileSystem = None # The headless rule benchmark needs no connection
+    else:
+        # Required dependency missing, inform user and exit
+        print("ERROR: The 'clouddrive' library is not installed. Please install it using: pip install clouddrive")
+        try: # Attempt to show GUI error even if library is missing
+            root_tk_err = tk.Tk()
+            root_tk_err.withdraw()
+            messagebox.showerror("Missing Library", "The 'clouddrive' library is not installed.\nPlease install it using: pip install clouddrive", master=root_tk_err)
+            root_tk_err.destroy()
+        except Exception:
+            pass
+        sys.exit("Required 'clouddrive' library not found.") # Exit cleanly
+
+# --- Optional CloudDrive gRPC message types (used for batched server-side moves) ---
+try:
+    from clouddrive.proto import CloudDrive_pb2
+except ImportError:
+    try:
+        from clouddrive import CloudDrive_pb2
+    except ImportError:
+        CloudDrive_pb2 = None # Quarantine falls back to one fs.move per file
 
 
 # --- Function to get resource path for PyInstaller ---
@@ -84,8 +109,39 @@ VIDEO_EXTENSIONS = {
 CONFIG_FILE = resource_path("config.ini")
 LANG_PREF_FILE = resource_path("lang_pref.json")
 ICON_FILE = resource_path("app_icon.ico") # Path for icon
+DELETION_JOURNAL_DIR = resource_path("deletion_journals") # Write-ahead plans for resumable deletion
+SNAPSHOT_DIR = resource_path("snapshots") # Binary scan snapshots saved after every scan
+SNAPSHOT_EXTENSION = ".ddsnap"
+SNAPSHOT_KEEP_COUNT = 20 # Automatic scan snapshots kept in SNAPSHOT_DIR (oldest are removed)
+# How a duplicate set differs from a compared snapshot
+SET_CHANGE_NEW = "new" # Not a duplicate set in the snapshot
+SET_CHANGE_GROWN = "grown" # Has paths the snapshot's set did not have
+SET_CHANGE_SHRUNK = "shrunk" # Only lost paths since the snapshot
+SET_CHANGE_RESOLVED = "resolved" # Duplicate set in the snapshot, no longer one now
 
 DEFAULT_API_ADDRESS = "127.0.0.1:19798"
+# Where scanned files live: the CloudDrive2 API, or local/mounted folders below the Mount Point
+BACKEND_CLOUDDRIVE = "clouddrive2"
+BACKEND_LOCAL = "local"
+# Several connections in one scan: the [config] connection plus one [source <name>] section per extra
+# connection. Paths are then tagged with their source as a top-level folder: /@<name>/Movies/a.mkv
+SOURCE_SECTION_PREFIX = "source "
+SOURCE_TAG_PREFIX = "/@"
+DEFAULT_SOURCE_NAME = "main"
+# CloudDrive2 'fileHashes' keys (hash kinds); other kinds are shown by number. Hashes shorter than
+# the minimum length (default HASH_MIN_LENGTH_DEFAULT) are too weak to identify a file and are ignored.
+HASH_KIND_SHA1 = "2"
+HASH_KIND_NAMES = {"1": "MD5", HASH_KIND_SHA1: "SHA1", "3": "PikPak"}
+HASH_MIN_LENGTHS = {"1": 32, HASH_KIND_SHA1: 40}
+HASH_MIN_LENGTH_DEFAULT = 32
+HASH_CONTENT_DIGESTS = {HASH_KIND_SHA1: hashlib.sha1, "1": hashlib.md5} # Hash kinds that can be computed from file contents
+# Content hashing for files the backend has no SHA1 for (backends that can read file bytes)
+HASH_CHUNK_BYTES = 1 << 20 # Read size for streamed hashing
+HASH_PARTIAL_BYTES = 4 << 20 # Partial fingerprint: size + this many bytes from the start and from the end
+HASH_MAX_WORKERS = max(2, min(8, os.cpu_count() or 2))
+# Remote files: small head/middle/tail samples keep fingerprinting bandwidth low; reads are network-bound
+REMOTE_FINGERPRINT_BYTES = 64 * 1024
+REMOTE_READ_MAX_WORKERS = 8
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S" # For display format
 DEFAULT_LANG = "en"
 # Rule constants for deletion logic
@@ -94,6 +150,62 @@ RULE_KEEP_LONGEST = "longest"
 RULE_KEEP_OLDEST = "oldest"
 RULE_KEEP_NEWEST = "newest"
 RULE_KEEP_SUFFIX = "suffix"
+RULE_KEEP_CUSTOM = "custom" # Ordered KeepPolicy chain typed by the user
+DEFAULT_KEEP_POLICY = "suffix:.mkv > newest > shortest"
+# Treeview population is time-sliced so the main loop stays responsive
+POPULATE_SLICE_SECONDS = 0.04 # Max time spent inserting rows per scheduled chunk
+POPULATE_RESCHEDULE_MS = 1 # Delay before the next chunk (lets Tk process events)
+RENDER_BATCH_SIZE = 256 # Rows redrawn between time checks when re-rendering changed actions
+RULE_ARGUMENT_APPLY_DELAY_MS = 400 # Re-apply the suffix/policy rule once typing pauses this long
+# Language-independent action codes stored in the results model (also used as Treeview tags)
+ACTION_KEEP = "keep"
+ACTION_DELETE = "delete"
+# Deletion runs through a bounded worker pool; progress is logged at most once per interval
+DELETE_MAX_WORKERS = 8
+DELETE_PROGRESS_INTERVAL_SECONDS = 2.0
+# Report export: sets formatted per buffered write, and the file buffer size
+REPORT_SETS_PER_WRITE = 2000
+REPORT_WRITE_BUFFER_BYTES = 1 << 20
+REPORT_CSV_COLUMNS = ("set", "sha1", "file_count", "path", "modified", "size_bytes", "hashes") # sha1/hashes: the file's own
+# Offline scans from a directory-tree dump: accepted column/key names per field (case-insensitive, first match wins)
+DUMP_FIELD_NAMES = {
+    "path": ("path", "file_path", "filepath", "full_path", "fullpathname"),
+    "size": ("size", "size_bytes", "file_size", "length"),
+    "sha1": ("sha1", "sha1_hash", "hash"),
+    "hashes": ("hashes", "file_hashes"), # 'SHA1:<value>;MD5:<value>' as in the .csv report
+    "modified": ("modified", "writetime", "mtime", "modified_time", "last_modified"),
+}
+DUMP_READ_CHUNK_CHARS = 1 << 20 # JSON dumps are decoded from chunks of this size
+DUMP_MAX_VALUE_CHARS = 16 << 20 # A JSON value still undecodable at this length is treated as malformed
+DUMP_PROGRESS_INTERVAL = 100000 # Records between progress messages
+# Near-duplicate candidates: videos with different hashes whose names (reduced to title tokens) and sizes suggest
+# the same content, e.g. another encode or container. Candidate pairs come from an inverted index on
+# (title token, size bucket), never from comparing all pairs.
+NEAR_DUP_TITLE_SIMILARITY = 0.6 # Name match: min Jaccard similarity of the title tokens...
+NEAR_DUP_SIZE_BAND_RATIO = 4.0 # ...for files at most this many times larger than each other
+NEAR_DUP_SIZE_TOLERANCE = 0.005 # Size match: sizes within 0.5% of each other...
+NEAR_DUP_SIZE_TITLE_SIMILARITY = 0.4 # ...with at least this title similarity
+NEAR_DUP_MAX_DISPLAY_GROUPS = 5000 # Largest candidate groups shown in the Similar Videos tab
+NEAR_DUP_TOKEN_PATTERN = re.compile(r"[0-9a-z]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+# Release tags that say nothing about the title (resolution, codecs, sources, audio, languages); removed before tokenizing
+NEAR_DUP_NOISE_TOKENS = (
+    "bluray", "bdrip", "brrip", "bd", "webrip", "webdl", "web", "dl", "hdtv", "dvdrip", "dvd", "remux", "hevc",
+    "avc", "xvid", "divx", "sdr", "dv", "uhd", "fhd", "hd", "proper", "repack", "extended", "unrated",
+    "remastered", "internal", "limited", "multi", "dual", "audio", "sub", "subs", "chs", "cht", "eng", "www", "com",
+)
+NEAR_DUP_NOISE_PATTERN = re.compile(
+    r"(?<![0-9a-z])(?:\d{3,4}[pi]|[248]k|[xh][._ ]?26[45]|\d{1,2}bits?|hdr(?:10)?(?:plus)?|"
+    # Audio codecs with their channel tag, as in scene names: 'DDP5.1', 'AAC2.0', 'TrueHD.7.1', 'DTS-HD.MA.5.1'
+    r"(?:e?ac3|aac|ddp?|dts(?:[-._ ]?(?:hd|x))?(?:[-._ ]?ma)?|truehd|atmos|flac|opus|mp3)(?:[-._ ]?[2-7][._ ]?[01]|\d*)|"
+    + "|".join(NEAR_DUP_NOISE_TOKENS) + r")(?![0-9a-z])"
+    r"|(?<![0-9.])[2-7][._ ][01](?![0-9])") # Standalone audio channels: '5.1', '2.0'
+NEAR_DUP_GROUP_SUFFIX_PATTERN = re.compile(r"-[0-9a-z]+$") # Release group after the tags: '...x264-SPARKS'
+NEAR_MATCH_NAME = "name" # Near-duplicate pair found by title similarity
+NEAR_MATCH_SIZE = "size" # ... by nearly equal size (plus a weaker title similarity)
+# What a removal run does with the files marked Delete
+REMOVAL_DELETE = "delete"
+REMOVAL_QUARANTINE = "quarantine" # Server-side move into the quarantine folder
+DEFAULT_QUARANTINE_PATH = "/dedup_quarantine"
 
 # --- Translations ---
 translations = {
@@ -121,6 +233,11 @@ translations = {
         "rule_newest": "Keep newest file (Modified Date)",
         "rule_keep_suffix": "Keep file path ending with suffix:",
         "rule_suffix_entry_label": "Suffix:",
+        "rule_custom": "Keep by custom policy (first criterion wins):",
+        "rule_policy_entry_label": "Policy:",
+        "delete_policy_missing": "A keep policy is required for the custom rule, e.g. 'suffix:.mkv > newest > shortest'.",
+        "error_policy_invalid": "Invalid keep policy: {error}",
+        "summary_policy_miss": "Note: {count} set(s) had no file satisfying '{criterion}'; later criteria decided.",
         "tree_rule_action_col": "Action",
         "tree_path_col": "File Path",
         "tree_modified_col": "Modified",
@@ -137,6 +254,54 @@ translations = {
         "menu_language": "Language",
         "menu_english": "English",
         "menu_chinese": "中文",
+        "menu_file": "File",
+        "menu_open_snapshot": "Open Snapshot...",
+        "menu_save_snapshot": "Save Snapshot As...",
+        "menu_snapshot_inventory": "Include All Scanned Files in Scan Snapshots",
+        "snapshot_saved": "Snapshot saved: {file} ({sets} sets, {files} files).",
+        "snapshot_save_error": "Could not save snapshot {file}: {error}",
+        "snapshot_loading": "Loading snapshot {file}...",
+        "snapshot_loaded": "Snapshot {file} (taken {created}) loaded: {sets} duplicate sets.",
+        "snapshot_load_error": "Could not open snapshot {file}: {error}",
+        "snapshot_filetype": "Scan snapshots",
+        "menu_compare_snapshot": "Compare with Snapshot...",
+        "menu_show_changes_only": "Show Only New or Changed Sets",
+        "menu_scan_dump": "Scan Directory Dump (Offline)...",
+        "menu_local_backend": "Scan Local Folders Instead of CloudDrive2",
+        "hash_stage_start": "Hashing file contents: {candidates} of {total} file(s) without SHA1 share a size with another file...",
+        "hash_stage_done": "Content hashing done in {duration:.2f} seconds: {partial} partial fingerprint(s), {full} full hash(es), {errors} read error(s).",
+        "hash_read_error": "Could not read '{path}' for hashing: {error}",
+        "near_dup_tab_duplicates": "Duplicates",
+        "near_dup_tab_similar": "Similar Videos",
+        "find_similar_button": "Find Similar Videos",
+        "tree_group_col": "Group",
+        "tree_match_col": "Match",
+        "near_dup_match_name": "Name {percent}%",
+        "near_dup_match_size": "Size",
+        "near_dup_match_both": "Name {percent}% + Size",
+        "near_dup_no_inventory": "Run a scan first: similar videos are searched among the files of the last scan.",
+        "near_dup_start": "Searching {count} videos (one per distinct hash) for similar names and sizes...",
+        "near_dup_done": "Found {groups} group(s) of similar videos ({files} files) in {duration:.2f} seconds.",
+        "near_dup_display_limit": "Showing the {count} largest groups of similar videos.",
+        "near_dup_error": "Error while searching for similar videos: {error}",
+        "storage_backend_changed": "Storage switched to {backend}. Click 'Test Connection' to connect.",
+        "error_input_missing_local": "The Mount Point (local base folder) is required to scan local folders.",
+        "status_local_connect_success": "Local folder '{root}' is accessible.",
+        "error_local_root": "Local folder '{root}' is not accessible: {error}",
+        "error_source_connect": "Could not connect source '{name}': {error}",
+        "error_source_names": "Source names must be unique: {names}",
+        "status_sources_connected": "Connected {count} sources: {names}. Paths are shown as /@<source>/...",
+        "status_sources_loaded": "Loaded {count} additional source(s) from the config: {names}.",
+        "warning_source_invalid": "Ignoring config section [{section}]: {reason}",
+        "find_sources_concurrent": "Scanning {count} sources concurrently...",
+        "dump_filetype": "Directory dumps (JSON, JSON Lines, CSV)",
+        "dump_scan_starting": "Reading directory dump {file} (offline, no CloudDrive2 calls)...",
+        "dump_scan_progress": "Dump {file}: read {count} records... Found {video_count} videos.",
+        "dump_scan_summary": "Dump {file} read in {duration:.2f} seconds: {count} records, {video_count} videos, {sha1_skips} without SHA1, {invalid} invalid.",
+        "dump_scan_error": "Could not read directory dump {file}: {error}",
+        "snapshot_comparing": "Comparing current results with snapshot {file}...",
+        "snapshot_compare_done": "Compared with {file}: {new} new, {grown} grown, {shrunk} shrunk, {unchanged} unchanged and {resolved} resolved set(s).",
+        "status_showing_changes": "Showing {shown} of {total} duplicate sets (new or changed since the compared snapshot).",
         "status_loading_config": "Loading config from {file}...",
         "status_saving_config": "Saving config to {file}...",
         "status_config_loaded": "Config loaded.",
@@ -152,6 +317,10 @@ translations = {
         # "status_filter_complete": "Filtering complete. {count} sets remaining.",
         "status_populating_tree": "Populating list with {count} duplicate sets...",
         "status_tree_populated": "Results list populated.",
+        "status_preparing_rows": "Preparing {count} duplicate sets for display...",
+        "status_populate_progress": "Loading results: {done}/{total} files",
+        "status_populate_aborted": "Loading stopped by user. {done} of {total} files shown.",
+        "abort_populate_button": "Stop Loading",
         "status_clearing_tree": "Clearing results list and rule selection...",
         "status_applying_rule": "Applying suggestion rule '{rule_name}' to {count} sets...",
         "status_rule_applied": "Rule suggestion applied. {delete_count} files initially marked for deletion. Click 'Action' column to change.",
@@ -166,7 +335,7 @@ translations = {
         "find_error_processing_path": "Error processing scan path '{path}': {error}. Skipping this path.", # Added
         "delete_starting_selected": "Starting deletion of manually marked files...",
         "delete_finished": "Deletion complete. Attempted to delete {total_marked} files. Successfully deleted {deleted_count}.",
-        "delete_results_cleared": "Deletion process finished. Results list cleared, please re-scan if needed.", # Added completion message
+        "delete_results_updated": "Results updated: removed {removed} file(s); {sets} set(s) no longer have duplicates. {failed} failed file(s) remain highlighted.",
         "delete_error_during": "Error during deletion process: {error}",
         "delete_error_file": "Error deleting {path}: {error}",
         "delete_cancelled": "Deletion cancelled by user.",
@@ -183,6 +352,10 @@ translations = {
         "save_report_error": "Error saving report to {file}: {error}",
         # <<< ADJUSTED: Save report message slightly >>>
         "save_report_no_data": "No duplicate sets found to save.",
+        "save_report_progress": "Exporting {done}/{total} sets",
+        "save_report_starting": "Exporting {count} duplicate sets to {file}...",
+        "save_report_cancelled": "Report export cancelled; partial file removed.",
+        "abort_export_button": "Stop Export",
         "error_title": "Error",
         "error_input_title": "Input Error",
         "error_config_title": "Config Error",
@@ -229,34 +402,78 @@ translations = {
         "status_scan_finished_duration": "Scan for path '{path}' finished in {duration:.2f} seconds.",
         "status_scan_summary_items": "Path '{path}': Total items encountered: {count}. Video files processed: {video_count}.",
         "status_scan_warnings": "Path '{path}': WARNING: {details}.",
-        "warning_hash_missing": "Warning: Hash data missing in attributes for '{path}'. KeyError: {key_error}. Skipping.",
-        "warning_hash_short": "Warning: Suspiciously short SHA1 hash ('{hash}') found for '{path}'. Skipping.",
         "warning_size_invalid": "Warning: Invalid size value '{size}' for {path}. Using 0.",
         "status_delete_attempting": "Attempting to delete {count} marked files...",
-        "status_deleting_file": "Deleting [{current}/{total}]: {path}",
+        "status_verify_start": "Verifying {sets} duplicate set(s) ({count} files) against the cloud before removal...",
+        "status_verify_done": "Verification done: {ok} file(s) confirmed, {skipped} file(s) skipped because their set changed since the scan.",
+        "verify_reason_keep": "kept copy is missing or no longer matches (SHA1/size)",
+        "verify_reason_changed": "file is missing or no longer matches its set (SHA1/size)",
+        "verify_skipped_file": "Skipped {path}: {reason}",
+        "status_delete_whole_folders": "{count} folder(s) contain only files marked 'Delete' and will be removed with one call each.",
+        "status_empty_folders_removed": "Removed {count} empty folder(s).",
+        "status_delete_progress": "Deleting... {done}/{total} processed, {failed} failed, {freed_mb:.2f} MB freed.",
+        "delete_stopped": "Deletion stopped: {done} of {total} files processed. Use 'Resume Deletion' to continue.",
+        "status_delete_stopping": "Stopping deletion once the files in progress finish...",
+        "status_delete_progress_short": "Deleting {done}/{total}",
+        "abort_delete_button": "Stop Deleting",
+        "resume_delete_button": "Resume Deletion",
+        "status_journal_created": "Deletion plan written to {file} ({sets} sets, {count} files).",
+        "error_journal_write": "Could not write the deletion plan file: {error}\nDeletion cancelled.",
+        "resume_no_journal": "No unfinished deletion plan found.",
+        "resume_confirm_title": "Resume Deletion",
+        "resume_confirm_msg": "Unfinished deletion plan from {created}:\n{remaining} of {total} files still to delete.\n\nYes: resume deleting them.\nNo: discard this plan.\nCancel: do nothing.",
+        "status_resume_starting": "Resuming deletion plan {file}: {remaining} file(s) remaining.",
+        "status_journal_discarded": "Deletion plan {file} discarded.",
+        "status_journal_complete": "Deletion plan {file} completed.",
+        "quarantine_path_label": "Quarantine Folder (cloud path):",
+        "inventory_db_label": "Inventory Database (optional .sqlite3 file):",
+        "inventory_db_written": "Scan inventory written to {file} ({count} files).",
+        "inventory_db_error": "Inventory database error ({file}): {error}. Continuing the scan without it.",
+        "quarantine_button": "Move Marked to Quarantine",
+        "purge_quarantine_button": "Purge Quarantine",
+        "quarantine_confirm_title": "Confirm Quarantine",
+        "quarantine_confirm_msg": "Move all files marked 'Delete' into the quarantine folder '{path}'?\nThey can be restored from there until the quarantine is purged.",
+        "quarantine_missing_path": "Set a quarantine folder first.",
+        "error_quarantine_path_root": "The quarantine folder cannot be the drive root ('{path}').",
+        "error_quarantine_path_overlap": "The quarantine folder '{path}' overlaps the scan path '{root}'. Choose a folder outside the scanned folders.",
+        "move_error_file": "Error moving {path}: {error}",
+        "quarantine_starting": "Starting to move marked files into quarantine '{path}'...",
+        "status_quarantine_progress": "Quarantining... {done}/{total} processed, {failed} failed.",
+        "quarantine_finished": "Quarantine complete. Moved {moved_count} of {total} files to '{path}'.",
+        "warning_quarantine_failures": "WARNING: Failed to move {count} file(s):",
+        "warning_batch_move_failed": "Batch move into '{dest}' failed ({error}); moving files one by one.",
+        "purge_confirm_title": "Purge Quarantine",
+        "purge_confirm_msg": "Permanently delete the quarantine folder '{path}' and everything in it?\nTHIS ACTION CANNOT BE UNDONE.",
+        "status_purging": "Purging quarantine folder '{path}'...",
+        "purge_finished": "Quarantine folder '{path}' purged.",
+        "error_purge": "Could not purge quarantine folder '{path}': {error}",
         "warning_delete_failures": "WARNING: Failed to delete {count} file(s):",
         "warning_delete_failures_more": "  ... and {count} more.",
         "status_delete_no_files": "No files provided for deletion.",
-        "warning_tie_break": "{prefix} {reason}. Kept '{filename}' ({detail})",
-        "warning_rule_no_date": "Warning: {set_id} - Cannot apply suggestion '{rule}': No valid dates. Defaulting to shortest path.",
-        "warning_rule_no_suffix_match": "Warning: {set_id} - No files match suffix '{suffix}'. Defaulting to shortest path.",
-        "warning_rule_failed_selection": "Internal Warning: {set_id} - Rule '{rule}' failed to select file to keep. Skipping suggestion for this set.",
-        "error_rule_application": "Error applying suggestion rule '{rule}' to {set_id}: {error}. Skipping suggestion for this set.",
+        "summary_tie_break": "{prefix} {count} set(s) had several equally ranked files; kept the shortest path in each.",
+        "summary_rule_no_date": "Warning: {count} set(s) have no valid dates for suggestion '{rule}'. Defaulted to shortest path.",
+        "summary_rule_no_suffix_match": "Warning: {count} set(s) have no file matching suffix '{suffix}'. Defaulted to shortest path.",
+        "status_rule_cache_hit": "Reusing previously computed suggestion for '{rule_name}'.",
         "log_debug_calc_path": "[Debug] Calculated effective cloud scan path: '{fs_path}' from Scan='{scan_raw}', Mount='{mount_raw}'",
         "log_debug_process_video": "[Debug] Processing Video: {path}",
         "log_debug_attrs_received": "[Debug] Attrs received for {filename}: {attrs}",
-        "log_debug_raw_sha1": "[Debug] Raw SHA1 value (key '2'): {sha1}",
-        "log_debug_invalid_sha1_type": "[Debug] Invalid SHA1: Not a string ('{sha1}') for {path}. Skipping.",
-        "log_debug_invalid_sha1_empty": "[Debug] Invalid SHA1: Empty string for {path}. Skipping.",
-        "log_debug_standardized_sha1": "[Debug] Standardized SHA1: {sha1}",
-        "log_debug_hash_missing_or_invalid": "[Debug] 'fileHashes' or key '2' missing or hash invalid for {path}. SHA1 is None.",
         "log_debug_skipping_no_sha1": "[Debug] SKIPPING file {filename} due to missing or invalid SHA1.",
         "log_debug_storing_info": "[Debug] Storing file info for {filename} with SHA1: {sha1}",
         "log_debug_merging_results": "[Debug] Merging results from path '{path}'. Current total sets: {count}.",
+        "log_debug_rule_evaluated": "[Debug] Rule evaluated in {duration:.2f}s; {count} row(s) changed.",
         "select_scan_path_dialog_title": "Select Root Directory to Scan",
         "error_no_scan_paths_added": "Error: No scan paths have been added. Please add at least one path.",
         "scan_path_already_exists": "Path '{path}' already exists in the list.",
         "info_last_keep_in_set": "Info: Cannot mark '{filename}' for deletion as it's the only file marked 'Keep' in Set {set_id}.",
+        "ctx_mark_folder_delete": "Mark Everything Under Folder as Delete",
+        "ctx_mark_folder_keep": "Mark Everything Under Folder as Keep",
+        "ctx_folder_entry": "{folder}  ({count} files)",
+        "ctx_apply_rule_selected": "Apply Current Rule to Selected Sets ({count})",
+        "status_folder_marked": "Marked {count} file(s) under '{folder}' as {action}; {changed} row(s) changed.",
+        "info_folder_whole_set": "Info: {count} set(s) lie entirely under '{folder}'; one file in each stays 'Keep'.",
+        "info_folder_multiple_keep": "Info: {count} set(s) have several files under '{folder}'; kept the shortest path in each.",
+        "status_rule_applied_selected": "Applied '{rule_name}' to {sets} selected set(s); {changed} row(s) changed.",
+        "info_select_rule_first": "Select a suggestion rule first.",
         # <<< NEW: Translations for Delete Type Selection Dialog >>>
         "delete_type_dialog_title": "Select File Types to Delete",
         "delete_type_dialog_instruction": "Select the types of files you want to permanently delete from those marked 'Delete':",
@@ -296,6 +513,11 @@ translations = {
         "rule_newest": "保留最新的文件 (修改日期)",
         "rule_keep_suffix": "保留路径以此后缀结尾的文件:",
         "rule_suffix_entry_label": "后缀:",
+        "rule_custom": "按自定义策略保留 (靠前的条件优先):",
+        "rule_policy_entry_label": "策略:",
+        "delete_policy_missing": "自定义规则需要填写保留策略，例如 'suffix:.mkv > newest > shortest'。",
+        "error_policy_invalid": "保留策略无效：{error}",
+        "summary_policy_miss": "提示：{count} 个集合中没有文件满足 '{criterion}'；由后续条件决定。",
         "tree_rule_action_col": "操作",
         "tree_path_col": "文件路径",
         "tree_modified_col": "修改时间",
@@ -310,6 +532,54 @@ translations = {
         "show_chart_button_disabled": "显示图表 (需安装 matplotlib)",
         "log_title": "日志",
         "menu_language": "语言",
+        "menu_file": "文件",
+        "menu_open_snapshot": "打开快照...",
+        "menu_save_snapshot": "快照另存为...",
+        "menu_snapshot_inventory": "扫描快照中包含所有已扫描文件",
+        "snapshot_saved": "快照已保存：{file}（{sets} 组，{files} 个文件）。",
+        "snapshot_save_error": "无法保存快照 {file}：{error}",
+        "snapshot_loading": "正在加载快照 {file}...",
+        "snapshot_loaded": "快照 {file}（拍摄于 {created}）已加载：{sets} 组重复文件。",
+        "snapshot_load_error": "无法打开快照 {file}：{error}",
+        "snapshot_filetype": "扫描快照",
+        "menu_compare_snapshot": "与快照比较...",
+        "menu_show_changes_only": "仅显示新增或变化的组",
+        "menu_scan_dump": "扫描目录导出文件 (离线)...",
+        "menu_local_backend": "扫描本地文件夹而非 CloudDrive2",
+        "hash_stage_start": "正在计算文件内容哈希：{total} 个无 SHA1 的文件中有 {candidates} 个与其他文件大小相同...",
+        "hash_stage_done": "内容哈希完成，用时 {duration:.2f} 秒：{partial} 个部分指纹，{full} 个完整哈希，{errors} 个读取错误。",
+        "hash_read_error": "无法读取 '{path}' 以计算哈希：{error}",
+        "near_dup_tab_duplicates": "重复文件",
+        "near_dup_tab_similar": "相似视频",
+        "find_similar_button": "查找相似视频",
+        "tree_group_col": "组",
+        "tree_match_col": "匹配",
+        "near_dup_match_name": "名称 {percent}%",
+        "near_dup_match_size": "大小",
+        "near_dup_match_both": "名称 {percent}% + 大小",
+        "near_dup_no_inventory": "请先扫描：相似视频在上次扫描的文件中查找。",
+        "near_dup_start": "正在 {count} 个视频（每个不同哈希一个）中查找名称和大小相似的文件...",
+        "near_dup_done": "找到 {groups} 组相似视频（{files} 个文件），用时 {duration:.2f} 秒。",
+        "near_dup_display_limit": "仅显示最大的 {count} 组相似视频。",
+        "near_dup_error": "查找相似视频时出错：{error}",
+        "storage_backend_changed": "存储已切换为 {backend}。请点击“测试连接”进行连接。",
+        "error_input_missing_local": "扫描本地文件夹需要填写挂载点 (本地根文件夹)。",
+        "status_local_connect_success": "本地文件夹 '{root}' 可以访问。",
+        "error_local_root": "无法访问本地文件夹 '{root}'：{error}",
+        "error_source_connect": "无法连接来源 '{name}'：{error}",
+        "error_source_names": "来源名称不能重复：{names}",
+        "status_sources_connected": "已连接 {count} 个来源：{names}。路径显示为 /@<来源>/...",
+        "status_sources_loaded": "已从配置中加载 {count} 个额外来源：{names}。",
+        "warning_source_invalid": "忽略配置节 [{section}]：{reason}",
+        "find_sources_concurrent": "正在并行扫描 {count} 个来源...",
+        "dump_filetype": "目录导出文件 (JSON, JSON Lines, CSV)",
+        "dump_scan_starting": "正在读取目录导出文件 {file}（离线，不调用 CloudDrive2）...",
+        "dump_scan_progress": "导出文件 {file}：已读取 {count} 条记录... 找到 {video_count} 个视频。",
+        "dump_scan_summary": "导出文件 {file} 读取完成，用时 {duration:.2f} 秒：{count} 条记录，{video_count} 个视频，{sha1_skips} 个无 SHA1，{invalid} 个无效。",
+        "dump_scan_error": "无法读取目录导出文件 {file}：{error}",
+        "snapshot_comparing": "正在将当前结果与快照 {file} 比较...",
+        "snapshot_compare_done": "与 {file} 比较：新增 {new} 组，增多 {grown} 组，减少 {shrunk} 组，未变 {unchanged} 组，已解决 {resolved} 组。",
+        "status_showing_changes": "显示 {total} 组重复文件中的 {shown} 组（自所比较的快照以来新增或变化的组）。",
         "menu_english": "English",
         "menu_chinese": "中文",
         "status_loading_config": "正在从 {file} 加载配置...",
@@ -327,6 +597,10 @@ translations = {
         # "status_filter_complete": "筛选完成。剩余 {count} 个集合。",
         "status_populating_tree": "正在使用 {count} 个重复集合填充列表...",
         "status_tree_populated": "结果列表已填充。",
+        "status_preparing_rows": "正在准备显示 {count} 个重复集合...",
+        "status_populate_progress": "正在加载结果: {done}/{total} 个文件",
+        "status_populate_aborted": "用户已停止加载。已显示 {done}/{total} 个文件。",
+        "abort_populate_button": "停止加载",
         "status_clearing_tree": "正在清除结果列表和规则选择...",
         "status_applying_rule": "正在对 {count} 个集合应用建议规则 '{rule_name}'...",
         "status_rule_applied": "规则建议已应用。初始有 {delete_count} 个文件被标记为删除。点击'操作'列进行更改。",
@@ -341,7 +615,7 @@ translations = {
         "find_error_processing_path": "处理扫描路径 '{path}' 时出错: {error}。正在跳过此路径。", # 新增
         "delete_starting_selected": "开始删除手动标记的文件...",
         "delete_finished": "删除完成。尝试删除 {total_marked} 个文件。成功删除了 {deleted_count} 个。",
-        "delete_results_cleared": "删除过程结束。结果列表已清除，如需请重新扫描。",
+        "delete_results_updated": "结果已更新：移除 {removed} 个文件；{sets} 组不再有重复。{failed} 个失败的文件仍保持高亮。",
         "delete_error_during": "删除过程中出错: {error}",
         "delete_error_file": "删除 {path} 时出错: {error}",
         "delete_cancelled": "用户取消了删除操作。",
@@ -358,6 +632,10 @@ translations = {
         "save_report_error": "保存报告到 {file} 时出错: {error}",
          # <<< ADJUSTED: Save report message slightly >>>
         "save_report_no_data": "未找到可保存的重复文件集合。",
+        "save_report_progress": "正在导出 {done}/{total} 组",
+        "save_report_starting": "正在将 {count} 组重复文件导出到 {file}...",
+        "save_report_cancelled": "报告导出已取消；已删除不完整的文件。",
+        "abort_export_button": "停止导出",
         "error_title": "错误",
         "error_input_title": "输入错误",
         "error_config_title": "配置错误",
@@ -404,34 +682,78 @@ translations = {
         "status_scan_finished_duration": "路径 '{path}' 的扫描耗时 {duration:.2f} 秒完成。",
         "status_scan_summary_items": "路径 '{path}': 共遇到 {count} 个项目。已处理 {video_count} 个视频文件。",
         "status_scan_warnings": "路径 '{path}': 警告: {details}。",
-        "warning_hash_missing": "警告：'{path}' 的属性中缺少哈希数据。KeyError: {key_error}。正在跳过。",
-        "warning_hash_short": "警告：为 '{path}' 找到了可疑的短 SHA1 哈希 ('{hash}')。正在跳过。",
         "warning_size_invalid": "警告：{path} 的大小值 '{size}' 无效。使用 0。",
         "status_delete_attempting": "正在尝试删除 {count} 个标记的文件...",
-        "status_deleting_file": "正在删除 [{current}/{total}]: {path}",
+        "status_verify_start": "删除前正在向云端核对 {sets} 组重复文件（{count} 个文件）...",
+        "status_verify_done": "核对完成：{ok} 个文件已确认，{skipped} 个文件因所在组自扫描后发生变化而跳过。",
+        "verify_reason_keep": "保留的副本已不存在或不再匹配 (SHA1/大小)",
+        "verify_reason_changed": "文件已不存在或不再与其所在组匹配 (SHA1/大小)",
+        "verify_skipped_file": "已跳过 {path}：{reason}",
+        "status_delete_whole_folders": "{count} 个文件夹中只包含标记为“删除”的文件，每个将通过一次调用整体删除。",
+        "status_empty_folders_removed": "已删除 {count} 个空文件夹。",
+        "status_delete_progress": "正在删除... 已处理 {done}/{total}，失败 {failed}，已释放 {freed_mb:.2f} MB。",
+        "delete_stopped": "删除已停止：已处理 {total} 个文件中的 {done} 个。使用“继续删除”以继续。",
+        "status_delete_stopping": "正在处理中的文件完成后将停止删除...",
+        "status_delete_progress_short": "正在删除 {done}/{total}",
+        "abort_delete_button": "停止删除",
+        "resume_delete_button": "继续删除",
+        "status_journal_created": "删除计划已写入 {file} ({sets} 个集合，{count} 个文件)。",
+        "error_journal_write": "无法写入删除计划文件：{error}\n删除已取消。",
+        "resume_no_journal": "没有找到未完成的删除计划。",
+        "resume_confirm_title": "继续删除",
+        "resume_confirm_msg": "来自 {created} 的未完成删除计划：\n{total} 个文件中还有 {remaining} 个待删除。\n\n是：继续删除。\n否：放弃此计划。\n取消：不执行任何操作。",
+        "status_resume_starting": "继续执行删除计划 {file}：剩余 {remaining} 个文件。",
+        "status_journal_discarded": "删除计划 {file} 已放弃。",
+        "status_journal_complete": "删除计划 {file} 已完成。",
+        "quarantine_path_label": "隔离文件夹 (云端路径):",
+        "inventory_db_label": "清单数据库 (可选 .sqlite3 文件):",
+        "inventory_db_written": "扫描清单已写入 {file}（{count} 个文件）。",
+        "inventory_db_error": "清单数据库错误 ({file})：{error}。扫描将在不写入数据库的情况下继续。",
+        "quarantine_button": "将标记文件移入隔离区",
+        "purge_quarantine_button": "清空隔离区",
+        "quarantine_confirm_title": "确认隔离",
+        "quarantine_confirm_msg": "将所有标记为“删除”的文件移动到隔离文件夹 '{path}'？\n在清空隔离区之前，可以从那里恢复这些文件。",
+        "quarantine_missing_path": "请先设置隔离文件夹。",
+        "error_quarantine_path_root": "隔离文件夹不能是驱动器根目录 ('{path}')。",
+        "error_quarantine_path_overlap": "隔离文件夹 '{path}' 与扫描路径 '{root}' 重叠。请选择扫描文件夹之外的文件夹。",
+        "move_error_file": "移动 {path} 时出错: {error}",
+        "quarantine_starting": "开始将标记的文件移入隔离区 '{path}'...",
+        "status_quarantine_progress": "正在隔离... 已处理 {done}/{total}，失败 {failed}。",
+        "quarantine_finished": "隔离完成。已将 {total} 个文件中的 {moved_count} 个移动到 '{path}'。",
+        "warning_quarantine_failures": "警告：无法移动 {count} 个文件：",
+        "warning_batch_move_failed": "批量移动到 '{dest}' 失败 ({error})；改为逐个移动文件。",
+        "purge_confirm_title": "清空隔离区",
+        "purge_confirm_msg": "永久删除隔离文件夹 '{path}' 及其中的所有内容？\n此操作无法撤销。",
+        "status_purging": "正在清空隔离文件夹 '{path}'...",
+        "purge_finished": "隔离文件夹 '{path}' 已清空。",
+        "error_purge": "无法清空隔离文件夹 '{path}'：{error}",
         "warning_delete_failures": "警告：未能删除 {count} 个文件：",
         "warning_delete_failures_more": "  ... 以及另外 {count} 个。",
         "status_delete_no_files": "没有提供用于删除的文件。",
-        "warning_tie_break": "{prefix} {reason}。保留了 '{filename}' ({detail})",
-        "warning_rule_no_date": "警告：{set_id} - 无法应用建议 '{rule}'：无有效日期。将默认为最短路径。",
-        "warning_rule_no_suffix_match": "警告：{set_id} - 没有文件匹配后缀 '{suffix}'。将默认为最短路径。",
-        "warning_rule_failed_selection": "内部警告：{set_id} - 规则 '{rule}' 未能选择要保留的文件。跳过此集合的建议。",
-        "error_rule_application": "将建议规则 '{rule}' 应用于 {set_id} 时出错：{error}。跳过此集合的建议。",
+        "summary_tie_break": "{prefix} {count} 个集合中有多个同等排名的文件；已在每个集合中保留路径最短的文件。",
+        "summary_rule_no_date": "警告：{count} 个集合没有可用于建议 '{rule}' 的有效日期。已默认为最短路径。",
+        "summary_rule_no_suffix_match": "警告：{count} 个集合中没有文件匹配后缀 '{suffix}'。已默认为最短路径。",
+        "status_rule_cache_hit": "复用之前为 '{rule_name}' 计算的建议结果。",
         "log_debug_calc_path": "[调试] 根据 Scan='{scan_raw}', Mount='{mount_raw}' 计算出的有效云扫描路径: '{fs_path}'",
         "log_debug_process_video": "[调试] 正在处理视频文件: {path}",
         "log_debug_attrs_received": "[调试] 收到 {filename} 的属性: {attrs}",
-        "log_debug_raw_sha1": "[调试] 原始 SHA1 值 (键 '2'): {sha1}",
-        "log_debug_invalid_sha1_type": "[调试] 无效 SHA1: 不是字符串 ('{sha1}')，路径: {path}。正在跳过。",
-        "log_debug_invalid_sha1_empty": "[调试] 无效 SHA1: 空字符串，路径: {path}。正在跳过。",
-        "log_debug_standardized_sha1": "[调试] 标准化 SHA1: {sha1}",
-        "log_debug_hash_missing_or_invalid": "[调试] 路径 {path} 的 'fileHashes' 或键 '2' 缺失，或哈希无效。SHA1 为 None。",
         "log_debug_skipping_no_sha1": "[调试] 因 SHA1 缺失或无效，正在跳过文件 {filename}。",
         "log_debug_storing_info": "[调试] 正在存储文件 {filename} 的信息，SHA1 为: {sha1}",
         "log_debug_merging_results": "[调试] 正在合并路径 '{path}' 的结果。当前总集合数: {count}。",
+        "log_debug_rule_evaluated": "[调试] 规则评估用时 {duration:.2f} 秒；{count} 行已更改。",
         "select_scan_path_dialog_title": "选择要扫描的根目录",
         "error_no_scan_paths_added": "错误：尚未添加扫描路径。请至少添加一个路径。",
         "scan_path_already_exists": "路径 '{path}' 已存在于列表中。",
         "info_last_keep_in_set": "提示：无法将 '{filename}' 标记为删除，因为它是集合 {set_id} 中唯一标记为“保留”的文件。",
+        "ctx_mark_folder_delete": "将此文件夹下的所有文件标记为删除",
+        "ctx_mark_folder_keep": "将此文件夹下的所有文件标记为保留",
+        "ctx_folder_entry": "{folder}  ({count} 个文件)",
+        "ctx_apply_rule_selected": "仅对选中的集合应用当前规则 ({count})",
+        "status_folder_marked": "已将 '{folder}' 下的 {count} 个文件标记为{action}；{changed} 行已更改。",
+        "info_folder_whole_set": "提示：{count} 个集合完全位于 '{folder}' 下；每个集合中保留一个文件。",
+        "info_folder_multiple_keep": "提示：{count} 个集合在 '{folder}' 下有多个文件；每个集合中保留路径最短的文件。",
+        "status_rule_applied_selected": "已对 {sets} 个选中的集合应用 '{rule_name}'；{changed} 行已更改。",
+        "info_select_rule_first": "请先选择一个建议规则。",
         # <<< NEW: Translations for Delete Type Selection Dialog >>>
         "delete_type_dialog_title": "选择要删除的文件类型",
         "delete_type_dialog_instruction": "请从业已标记为“删除”的文件中，勾选您希望永久删除的文件类型:",
@@ -570,6 +892,915 @@ def _parse_datetime(date_string):
     # Warning is handled by the caller function now
     return None
 
+def _extract_hashes(attrs):
+    """ Returns {hash kind: upper-case value} for every usable hash in a CloudDrive attr() result's 'fileHashes'. """
+    file_hashes = attrs.get('fileHashes') if isinstance(attrs, dict) else None
+    if not isinstance(file_hashes, dict): return {}
+    hashes = {}
+    for kind, value in file_hashes.items():
+        kind = str(kind)
+        if isinstance(value, str) and len(value.strip()) >= HASH_MIN_LENGTHS.get(kind, HASH_MIN_LENGTH_DEFAULT):
+            hashes[kind] = value.strip().upper()
+    return hashes
+
+def _hash_kind_name(kind):
+    return HASH_KIND_NAMES.get(kind, f"Hash {kind}")
+
+def _hashes_of_set_key(set_key):
+    """ The hash a set key stands for: {kind: value} from '<KIND>:<value>' keys, else the key as SHA1. """
+    kind_name, separator, value = (set_key or "").partition(':')
+    if separator:
+        for kind, name in HASH_KIND_NAMES.items():
+            if name == kind_name: return {kind: value}
+        if kind_name.startswith("Hash "): return {kind_name[5:]: value}
+    return {HASH_KIND_SHA1: (set_key or "").upper()}
+
+def _hashes_agree(current, expected):
+    """ True if two {kind: value} dicts share at least one hash kind and agree on every shared kind. """
+    shared = current.keys() & expected.keys()
+    return bool(shared) and all(current[kind] == expected[kind] for kind in shared)
+
+def _format_hashes(hashes):
+    """ A file's own hashes as text, SHA1 first: 'SHA1:<value>;MD5:<value>' (read back by _parse_hashes). """
+    ordered = sorted(hashes.items(), key=lambda kind_value: (kind_value[0] != HASH_KIND_SHA1, kind_value[0]))
+    return ";".join(f"{_hash_kind_name(kind)}:{value}" for kind, value in ordered)
+
+def _parse_hashes(text):
+    """ {kind: upper-case value} from _format_hashes text or a set key; a bare value counts as SHA1. Short values are ignored. """
+    hashes = {}
+    for token in (text or "").split(";"):
+        for kind, value in _hashes_of_set_key(token.strip()).items():
+            value = value.strip().upper()
+            if len(value) >= HASH_MIN_LENGTHS.get(kind, HASH_MIN_LENGTH_DEFAULT): hashes[kind] = value
+    return hashes
+
+def _content_digests(kinds):
+    """ New hashlib objects for SHA1 plus every kind in `kinds` that HASH_CONTENT_DIGESTS can compute. """
+    return {kind: HASH_CONTENT_DIGESTS[kind]() for kind in {HASH_KIND_SHA1, *kinds} if kind in HASH_CONTENT_DIGESTS}
+
+def _group_by_hashes(file_infos):
+    """
+    Groups files linked by any shared hash, using union-find over (hash kind, value) pairs, so
+    copies are found even when the provider exposes different hash kinds for them (e.g. one copy
+    with SHA1 and MD5, another with MD5 only). Each file_info needs 'hashes' ({kind: value}).
+    Files are first grouped by their first hash; only files carrying several hashes add unions,
+    so the usual single-hash scan costs no more than a plain dictionary grouping.
+    Returns {set key: [file_info, ...]} for every group, singletons included. The key is the
+    group's SHA1 when a member has one, else '<KIND>:<value>'. Each file_info gets the key in
+    'set_key' and, in 'hash_kind', the kinds that link its set (e.g. 'SHA1', 'MD5' or 'SHA1+MD5');
+    its own 'sha1' and 'hashes' are left as scanned.
+    """
+    parent = {} # (kind, value) -> parent pair; only hashes of multi-hash files take part
+    def find(node):
+        root = node
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while node != root: # Path compression
+            parent[node], node = root, parent[node]
+        return root
+    by_first_hash = defaultdict(list)
+    for info in file_infos:
+        kind_values = iter(info['hashes'].items())
+        first = next(kind_values)
+        by_first_hash[first].append(info)
+        for other in kind_values:
+            root, other_root = find(first), find(other)
+            if root != other_root: parent[other_root] = root
+    if parent:
+        merged = defaultdict(list)
+        for kind_value, infos in by_first_hash.items():
+            merged[find(kind_value)].extend(infos)
+        member_lists = merged.values()
+    else:
+        member_lists = by_first_hash.values()
+
+    kind_order = [HASH_KIND_SHA1] + [kind for kind in HASH_KIND_NAMES if kind != HASH_KIND_SHA1] # SHA1 first
+    kind_rank = lambda kind: (kind_order.index(kind) if kind in kind_order else len(kind_order), kind)
+    kind_labels = {} # frozenset of kinds -> 'SHA1+MD5'
+    def kinds_label(kinds):
+        kinds = frozenset(kinds)
+        label = kind_labels.get(kinds)
+        if label is None:
+            label = kind_labels[kinds] = "+".join(_hash_kind_name(kind) for kind in sorted(kinds, key=kind_rank))
+        return label
+    sha1_label = kinds_label((HASH_KIND_SHA1,))
+    groups = {}
+    for infos in member_lists:
+        hashes = infos[0]['hashes']
+        if len(hashes) == 1 and (len(infos) == 1 or all(info['hashes'] == hashes for info in infos)): # Usual case: one shared hash
+            (kind, value), = hashes.items()
+            if kind == HASH_KIND_SHA1:
+                set_key, hash_kind = value, sha1_label
+            else:
+                set_key, hash_kind = f"{_hash_kind_name(kind)}:{value}", kinds_label(hashes)
+        else:
+            hash_counts = Counter(kind_value for info in infos for kind_value in info['hashes'].items())
+            sha1s = [value for (kind, value) in hash_counts if kind == HASH_KIND_SHA1]
+            if sha1s:
+                set_key = min(sha1s)
+            else:
+                kind, value = min(hash_counts, key=lambda kind_value: (kind_rank(kind_value[0]), kind_value[1]))
+                set_key = f"{_hash_kind_name(kind)}:{value}"
+            hash_kind = kinds_label({kind for (kind, _value), count in hash_counts.items() if count > 1} or
+                                    {kind for kind, _value in hash_counts})
+        for info in infos:
+            info['set_key'] = set_key
+            info['hash_kind'] = hash_kind
+        groups[set_key] = infos
+    return groups
+
+def _extract_size(attrs):
+    """ Returns the size from a CloudDrive attr() result as int, or None if missing/invalid. """
+    try:
+        return int(attrs.get('size'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# --- Keep Policy Engine ---
+class FolderRuleMatcher:
+    """
+    Prioritized keep:/delete: folder rules, compiled once and matched per path.
+    Plain folder prefixes ("/115/Library") go into a path-component trie; glob
+    ("*/Temp/*") and regex ("re:...") patterns are combined into a single regex
+    with one named group per rule. When several rules match a path, the one listed
+    first wins. Ranks: keep rules first (in order), then unmatched paths, then
+    delete rules (the first delete rule ranks last).
+    """
+    _RULE_INDEX = None # Trie node key holding the rule index that ends at this folder
+
+    def __init__(self, rules):
+        self.rules = tuple(rules) # Tuple of (action 'keep'/'delete', pattern)
+        self._trie = {}
+        self._regex_group_rules = {} # Named regex group -> rule index
+        regex_parts = []
+        for idx, (action, pattern) in enumerate(self.rules):
+            if pattern.startswith("re:"):
+                if self._has_numbered_reference(pattern[3:]):
+                    raise ValueError(f"Folder pattern '{pattern}' refers to a group by number; "
+                                     f"use a named group (?P<name>...) and (?P=name) instead.")
+                group = f"r{idx}"
+                regex_parts.append(f"(?P<{group}>.*?(?:{pattern[3:]}))") # Anchored match behaves like search
+                self._regex_group_rules[group] = idx
+            elif any(ch in pattern for ch in "*?["):
+                group = f"r{idx}"
+                glob_regex = fnmatch.translate(pattern.replace("\\", "/"))
+                regex_parts.append(f"(?P<{group}>{glob_regex})")
+                self._regex_group_rules[group] = idx
+            else:
+                node = self._trie
+                for component in self._folder_components(pattern):
+                    node = node.setdefault(component, {})
+                node.setdefault(self._RULE_INDEX, idx) # Keep the earlier rule if a folder is listed twice
+        try:
+            self._regex = re.compile("|".join(regex_parts), re.DOTALL) if regex_parts else None
+        except re.error as e:
+            raise ValueError(f"Invalid folder pattern: {e}") from e
+
+        keep_indexes = [idx for idx, (action, _) in enumerate(self.rules) if action == "keep"]
+        delete_indexes = [idx for idx, (action, _) in enumerate(self.rules) if action == "delete"]
+        self.unmatched_rank = len(keep_indexes)
+        self._rank_of_rule = {}
+        for order, idx in enumerate(keep_indexes):
+            self._rank_of_rule[idx] = order
+        for order, idx in enumerate(delete_indexes):
+            self._rank_of_rule[idx] = len(keep_indexes) + len(delete_indexes) - order
+
+    @staticmethod
+    def _has_numbered_reference(pattern):
+        """
+        True if a regex refers to a group by number (\\1 or (?(1)...)). Each rule is wrapped in its own
+        group inside the combined regex, so those numbers would point at the wrong group.
+        """
+        in_class, i = False, 0
+        while i < len(pattern):
+            ch = pattern[i]
+            if ch == "\\":
+                following = pattern[i + 1:i + 4]
+                is_octal = len(following) == 3 and following[0] in "0123" and all(c in "01234567" for c in following)
+                if not in_class and following[:1] in tuple("123456789") and not is_octal: return True
+                i += 2
+                continue
+            if in_class:
+                if ch == "]": in_class = False
+            elif ch == "[":
+                in_class = True
+                i += 1
+                if pattern[i:i + 1] == "^": i += 1
+                if pattern[i:i + 1] == "]": i += 1 # A ']' right after '[' or '[^' is literal
+                continue
+            elif pattern.startswith("(?(", i) and pattern[i + 3:i + 4].isdigit():
+                return True
+            i += 1
+        return False
+
+    @staticmethod
+    def _folder_components(folder):
+        folder = folder.replace("\\", "/").rstrip("/")
+        if not folder.startswith("/"): folder = "/" + folder
+        return folder.split("/")
+
+    @property
+    def spec_tokens(self):
+        return [f"{action}:{pattern}" for action, pattern in self.rules]
+
+    def _trie_rule(self, directory):
+        """ Returns the first-listed prefix rule covering `directory` (None if no prefix matches). """
+        node, best = self._trie, None
+        rule_key = self._RULE_INDEX
+        for component in directory.split("/"):
+            node = node.get(component)
+            if node is None: break
+            idx = node.get(rule_key)
+            if idx is not None and (best is None or idx < best):
+                best = idx
+        return best
+
+    def rank_column(self, paths):
+        """ One rank per path. Prefix lookups are cached per directory, so each folder is walked once. """
+        dir_cache = {}
+        regex_match = self._regex.match if self._regex else None
+        regex_group_rules = self._regex_group_rules
+        rank_of_rule, unmatched = self._rank_of_rule, self.unmatched_rank
+        ranks = []
+        for path in paths:
+            directory = path.rpartition("/")[0]
+            rule = dir_cache.get(directory, -1)
+            if rule == -1:
+                rule = dir_cache[directory] = self._trie_rule(directory)
+            if regex_match is not None:
+                m = regex_match(path)
+                if m is not None:
+                    regex_rule = regex_group_rules.get(m.lastgroup)
+                    if regex_rule is None: # lastgroup can name a group inside a user regex
+                        regex_rule = next(regex_group_rules[g] for g, v in m.groupdict().items() if v is not None and g in regex_group_rules)
+                    if rule is None or regex_rule < rule:
+                        rule = regex_rule
+            ranks.append(unmatched if rule is None else rank_of_rule[rule])
+        return ranks
+
+
+class KeepPolicy:
+    """
+    An ordered chain of keep criteria, e.g. "keep:/115/Library > delete:/115/Downloads > suffix:.mkv > newest".
+    Consecutive keep:/delete: tokens form one "folders" criterion (see FolderRuleMatcher).
+    Each criterion maps every file to a rank (lower is better); the file kept in a
+    set is the one with the smallest (rank_1, ..., rank_n, len(path), path) key, so
+    remaining ties always fall back to the shortest path, as the original rules did.
+    Ranks are computed column-wise over all files of all sets in one pass.
+    """
+    SEPARATOR = ">"
+    # Only a '>' with whitespace on both sides separates criteria, so regex folder rules may contain '>'
+    _SEPARATOR_PATTERN = re.compile(r"\s+>\s+")
+    # name -> whether the criterion needs an argument after ':'
+    CRITERIA = {
+        "suffix": True,
+        "newest": False,
+        "oldest": False,
+        "shortest": False,
+        "longest": False,
+        "keep": True,
+        "delete": True,
+    }
+    FOLDER_ACTIONS = ("keep", "delete")
+    # Rank given to files a criterion cannot judge (no date, suffix mismatch)
+    MISS = math.inf
+
+    def __init__(self, criteria):
+        self.criteria = tuple(criteria) # Tuple of (name, argument or None)
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Parses a policy string such as "suffix:.mkv > newest > shortest" (criteria separated by " > ").
+        Raises: ValueError if the string is empty or names an unknown criterion.
+        """
+        criteria = []
+        for token in cls._SEPARATOR_PATTERN.split(f" {spec or ''} "):
+            token = token.strip()
+            if not token: continue
+            name, _, argument = token.partition(":")
+            name = name.strip().lower()
+            argument = argument.strip()
+            if name not in cls.CRITERIA:
+                raise ValueError(f"Unknown keep criterion '{name}'. Known: {', '.join(cls.CRITERIA)}.")
+            if cls.CRITERIA[name] and not argument:
+                example = "/115/Library" if name in cls.FOLDER_ACTIONS else ".mkv"
+                raise ValueError(f"Keep criterion '{name}' needs a value, e.g. '{name}:{example}'.")
+            if name in cls.FOLDER_ACTIONS:
+                # Group consecutive folder rules so their list order is their priority
+                if criteria and isinstance(criteria[-1][1], list):
+                    criteria[-1][1].append((name, argument))
+                else:
+                    criteria.append(("folders", [(name, argument)]))
+                continue
+            criteria.append((name, argument or None))
+        if not criteria:
+            raise ValueError("Keep policy is empty.")
+        return cls((name, FolderRuleMatcher(arg)) if name == "folders" else (name, arg) for name, arg in criteria)
+
+    @classmethod
+    def for_rule(cls, rule, suffix_value=None):
+        """ Builds the policy equivalent to one of the built-in RULE_KEEP_* suggestions. """
+        if rule == RULE_KEEP_SUFFIX:
+            return cls([("suffix", suffix_value)])
+        if rule in (RULE_KEEP_SHORTEST, RULE_KEEP_LONGEST, RULE_KEEP_OLDEST, RULE_KEEP_NEWEST):
+            return cls([(rule, None)])
+        raise ValueError(f"Internal Error: Unknown deletion rule '{rule}'.")
+
+    @property
+    def spec(self):
+        tokens = []
+        for name, arg in self.criteria:
+            if isinstance(arg, FolderRuleMatcher): tokens.extend(arg.spec_tokens)
+            else: tokens.append(f"{name}:{arg}" if arg else name)
+        return f" {self.SEPARATOR} ".join(tokens)
+
+    def __repr__(self):
+        return f"KeepPolicy({self.spec!r})"
+
+    def _rank_column(self, name, argument, paths, file_infos, columns):
+        """ Returns one rank per file for a criterion. `columns` caches shared inputs (timestamps, lowered paths). """
+        if name == "shortest":
+            return [len(p) for p in paths]
+        if name == "longest":
+            return [-len(p) for p in paths]
+        if name in ("oldest", "newest"):
+            if "timestamps" not in columns:
+                columns["timestamps"] = [f['modified'].timestamp() if isinstance(f.get('modified'), datetime) else None
+                                         for f in file_infos]
+            miss, sign = self.MISS, (1 if name == "oldest" else -1)
+            return [miss if ts is None else sign * ts for ts in columns["timestamps"]]
+        if name == "suffix":
+            if "lower_paths" not in columns:
+                columns["lower_paths"] = [p.lower() for p in paths]
+            suffix_lower, miss = argument.lower(), self.MISS
+            return [0 if p.endswith(suffix_lower) else miss for p in columns["lower_paths"]]
+        if name == "folders":
+            return argument.rank_column(paths)
+        raise ValueError(f"Unknown keep criterion '{name}'.")
+
+    def select(self, duplicate_sets):
+        """
+        Evaluates the policy against {sha1: [FileInfo, ...]}.
+        Returns: (list of paths to delete, Counter of summary stats)
+                 Stats: 'tie' - sets where several files shared the best rank,
+                        'miss:<criterion>' - sets where no file satisfied that criterion.
+        """
+        stats = Counter()
+        # Flatten all sets into columns; set k owns rows bounds[k]:bounds[k+1]
+        file_infos, bounds = [], [0]
+        for files_in_set in duplicate_sets.values():
+            if not isinstance(files_in_set, list) or len(files_in_set) < 2: continue
+            file_infos.extend(f for f in files_in_set if isinstance(f, dict) and f.get('path'))
+            if len(file_infos) > bounds[-1]:
+                bounds.append(len(file_infos))
+        if not file_infos:
+            return [], stats
+        paths = [f['path'] for f in file_infos]
+
+        columns = {}
+        rank_columns = [self._rank_column(name, arg, paths, file_infos, columns) for name, arg in self.criteria]
+        ranks = list(zip(*rank_columns)) # One rank tuple per file
+        # Full sort key per file; the trailing row index identifies the winner of min()
+        keys = list(zip(ranks, map(len, paths), paths, range(len(paths))))
+        criterion_names = [name for name, _ in self.criteria]
+        miss = self.MISS
+        criterion_count = len(criterion_names)
+
+        files_to_delete = []
+        for start, end in zip(bounds, bounds[1:]):
+            best_rank, _, keep_path, _ = min(keys[start:end])
+            if miss in best_rank:
+                set_ranks = ranks[start:end]
+                for idx, name in enumerate(criterion_names):
+                    if best_rank[idx] == miss and all(r[idx] == miss for r in set_ranks):
+                        stats[f"miss:{name}"] += 1
+            if ranks[start:end].count(best_rank) > 1 and best_rank.count(miss) != criterion_count:
+                stats['tie'] += 1
+            files_to_delete += [p for p in paths[start:end] if p != keep_path]
+        return files_to_delete, stats
+
+
+def benchmark_keep_policies(set_count, files_per_set=3, specs=None):
+    """
+    Headless benchmark: evaluates keep policies over `set_count` synthetic duplicate sets
+    and prints the time taken by each. Used by the --benchmark-rules command line option.
+    """
+    specs = specs or ["shortest", "longest", "oldest", "newest", "suffix:.mkv", "suffix:.mkv > newest > shortest",
+                      "keep:/bench/dir1 > delete:/bench/dir2 > delete:*/sub/sub/* > newest"]
+    extensions = sorted(VIDEO_EXTENSIONS)
+    base_time = datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp()
+    print(f"Building {set_count} synthetic sets of {files_per_set} files...")
+    duplicate_sets = {}
+    for set_idx in range(set_count):
+        duplicate_sets[f"{set_idx:040x}"] = [
+            {'path': f"/bench/dir{(set_idx + i) % 97}/{'sub/' * i}file{set_idx}{extensions[(set_idx + i) % len(extensions)]}",
+             'modified': datetime.fromtimestamp(base_time + (set_idx * 7 + i * 3600) % 86400000, timezone.utc) if (set_idx + i) % 50 else None,
+             'size': 1024 * 1024}
+            for i in range(files_per_set)]
+    for spec in specs:
+        policy = KeepPolicy.parse(spec)
+        start_time = time.perf_counter()
+        files_to_delete, stats = policy.select(duplicate_sets)
+        elapsed = time.perf_counter() - start_time
+        print(f"{policy.spec:<40} {elapsed:8.3f}s  {len(files_to_delete)} to delete  {dict(stats)}")
+# --- End of Keep Policy Engine ---
+
+
+# --- Near-Duplicate Candidates ---
+def _title_tokens(path):
+    """
+    Reduces a file name to its title tokens: lower-case words and numbers without the extension,
+    release tags (NEAR_DUP_NOISE_*) and, in release names, the trailing group. CJK runs become
+    character bigrams, as they have no word breaks.
+    """
+    name, tag_count = NEAR_DUP_NOISE_PATTERN.subn(" ", os.path.splitext(path.rpartition('/')[2])[0].lower())
+    if tag_count: name = NEAR_DUP_GROUP_SUFFIX_PATTERN.sub("", name) # Only release names carry a group suffix
+    runs = NEAR_DUP_TOKEN_PATTERN.findall(name)
+    if name.isascii(): return frozenset(runs)
+    tokens = set()
+    for run in runs:
+        if run[0] < '\u3040' or len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return frozenset(tokens)
+
+def find_near_duplicate_groups(inventory):
+    """
+    Finds groups of probably identical videos with different hashes in `inventory` (files by hash,
+    as in DuplicateFileFinder.last_inventory). Each hash counts once, represented by its first file.
+    Two hashes are linked when
+      - NEAR_MATCH_NAME: their title tokens have Jaccard similarity >= NEAR_DUP_TITLE_SIMILARITY
+        and their sizes differ by at most NEAR_DUP_SIZE_BAND_RATIO, or
+      - NEAR_MATCH_SIZE: their sizes differ by at most NEAR_DUP_SIZE_TOLERANCE and the titles still
+        reach NEAR_DUP_SIZE_TITLE_SIMILARITY,
+    and in both cases the numbers in the names (year, episode, part) are the same.
+    Candidate pairs come from an inverted index on title tokens per (size bucket, numbers) with prefix
+    filtering: tokens are ordered rarest first, and two token sets reaching similarity t must share one
+    of the first len - ceil(t * len) + 1 tokens of each, so only those are indexed. Linked hashes are
+    merged with union-find.
+    Returns [{'files': [...], 'match': NEAR_MATCH_NAME/NEAR_MATCH_SIZE/both joined by '+',
+    'similarity': best title similarity}], largest total size first.
+    """
+    node_files, token_sets, numbers, sizes = [], [], [], []
+    for files in inventory.values():
+        if not files: continue
+        size = files[0].get('size')
+        if not size: continue # Size 0/unknown: nothing to compare
+        tokens = _title_tokens(files[0]['path'])
+        if not tokens: continue
+        node_files.append(files)
+        token_sets.append(tokens)
+        numbers.append(frozenset(token for token in tokens if not token.isalpha()))
+        sizes.append(size)
+    document_frequency = Counter(itertools.chain.from_iterable(token_sets))
+    # One global order (rarest first, ties by token) so that prefixes of different nodes are comparable
+    rank = {token: index for index, token in enumerate(sorted(document_frequency, key=lambda token: (document_frequency[token], token)))}
+    rarest_first = [sorted(tokens, key=rank.__getitem__) for tokens in token_sets]
+
+    parent = list(range(len(node_files)))
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+    pairs = [] # (node, other, match, similarity)
+
+    def link_similar(buckets, threshold, max_ratio, match):
+        """ One indexing pass: links nodes in the same or a neighbouring bucket whose titles reach `threshold`. """
+        postings = {} # (bucket, numbers) -> {token: nodes indexed so far}
+        for node, tokens in enumerate(rarest_first):
+            token_set, bucket, size, node_numbers = token_sets[node], buckets[node], sizes[node], numbers[node]
+            token_count = len(tokens)
+            prefix = tokens[:token_count - math.ceil(threshold * token_count) + 1]
+            candidates = set()
+            for neighbour in (bucket - 1, bucket, bucket + 1):
+                index = postings.get((neighbour, node_numbers))
+                if index:
+                    for token in prefix:
+                        posting = index.get(token)
+                        if posting: candidates.update(posting)
+            min_count, max_count = threshold * token_count, token_count / threshold # Jaccard bound on the other set's size
+            for other in candidates:
+                other_set, other_size = token_sets[other], sizes[other]
+                if not min_count <= len(other_set) <= max_count or size > other_size * max_ratio or other_size > size * max_ratio: continue
+                common = len(token_set & other_set)
+                similarity = common / (token_count + len(other_set) - common)
+                if similarity >= threshold:
+                    pairs.append((node, other, match, similarity))
+                    root, other_root = find(node), find(other)
+                    if root != other_root: parent[root] = other_root
+            index = postings.get((bucket, node_numbers))
+            if index is None: index = postings[(bucket, node_numbers)] = {}
+            for token in prefix:
+                posting = index.get(token)
+                if posting is None: index[token] = [node]
+                else: posting.append(node)
+
+    # Buckets as wide as the allowed size ratio, so any match lies in the same or a neighbouring bucket
+    band_log = math.log(NEAR_DUP_SIZE_BAND_RATIO)
+    link_similar([int(math.log(size) / band_log) for size in sizes], NEAR_DUP_TITLE_SIMILARITY, NEAR_DUP_SIZE_BAND_RATIO, NEAR_MATCH_NAME)
+    tolerance_log = math.log1p(NEAR_DUP_SIZE_TOLERANCE)
+    link_similar([int(math.log(size) / tolerance_log) for size in sizes], NEAR_DUP_SIZE_TITLE_SIMILARITY, 1 + NEAR_DUP_SIZE_TOLERANCE, NEAR_MATCH_SIZE)
+
+    members = defaultdict(list)
+    for node in {node for pair in pairs for node in pair[:2]}:
+        members[find(node)].append(node)
+    matches, best_similarity = defaultdict(set), defaultdict(float)
+    for node, _other, match, similarity in pairs:
+        root = find(node)
+        matches[root].add(match)
+        best_similarity[root] = max(best_similarity[root], similarity)
+    groups = []
+    for root, nodes in members.items():
+        files = [file_info for node in sorted(nodes) for file_info in node_files[node]]
+        groups.append({'files': files, 'match': "+".join(m for m in (NEAR_MATCH_NAME, NEAR_MATCH_SIZE) if m in matches[root]),
+                       'similarity': best_similarity[root]})
+    groups.sort(key=lambda group: sum(file_info.get('size') or 0 for file_info in group['files']), reverse=True)
+    return groups
+# --- End of Near-Duplicate Candidates ---
+
+
+# --- Storage Backends ---
+class StorageBackend:
+    """
+    The file operations the scanner, verification and removal code use, independent of where the
+    files live. Paths are absolute, '/'-separated paths inside the backend. attr() returns a dict in
+    the CloudDrive2 attr() layout: 'size', 'writeTime' or 'mtime', and 'fileHashes' ({'2': SHA1})
+    when the backend stores hashes. Backends with can_read also provide file contents, so files
+    without a stored SHA1 can be hashed (see DuplicateFileFinder._hash_file_contents).
+    """
+    name = None
+    can_read = False
+    fingerprint_sample_bytes = HASH_PARTIAL_BYTES # Bytes per fingerprint sample (start and end)
+    fingerprint_middle = False # Also sample the middle of the file
+    read_workers = HASH_MAX_WORKERS # Concurrent reads while hashing
+
+    def walk_path(self, top):
+        """ Yields (folder, [subfolder names], [file names]) for `top` and everything below it. """
+        raise NotImplementedError
+
+    def attr(self, path):
+        raise NotImplementedError
+
+    def listdir(self, folder):
+        """ Names of the entries in `folder`. """
+        raise NotImplementedError
+
+    def ls(self, folder):
+        return self.listdir(folder)
+
+    def remove(self, path):
+        raise NotImplementedError
+
+    def rmdir(self, folder):
+        """ Removes an empty folder. """
+        raise NotImplementedError
+
+    def rmtree(self, folder):
+        """ Removes a folder and its contents with a single call. """
+        raise NotImplementedError
+
+    def makedirs(self, folder, exist_ok=True):
+        raise NotImplementedError
+
+    def move(self, source_path, dest_path):
+        raise NotImplementedError
+
+    def move_batch(self, source_paths, dest_dir):
+        """ Moves several files into `dest_dir` with one call. Returns False if the backend cannot batch moves. """
+        return False
+
+    def source_paths(self, folder):
+        """ The folders a configured folder such as the quarantine folder stands for (one per source). """
+        return [folder]
+
+    def mirror_path(self, root, path):
+        """ Where `path` goes when mirrored below `root` (/a/b -> <root>/a/b), e.g. for quarantining. """
+        return _build_full_path(root, path.lstrip('/'))
+
+    def read_range(self, path, offset, length):
+        """ Returns up to `length` bytes of the file starting at `offset` (can_read backends only). """
+        raise NotImplementedError
+
+    def can_read_path(self, path):
+        """ True if the contents of `path` can be read (hashed) through this backend. """
+        return self.can_read
+
+    def content_sha1(self, path):
+        """ Upper-case SHA1 of the file contents. """
+        return self.content_hashes(path)[HASH_KIND_SHA1]
+
+    def content_hashes(self, path, kinds=()):
+        """
+        {kind: upper-case hex digest} of the file contents: SHA1 plus the `kinds` that HASH_CONTENT_DIGESTS
+        can compute (e.g. MD5, to match copies the provider only has an MD5 for). Streamed in HASH_CHUNK_BYTES reads.
+        """
+        digests = _content_digests(kinds)
+        offset = 0
+        while True:
+            chunk = self.read_range(path, offset, HASH_CHUNK_BYTES)
+            if not chunk: break
+            for digest in digests.values(): digest.update(chunk)
+            offset += len(chunk)
+        return {kind: digest.hexdigest().upper() for kind, digest in digests.items()}
+
+
+class CloudDriveBackend(StorageBackend):
+    """
+    Files behind a CloudDrive2 API, through the clouddrive library's CloudDriveFileSystem.
+    File contents are read with ranged downloads (fs.read_block, else fs.open) where the library
+    provides them; fingerprints use small head/middle/tail samples to keep traffic low.
+    """
+    name = BACKEND_CLOUDDRIVE
+    fingerprint_sample_bytes = REMOTE_FINGERPRINT_BYTES
+    fingerprint_middle = True
+    read_workers = REMOTE_READ_MAX_WORKERS
+
+    def __init__(self, client):
+        self.client = client # CloudDriveClient (used for batched gRPC calls)
+        self.fs = CloudDriveFileSystem(client)
+        self._hash_cache = {} # Path -> (size, write time, {kind: hash}) of downloaded hashes
+
+    @property
+    def can_read(self):
+        return hasattr(self.fs, "read_block") or hasattr(self.fs, "open")
+
+    def walk_path(self, top):
+        return self.fs.walk_path(top)
+
+    def attr(self, path):
+        return self.fs.attr(path)
+
+    def listdir(self, folder):
+        return self.fs.listdir(folder)
+
+    def ls(self, folder):
+        return self.fs.ls(folder)
+
+    def remove(self, path):
+        self.fs.remove(path)
+
+    def rmdir(self, folder):
+        self.fs.rmdir(folder)
+
+    def rmtree(self, folder):
+        remove_tree = getattr(self.fs, "rmtree", None) or self.fs.remove
+        remove_tree(folder)
+
+    def makedirs(self, folder, exist_ok=True):
+        self.fs.makedirs(folder, exist_ok=exist_ok)
+
+    def move(self, source_path, dest_path):
+        self.fs.move(source_path, dest_path)
+
+    def read_range(self, path, offset, length):
+        read_block = getattr(self.fs, "read_block", None)
+        if read_block is not None:
+            return read_block(path, length, offset)
+        with self.fs.open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def content_hashes(self, path, kinds=()):
+        """ Streams the whole file through the digests; reused while the file's size and write time are unchanged. """
+        attrs = self.fs.attr(path)
+        version = (attrs.get('size'), attrs.get('writeTime') or attrs.get('mtime'))
+        cached = self._hash_cache.get(path)
+        if cached and cached[:2] == version and _content_digests(kinds).keys() <= cached[2].keys():
+            return dict(cached[2])
+        if hasattr(self.fs, "open"):
+            digests = _content_digests(kinds)
+            with self.fs.open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                    for digest in digests.values(): digest.update(chunk)
+            hashes = {kind: digest.hexdigest().upper() for kind, digest in digests.items()}
+        else:
+            hashes = super().content_hashes(path, kinds) # Ranged reads only
+        self._hash_cache[path] = version + (hashes,)
+        return dict(hashes)
+
+    def move_batch(self, source_paths, dest_dir):
+        """ One server-side MoveFile call (needs CloudDrive_pb2). """
+        if CloudDrive_pb2 is None or not hasattr(self.client, "MoveFile"):
+            return False
+        self.client.MoveFile(CloudDrive_pb2.MoveFileRequest(theFilePaths=list(source_paths), destPath=dest_dir))
+        return True
+
+
+class LocalFSBackend(StorageBackend):
+    """
+    Files in a local or mounted folder (`root`, e.g. a NAS share). Backend path '/a/b.mkv' is
+    <root>/a/b.mkv; paths that would leave `root` are refused. Folders are walked with os.scandir.
+    Local files have no stored hash: attr() reports none, and the scanner hashes contents where
+    needed. Full hashes are read through mmap and cached while size and modification time are unchanged.
+    """
+    name = BACKEND_LOCAL
+    can_read = True
+
+    def __init__(self, root):
+        if not root or not os.path.isdir(root):
+            raise FileNotFoundError(f"Not a folder: '{root}'")
+        self.root = os.path.abspath(root)
+        self._root_prefix = os.path.join(self.root, "")
+        self._hash_cache = {} # OS path -> (size, mtime_ns, {kind: hash})
+
+    def _os_path(self, path):
+        relative = str(path).replace('\\', '/').strip('/')
+        if not relative:
+            return self.root
+        os_path = os.path.normpath(os.path.join(self.root, *relative.split('/')))
+        if not os_path.startswith(self._root_prefix):
+            raise ValueError(f"Path is outside the local folder '{self.root}': {path}")
+        return os_path
+
+    def walk_path(self, top):
+        pending = [top]
+        while pending:
+            folder = pending.pop()
+            subfolders, files = [], []
+            try:
+                with os.scandir(self._os_path(folder)) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False): subfolders.append(entry.name)
+                            elif entry.is_file(): files.append(entry.name)
+                        except OSError:
+                            continue # Entry vanished or is unreadable
+            except OSError:
+                if folder == top: raise
+                continue # Unreadable subfolder: skip it like a permission error in os.walk
+            yield folder, subfolders, files
+            pending.extend(_build_full_path(folder, name) for name in reversed(subfolders))
+
+    def attr(self, path):
+        st = os.stat(self._os_path(path))
+        return {'size': st.st_size, 'mtime': st.st_mtime, 'isDirectory': stat.S_ISDIR(st.st_mode)}
+
+    def read_range(self, path, offset, length):
+        with open(self._os_path(path), "rb", buffering=0) as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def content_hashes(self, path, kinds=()):
+        os_path = self._os_path(path)
+        st = os.stat(os_path)
+        cached = self._hash_cache.get(os_path)
+        if (cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns
+                and _content_digests(kinds).keys() <= cached[2].keys()):
+            return dict(cached[2])
+        digests = _content_digests(kinds)
+        with open(os_path, "rb", buffering=0) as f:
+            try:
+                # One update over the mapped file: no copies, and hashlib releases the GIL meanwhile
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for digest in digests.values(): digest.update(mapped)
+            except (OSError, ValueError): # Empty file, or a filesystem that cannot be mapped
+                digests = _content_digests(kinds)
+                f.seek(0)
+                for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                    for digest in digests.values(): digest.update(chunk)
+        hashes = {kind: digest.hexdigest().upper() for kind, digest in digests.items()}
+        self._hash_cache[os_path] = (st.st_size, st.st_mtime_ns, hashes)
+        return dict(hashes)
+
+    def listdir(self, folder):
+        return os.listdir(self._os_path(folder))
+
+    def remove(self, path):
+        os.remove(self._os_path(path))
+
+    def rmdir(self, folder):
+        os.rmdir(self._os_path(folder))
+
+    def rmtree(self, folder):
+        os_path = self._os_path(folder)
+        if os_path == self.root: raise ValueError("Refusing to remove the local base folder")
+        shutil.rmtree(os_path)
+
+    def makedirs(self, folder, exist_ok=True):
+        os.makedirs(self._os_path(folder), exist_ok=exist_ok)
+
+    def move(self, source_path, dest_path):
+        dest_os_path = self._os_path(dest_path)
+        if os.path.exists(dest_os_path): raise FileExistsError(f"Destination exists: {dest_path}")
+        shutil.move(self._os_path(source_path), dest_os_path)
+
+
+class MultiSourceBackend(StorageBackend):
+    """
+    Several connections (e.g. CloudDrive2 instances for different accounts) scanned as one tree.
+    Each source is a top-level folder SOURCE_TAG_PREFIX + name (/@main/Movies/a.mkv), so every path
+    carries its source and each operation is routed to that source's backend. Moves stay within a source;
+    folders such as the quarantine folder exist once per source.
+    """
+    name = "multi"
+
+    def __init__(self, sources):
+        self.sources = dict(sources) # Source name -> backend, primary first
+        backends = list(self.sources.values())
+        self.can_read = any(backend.can_read for backend in backends) # Per path: can_read_path
+        # Fingerprints are only comparable when every source samples the same bytes
+        self.fingerprint_sample_bytes = min(backend.fingerprint_sample_bytes for backend in backends)
+        self.fingerprint_middle = any(backend.fingerprint_middle for backend in backends)
+        self.read_workers = sum(backend.read_workers for backend in backends)
+
+    @staticmethod
+    def tag_path(source, path):
+        """ The combined-tree path of `path` inside source `source`. """
+        return SOURCE_TAG_PREFIX + source + (path if path != '/' else '')
+
+    def split(self, path):
+        """ (source name, backend, path inside the source) for a tagged path. Raises ValueError otherwise. """
+        path = path.replace('\\', '/')
+        if path.startswith(SOURCE_TAG_PREFIX):
+            source, _, inner = path[len(SOURCE_TAG_PREFIX):].partition('/')
+            backend = self.sources.get(source)
+            if backend is not None:
+                return source, backend, '/' + inner
+        raise ValueError(f"'{path}' is not inside a source ({', '.join(self.sources)})")
+
+    def _untagged(self, path):
+        try: return self.split(path)[2]
+        except ValueError: return path
+
+    def walk_path(self, top):
+        source, backend, inner = self.split(top)
+        for folder, subfolders, files in backend.walk_path(inner):
+            files = [self.tag_path(source, str(name)) if str(name).startswith('/') else name for name in files]
+            yield self.tag_path(source, str(folder)), subfolders, files
+
+    def attr(self, path):
+        _source, backend, inner = self.split(path)
+        return backend.attr(inner)
+
+    def listdir(self, folder):
+        if folder.rstrip('/') == '':
+            return [SOURCE_TAG_PREFIX[1:] + source for source in self.sources]
+        _source, backend, inner = self.split(folder)
+        return backend.listdir(inner)
+
+    def remove(self, path):
+        _source, backend, inner = self.split(path)
+        backend.remove(inner)
+
+    def rmdir(self, folder):
+        _source, backend, inner = self.split(folder)
+        backend.rmdir(inner)
+
+    def rmtree(self, folder):
+        _source, backend, inner = self.split(folder)
+        backend.rmtree(inner)
+
+    def makedirs(self, folder, exist_ok=True):
+        _source, backend, inner = self.split(folder)
+        backend.makedirs(inner, exist_ok=exist_ok)
+
+    def _same_source(self, paths, dest):
+        source, backend, inner_dest = self.split(dest)
+        inner_paths = []
+        for path in paths:
+            path_source, _backend, inner = self.split(path)
+            if path_source != source:
+                raise ValueError(f"cannot move '{path}' to another source ('{source}')")
+            inner_paths.append(inner)
+        return backend, inner_paths, inner_dest
+
+    def move(self, source_path, dest_path):
+        backend, (inner_source,), inner_dest = self._same_source([source_path], dest_path)
+        backend.move(inner_source, inner_dest)
+
+    def move_batch(self, source_paths, dest_dir):
+        backend, inner_paths, inner_dest = self._same_source(source_paths, dest_dir)
+        return backend.move_batch(inner_paths, inner_dest)
+
+    def read_range(self, path, offset, length):
+        _source, backend, inner = self.split(path)
+        return backend.read_range(inner, offset, length)
+
+    def content_hashes(self, path, kinds=()):
+        _source, backend, inner = self.split(path)
+        return backend.content_hashes(inner, kinds)
+
+    def can_read_path(self, path):
+        try:
+            return self.split(path)[1].can_read
+        except ValueError:
+            return False
+
+    def source_paths(self, folder):
+        """ A folder given without a source tag exists in every source (/q -> /@a/q, /@b/q). """
+        inner = self._untagged(folder)
+        return [self.tag_path(source, inner) for source in self.sources]
+
+    def mirror_path(self, root, path):
+        """ Mirrors inside the path's own source: /@b/Movies below /q -> /@b/q/Movies. """
+        source, _backend, inner = self.split(path)
+        return self.tag_path(source, _build_full_path(self._untagged(root), inner.lstrip('/')))
+# --- End of Storage Backends ---
+
 
 # --- DuplicateFileFinder Class ---
 class DuplicateFileFinder:
@@ -579,7 +1810,15 @@ class DuplicateFileFinder:
         self.clouddrive2_passwd = ""
         self._raw_scan_paths = []
         self._raw_mount_point = ""
-        self.fs = None
+        self.fs = None # StorageBackend of the current connection (CloudDriveBackend or LocalFSBackend)
+        self.source_name = DEFAULT_SOURCE_NAME # Name of the [config] connection when there are extra sources
+        self.extra_sources = [] # Connected extra sources (dicts, see _open_source); fs is then a MultiSourceBackend
+        self.excluded_paths = [] # Cloud folders skipped while scanning (e.g. the quarantine folder)
+        self.scan_roots = [] # Cloud paths of the last scan; folder cleanup never goes above these
+        self.last_inventory = {} # All video files of the last scan by SHA1, including files without duplicates
+        self.inventory_db_path = None # SQLite file that receives every scanned file (None: disabled)
+        self._inventory_db = None # InventoryDatabase open during a scan
+        self._inventory_lock = threading.Lock() # Sources are walked concurrently; rows are queued one at a time
         self.progress_callback = None
         # Default translator returns key if not found
         self._ = lambda key, **kwargs: kwargs.get('default', f"<{key}?>")
@@ -610,8 +1849,16 @@ class DuplicateFileFinder:
             raw_scan_paths, # Expects a list now
             raw_mount_point,
             progress_callback=None,
+            backend=BACKEND_CLOUDDRIVE,
+            extra_sources=None,
+            source_name=DEFAULT_SOURCE_NAME,
     ):
-        """ Sets configuration and attempts to establish+test connection. """
+        """
+        Sets configuration and attempts to establish+test connection. With backend=BACKEND_LOCAL the
+        files are read from local folders below raw_mount_point instead (no CloudDrive2 needed).
+        `extra_sources` (dicts with name, backend, address, account, passwd, mount_point, scan_paths)
+        are connected too and scanned together with this connection, named `source_name`.
+        """
         self.clouddrvie2_address = clouddrvie2_address
         self.clouddrive2_account = clouddrive2_account
         self.clouddrive2_passwd = clouddrive2_passwd
@@ -619,6 +1866,19 @@ class DuplicateFileFinder:
         self._raw_mount_point = raw_mount_point
         self.progress_callback = progress_callback
         self.fs = None # Reset filesystem object on new config/connection attempt
+        self.source_name = source_name or DEFAULT_SOURCE_NAME
+        self.extra_sources = []
+
+        if backend == BACKEND_LOCAL:
+            try:
+                self.fs = LocalFSBackend(raw_mount_point)
+                self.fs.ls('/')
+            except Exception as e:
+                self.log(self._("error_local_root", root=raw_mount_point, error=e, default=f"Local folder '{raw_mount_point}' is not accessible: {e}"))
+                self.fs = None
+                return False
+            self.log(self._("status_local_connect_success", root=self.fs.root, default=f"Local folder '{self.fs.root}' is accessible."))
+            return self._connect_extra_sources(extra_sources)
 
         # Basic Input Validation
         if not self.clouddrvie2_address:
@@ -632,7 +1892,7 @@ class DuplicateFileFinder:
             )
             # Wrap filesystem creation in try-except as well
             try:
-                 self.fs = CloudDriveFileSystem(client)
+                 self.fs = CloudDriveBackend(client)
             except Exception as fs_init_e:
                  error_msg = self._("error_connect", address=self.clouddrvie2_address, error=f"Failed to initialize filesystem: {fs_init_e}", default=f"Connection Error: Filesystem init failed: {fs_init_e}")
                  self.log(error_msg)
@@ -644,7 +1904,7 @@ class DuplicateFileFinder:
             self.log(self._("status_test_connection_step", default="Testing connection by attempting to list root directory ('/')..."))
             self.fs.ls('/') # Raises exception on failure
             self.log(self._("status_connect_success", default="Connection successful."))
-            return True
+            return self._connect_extra_sources(extra_sources)
 
         except Exception as e:
             # Catch errors from CloudDriveClient init or fs.ls('/')
@@ -655,6 +1915,56 @@ class DuplicateFileFinder:
             self.fs = None # Ensure fs is None on error
             return False
 
+    @staticmethod
+    def _open_source(source):
+        """ Connects one extra source and lists its root. Raises on failure. """
+        if source.get('backend') == BACKEND_LOCAL:
+            backend = LocalFSBackend(source['mount_point'])
+        else:
+            backend = CloudDriveBackend(CloudDriveClient(source['address'], source.get('account', ''), source.get('passwd', '')))
+        backend.ls('/')
+        return backend
+
+    def _connect_extra_sources(self, extra_sources):
+        """
+        After the main connection succeeded: connects `extra_sources` concurrently and combines everything
+        in a MultiSourceBackend. Any failing source fails the whole connection, so a scan never silently
+        misses an account. Returns True when connected.
+        """
+        if not extra_sources: return True
+        names = [self.source_name] + [source['name'] for source in extra_sources]
+        if len(set(names)) != len(names):
+            self.log(self._("error_source_names", names=", ".join(names), default=f"Source names must be unique: {', '.join(names)}"))
+            self.fs = None
+            return False
+        def connect(source):
+            try:
+                return self._open_source(source), None
+            except Exception as e:
+                return None, e
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(extra_sources), thread_name_prefix="connect") as executor:
+            results = list(executor.map(connect, extra_sources))
+        failed = [(source, error) for source, (_backend, error) in zip(extra_sources, results) if error is not None]
+        for source, error in failed:
+            self.log(self._("error_source_connect", name=source['name'], error=error, default=f"Could not connect source '{source['name']}': {error}"))
+        if failed:
+            self.fs = None
+            return False
+        self.fs = MultiSourceBackend([(self.source_name, self.fs)] + [(source['name'], backend) for source, (backend, _error) in zip(extra_sources, results)])
+        self.extra_sources = list(extra_sources)
+        self.log(self._("status_sources_connected", count=len(names), names=", ".join(names),
+                        default=f"Connected {len(names)} sources: {', '.join(names)}. Paths are shown as /@<source>/..."))
+        return True
+
+    def _scan_targets(self):
+        """ (raw scan path, mount point, source name or None) for every configured scan path, main connection first. """
+        if not self.extra_sources:
+            return [(raw_path, self._raw_mount_point, None) for raw_path in self._raw_scan_paths]
+        targets = [(raw_path, self._raw_mount_point, self.source_name) for raw_path in self._raw_scan_paths]
+        for source in self.extra_sources:
+            targets.extend((raw_path, source['mount_point'], source['name']) for raw_path in source['scan_paths'])
+        return targets
+
     def calculate_fs_path(self, scan_path_raw, mount_point_raw):
         """
         Calculates the effective cloud filesystem path based on scan root and mount point.
@@ -778,7 +2088,60 @@ class DuplicateFileFinder:
                         default=f"[Debug] Calculated effective cloud scan path: '{fs_dir_path}' from Scan='{scan_path_raw}', Mount='{mount_point_raw}'"))
         return fs_dir_path
 
-    def find_duplicates(self):
+    def find_duplicates(self, dump_path=None):
+        """
+        Scans the configured cloud paths for duplicate files (see _scan_for_duplicates), or, with
+        `dump_path`, reads a local directory-tree dump instead (see _scan_dump; no connection needed).
+        When inventory_db_path is set, every scanned file is also written to that SQLite database.
+        Returns the full dictionary of found duplicates (sets with > 1 file).
+        """
+        if self.inventory_db_path and (self.fs or dump_path):
+            try:
+                self._inventory_db = InventoryDatabase.begin(self.inventory_db_path)
+            except (sqlite3.Error, OSError) as e:
+                self.log(self._("inventory_db_error", file=self.inventory_db_path, error=e,
+                                default=f"Inventory database error ({self.inventory_db_path}): {e}. Continuing the scan without it."))
+        try:
+            return self._scan_dump(dump_path) if dump_path else self._scan_for_duplicates()
+        finally:
+            inventory_db, self._inventory_db = self._inventory_db, None
+            if inventory_db is not None:
+                try:
+                    inventory_db.finish(self.scan_roots)
+                    self.log(self._("inventory_db_written", file=self.inventory_db_path, count=inventory_db.count,
+                                    default=f"Scan inventory written to {self.inventory_db_path} ({inventory_db.count} files)."))
+                except sqlite3.Error as e:
+                    self.log(self._("inventory_db_error", file=self.inventory_db_path, error=e,
+                                    default=f"Inventory database error ({self.inventory_db_path}): {e}."))
+                finally:
+                    inventory_db.close()
+
+    def _record_inventory(self, file_info):
+        """ Queues one scanned file for the inventory database; a database error disables it for the rest of the scan. """
+        with self._inventory_lock:
+            if self._inventory_db is None: return # Disabled meanwhile by another scan thread
+            try:
+                self._inventory_db.add(file_info)
+            except sqlite3.Error as e:
+                self.log(self._("inventory_db_error", file=self.inventory_db_path, error=e,
+                                default=f"Inventory database error ({self.inventory_db_path}): {e}. Continuing the scan without it."))
+                self._inventory_db.close()
+                self._inventory_db = None
+
+    def _record_inventory_set_keys(self, groups):
+        """ Stores the set key of files whose set is not keyed by their own SHA1 (sets linked through another hash kind). """
+        rows = [(set_key, info['path']) for set_key, infos in groups.items() for info in infos if info.get('sha1') != set_key]
+        with self._inventory_lock:
+            if self._inventory_db is None or not rows: return
+            try:
+                self._inventory_db.set_keys(rows)
+            except sqlite3.Error as e:
+                self.log(self._("inventory_db_error", file=self.inventory_db_path, error=e,
+                                default=f"Inventory database error ({self.inventory_db_path}): {e}. Continuing the scan without it."))
+                self._inventory_db.close()
+                self._inventory_db = None
+
+    def _scan_for_duplicates(self):
         """
         Scans the configured cloud paths for duplicate files with extensions in VIDEO_EXTENSIONS.
         Handles path construction and standardizes SHA1 hash case. Aggregates results.
@@ -788,258 +2151,386 @@ class DuplicateFileFinder:
             self.log(self._("error_not_connected", default="Error: Not connected to CloudDrive. Cannot scan."))
             return {}
 
-        if not self._raw_scan_paths:
+        scan_targets = self._scan_targets()
+        if not scan_targets:
             self.log(self._("error_no_scan_paths_added", default="Error: No scan paths specified. Aborting scan."))
             return {}
 
-        self.log(self._("find_starting", num_paths=len(self._raw_scan_paths),
-                        default=f"Starting duplicate file scan across {len(self._raw_scan_paths)} path(s)..."))
+        self.log(self._("find_starting", num_paths=len(scan_targets),
+                        default=f"Starting duplicate file scan across {len(scan_targets)} path(s)..."))
 
         # --- Aggregated results across all paths ---
-        all_potential_duplicates = defaultdict(list)
+        scanned_files = [] # Files with at least one usable hash, grouped after the walk
         overall_start_time = time.time()
         overall_items_scanned = 0
         overall_videos_processed = 0
         overall_attr_errors = 0
         overall_sha1_skips = 0
+        unhashed_files = []
 
+        self.scan_roots = []
+        roots_by_source = defaultdict(list) # Scan roots per source (None: single connection)
         # --- Iterate through each raw scan path provided ---
-        for raw_scan_path_entry in self._raw_scan_paths:
-            fs_dir_path = self.calculate_fs_path(raw_scan_path_entry, self._raw_mount_point)
+        for raw_scan_path_entry, mount_point, source in scan_targets:
+            fs_dir_path = self.calculate_fs_path(raw_scan_path_entry, mount_point)
 
             if fs_dir_path is None:
-                self.log(self._("error_path_calc_failed", scan=raw_scan_path_entry, mount=self._raw_mount_point,
+                self.log(self._("error_path_calc_failed", scan=raw_scan_path_entry, mount=mount_point,
                                 default=f"Error: Could not determine cloud scan path for '{raw_scan_path_entry}'. Skipping this path."))
                 continue  # Skip this path and proceed to the next one
+            if source is not None:
+                fs_dir_path = self.fs.tag_path(source, fs_dir_path)
+
+            self.scan_roots.append(fs_dir_path)
+            roots_by_source[source].append(fs_dir_path)
+
+        def scan_source(roots):
+            source_files, source_unhashed, stats = [], [], Counter()
+            hash_contents = self.fs.can_read_path(roots[0]) # Files without any stored hash are hashed instead of skipped
+            for fs_dir_path in roots:
+                stats.update(self._scan_root(fs_dir_path, hash_contents, source_files, source_unhashed))
+            return source_files, source_unhashed, stats
+        if len(roots_by_source) > 1:
+            # Each source is a separate connection: walk them concurrently, one thread per source
+            self.log(self._("find_sources_concurrent", count=len(roots_by_source),
+                            default=f"Scanning {len(roots_by_source)} sources concurrently..."))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(roots_by_source), thread_name_prefix="scan") as executor:
+                results = list(executor.map(scan_source, roots_by_source.values()))
+        else:
+            results = [scan_source(roots) for roots in roots_by_source.values()]
+        for source_files, source_unhashed, stats in results:
+            scanned_files.extend(source_files)
+            unhashed_files.extend(source_unhashed)
+            overall_items_scanned += stats['items']
+            overall_videos_processed += stats['videos']
+            overall_attr_errors += stats['attr_errors']
+            overall_sha1_skips += stats['sha1_skips']
 
-            self.log(self._("find_scan_path_start", path=fs_dir_path, default=f"Scanning path: '{fs_dir_path}'..."))
-            path_start_time = time.time()
-            path_count = 0
-            path_video_files_checked = 0
-            path_errors_getting_attrs = 0
-            path_files_skipped_no_sha1 = 0
-            path_key_errors_getting_hash = 0
 
-            try:
-                # Use walk_path which yields (dirname, [subdirs], [files])
-                walk_iterator = self.fs.walk_path(fs_dir_path)
-
-                for foldername, _, filenames in walk_iterator:
-                    foldername_str = str(foldername)  # Ensure string
-
-                    for filename_obj in filenames:
-                        path_count += 1
-                        overall_items_scanned += 1
-                        raw_filepath_str = str(filename_obj)  # Ensure string
-
-                        if not raw_filepath_str: continue
-
-                        # --- Path Construction & Normalization (Corrected Logic) ---
-                        path_for_storage = ""
-                        if raw_filepath_str.startswith('/'):
-                            # Assume filename_obj already provided a full cloud path
-                            path_for_storage = raw_filepath_str
-                        elif foldername_str:
-                            # Build path from foldername and filename
-                            path_for_storage = _build_full_path(foldername_str, raw_filepath_str)
-                        else:
-                            # Should not happen if walk behaves like os.walk, but handle defensively
-                            path_for_storage = '/' + raw_filepath_str.lstrip('/')
-
-                        # Normalize slashes and remove duplicates/trailing
-                        if path_for_storage:
-                            path_for_storage = path_for_storage.replace('\\', '/')
-                            while '//' in path_for_storage:
-                                path_for_storage = path_for_storage.replace('//', '/')
-                            if len(path_for_storage) > 1:
-                                path_for_storage = path_for_storage.rstrip('/')
-                            # Ensure leading slash, but only if it's not just "/"
-                            if not path_for_storage.startswith('/') and path_for_storage != '/':
-                                path_for_storage = '/' + path_for_storage
-                            # Handle case where path becomes empty after stripping
-                            if not path_for_storage:
-                                path_for_storage = '/' if foldername_str == '/' and not raw_filepath_str else ''
+        # --- All Paths Processed ---
+        if unhashed_files:
+            hashed_files, not_hashed_count = self._hash_file_contents(unhashed_files, scanned_files)
+            overall_sha1_skips += not_hashed_count
+            scanned_files.extend(hashed_files)
+            for file_info in unhashed_files: # Recorded once their content hash is known (or not computable)
+                if self._inventory_db is None: break
+                self._record_inventory(file_info)
+        all_potential_duplicates = _group_by_hashes(scanned_files)
+        overall_end_time = time.time()
+        overall_duration = overall_end_time - overall_start_time
+        self.log(f"Completed scanning all paths in {overall_duration:.2f} seconds.")
+        self.log(
+            f"Overall Summary: Items Scanned={overall_items_scanned}, Videos Processed={overall_videos_processed}, Attr Errors={overall_attr_errors}, SHA1 Skips={overall_sha1_skips}")
+        return self._collect_duplicates(all_potential_duplicates, overall_sha1_skips)
 
+    def _scan_root(self, fs_dir_path, hash_contents, scanned_files, unhashed_files):
+        """
+        Walks one scan root and collects its video files: files with a hash go to `scanned_files`,
+        files without one to `unhashed_files` (when hash_contents, else they are skipped).
+        Returns a Counter of items, videos, attr_errors and sha1_skips.
+        """
+        stats = Counter()
+        self.log(self._("find_scan_path_start", path=fs_dir_path, default=f"Scanning path: '{fs_dir_path}'..."))
+        path_start_time = time.time()
+        path_count = 0
+        path_video_files_checked = 0
+        path_errors_getting_attrs = 0
+        path_files_skipped_no_sha1 = 0
+
+        try:
+            # Use walk_path which yields (dirname, [subdirs], [files])
+            walk_iterator = self.fs.walk_path(fs_dir_path)
+
+            for foldername, _, filenames in walk_iterator:
+                foldername_str = str(foldername)  # Ensure string
+                if self._is_excluded(foldername_str): continue
+
+                for filename_obj in filenames:
+                    path_count += 1
+                    stats['items'] += 1
+                    raw_filepath_str = str(filename_obj)  # Ensure string
+
+                    if not raw_filepath_str: continue
+
+                    # --- Path Construction & Normalization (Corrected Logic) ---
+                    path_for_storage = ""
+                    if raw_filepath_str.startswith('/'):
+                        # Assume filename_obj already provided a full cloud path
+                        path_for_storage = raw_filepath_str
+                    elif foldername_str:
+                        # Build path from foldername and filename
+                        path_for_storage = _build_full_path(foldername_str, raw_filepath_str)
+                    else:
+                        # Should not happen if walk behaves like os.walk, but handle defensively
+                        path_for_storage = '/' + raw_filepath_str.lstrip('/')
+
+                    # Normalize slashes and remove duplicates/trailing
+                    if path_for_storage:
+                        path_for_storage = path_for_storage.replace('\\', '/')
+                        while '//' in path_for_storage:
+                            path_for_storage = path_for_storage.replace('//', '/')
+                        if len(path_for_storage) > 1:
+                            path_for_storage = path_for_storage.rstrip('/')
+                        # Ensure leading slash, but only if it's not just "/"
+                        if not path_for_storage.startswith('/') and path_for_storage != '/':
+                            path_for_storage = '/' + path_for_storage
+                        # Handle case where path becomes empty after stripping
                         if not path_for_storage:
-                            self.log(
-                                f"Warning: Could not construct valid path for item '{raw_filepath_str}' in folder '{foldername_str}'. Skipping.")
-                            continue  # Skip if path is still empty
+                            path_for_storage = '/' if foldername_str == '/' and not raw_filepath_str else ''
 
-                        # --- End Path Construction ---
+                    if not path_for_storage:
+                        self.log(
+                            f"Warning: Could not construct valid path for item '{raw_filepath_str}' in folder '{foldername_str}'. Skipping.")
+                        continue  # Skip if path is still empty
 
-                        # --- Check Video Extension (Initial Scan Filter) ---
-                        file_extension = os.path.splitext(path_for_storage)[1].lower()
-                        if file_extension in VIDEO_EXTENSIONS:  # Only process files matching initial video list
-                            path_video_files_checked += 1
-                            overall_videos_processed += 1
-                            # self.log(self._("log_debug_process_video", path=path_for_storage, default=f"[Debug] Processing Video: {path_for_storage}"))
+                    # --- End Path Construction ---
 
-                            attrs = None
-                            mod_time_dt = None
-                            file_size = 0
-                            file_sha1_standardized = None
+                    # --- Check Video Extension (Initial Scan Filter) ---
+                    file_extension = os.path.splitext(path_for_storage)[1].lower()
+                    if file_extension in VIDEO_EXTENSIONS:  # Only process files matching initial video list
+                        path_video_files_checked += 1
+                        stats['videos'] += 1
+                        # self.log(self._("log_debug_process_video", path=path_for_storage, default=f"[Debug] Processing Video: {path_for_storage}"))
 
-                            try:
-                                attrs = self.fs.attr(path_for_storage)  # Use the corrected path
-                                self.log(self._("log_debug_attrs_received", filename=os.path.basename(path_for_storage),
-                                                attrs=str(attrs)[:100] + "...",
-                                                default=f"[Debug] Attrs for {os.path.basename(path_for_storage)}: {str(attrs)[:100]}..."))
-
-                                # --- SHA1 Handling ---
-                                raw_sha1_value = None
-                                try:
-                                    file_hashes_dict = attrs.get('fileHashes')
-                                    if isinstance(file_hashes_dict, dict):
-                                        raw_sha1_value = file_hashes_dict.get('2')  # '2' is typically SHA1
-                                        self.log(self._("log_debug_raw_sha1", sha1=raw_sha1_value,
-                                                        default=f"[Debug] Raw SHA1 (key '2'): {raw_sha1_value}"))
-                                        if isinstance(raw_sha1_value, str):
-                                            if len(raw_sha1_value) >= 40:  # Basic SHA1 length check
-                                                file_sha1_standardized = raw_sha1_value.upper()  # Standardize case
-                                                self.log(
-                                                    self._("log_debug_standardized_sha1", sha1=file_sha1_standardized,
-                                                           default=f"[Debug] Standardized SHA1: {file_sha1_standardized}"))
-                                            elif len(raw_sha1_value) > 0:  # Suspiciously short hash
-                                                if path_key_errors_getting_hash < 5 or path_key_errors_getting_hash % 10 == 0:
-                                                    self.log(self._("warning_hash_short", path=path_for_storage,
-                                                                    hash=raw_sha1_value,
-                                                                    default=f"Warning: Short SHA1 ('{raw_sha1_value}') for {path_for_storage}. Skipping."))
-                                                path_key_errors_getting_hash += 1
-                                                file_sha1_standardized = None
-                                            else:  # Empty string hash
-                                                self.log(self._("log_debug_invalid_sha1_empty", path=path_for_storage,
-                                                                default=f"[Debug] Invalid SHA1: Empty string for {path_for_storage}. Skipping."))
-                                                file_sha1_standardized = None
-                                        else:  # Not a string
-                                            self.log(self._("log_debug_invalid_sha1_type", sha1=raw_sha1_value,
-                                                            path=path_for_storage,
-                                                            default=f"[Debug] Invalid SHA1: Not a string ('{raw_sha1_value}') for {path_for_storage}. Skipping."))
-                                            file_sha1_standardized = None
-                                    else:  # 'fileHashes' key missing or not a dict
-                                        self.log(self._("log_debug_hash_missing_or_invalid", path=path_for_storage,
-                                                        default=f"[Debug] 'fileHashes' missing or not dict for {path_for_storage}. SHA1 is None."))
-                                        file_sha1_standardized = None
-                                except KeyError as ke:
-                                    if path_key_errors_getting_hash < 5 or path_key_errors_getting_hash % 10 == 0:  # Limit logging
-                                        self.log(self._("warning_hash_missing", path=path_for_storage, key_error=ke,
-                                                        default=f"Warning (Path: {fs_dir_path}): Hash data missing for '{path_for_storage}'. KeyError: {ke}. Skipping."))
-                                    path_key_errors_getting_hash += 1
-                                    path_errors_getting_attrs += 1  # Count as attribute error
-                                    file_sha1_standardized = None
-                                except Exception as hash_exc:  # Catch other potential errors during hash access
-                                    if path_key_errors_getting_hash < 5 or path_key_errors_getting_hash % 10 == 0:
-                                        self.log(
-                                            f"Warning (Path: {fs_dir_path}): Error accessing hash for '{path_for_storage}': {hash_exc}. Skipping.")
-                                    path_key_errors_getting_hash += 1
-                                    path_errors_getting_attrs += 1
-                                    file_sha1_standardized = None
-
-                                if not file_sha1_standardized:
-                                    path_files_skipped_no_sha1 += 1
-                                    overall_sha1_skips += 1
-                                    self.log(self._("log_debug_skipping_no_sha1",
-                                                    filename=os.path.basename(path_for_storage),
-                                                    default=f"[Debug] SKIPPING file {os.path.basename(path_for_storage)} due to missing/invalid SHA1."))
-                                    continue  # Skip this file if SHA1 is invalid/missing
-
-                                # --- Get Modification Time ---
-                                mod_time_str = attrs.get('writeTime')
-                                mod_time_dt = _parse_datetime(mod_time_str)
-                                if mod_time_str and mod_time_dt is None:
-                                    self.log(self._("error_parse_date", path=path_for_storage,
-                                                    error=f"unparseable string '{mod_time_str}'",
-                                                    default=f"Warning: Could not parse date '{mod_time_str}' for {path_for_storage}"))
-                                elif not mod_time_str:
-                                    mtime_ts = attrs.get('mtime')
-                                    if isinstance(mtime_ts, (int, float)):
-                                        try:
-                                            mod_time_dt = datetime.fromtimestamp(mtime_ts, tz=timezone.utc)
-                                            self.log(f"[Debug] Used 'mtime' ({mtime_ts}) for {path_for_storage}")
-                                        except (ValueError, OSError):
-                                            self.log(
-                                                f"Warning: Could not convert 'mtime' timestamp ({mtime_ts}) for {path_for_storage}")
-                                            mod_time_dt = None
-
-                                # --- Get Size ---
-                                size_val = attrs.get('size', 0)
-                                try:
-                                    file_size = int(size_val) if size_val is not None else 0
-                                except (ValueError, TypeError):
-                                    self.log(self._("warning_size_invalid", size=size_val, path=path_for_storage,
-                                                    default=f"Warning: Invalid size value '{size_val}' for {path_for_storage}. Using 0."))
-                                    file_size = 0
-
-                                file_info = {
-                                    'path': path_for_storage,
-                                    'modified': mod_time_dt,
-                                    'size': file_size,
-                                    'sha1': file_sha1_standardized
-                                }
-                                all_potential_duplicates[file_sha1_standardized].append(file_info)
-                                self.log(self._("log_debug_storing_info", filename=os.path.basename(path_for_storage),
-                                                sha1=file_sha1_standardized[:8] + "...",
-                                                default=f"[Debug] Storing info for {os.path.basename(path_for_storage)} ({file_sha1_standardized[:8]}...)"))
-
-                            # --- Catch errors getting attributes for a specific file ---
-                            except FileNotFoundError as fnf_e:
-                                # This might be the specific error you are seeing if the path is wrong
-                                err_msg = self._("error_get_attrs", path=path_for_storage, error=fnf_e,
-                                                 default=f"Error getting attributes/hash for '{path_for_storage}': {fnf_e}")
-                                self.log(err_msg)
-                                # Log the underlying error message which might contain more details from clouddrive library
-                                self.log(f"Attr Error Detail ({path_for_storage}): {fnf_e}")
-                                path_errors_getting_attrs += 1
-                                overall_attr_errors += 1
-                            except Exception as e:
-                                err_msg = self._("error_get_attrs", path=path_for_storage, error=e,
-                                                 default=f"Error getting attributes/hash for '{path_for_storage}': {e}")
-                                self.log(err_msg)
-                                self.log(f"Attribute Error Details ({fs_dir_path}): {traceback.format_exc(limit=2)}")
-                                path_errors_getting_attrs += 1
-                                overall_attr_errors += 1
-
-                        # Log progress periodically per path
-                        if path_count % 200 == 0:
-                            self.log(self._("status_scan_progress", path=fs_dir_path, count=path_count,
-                                            video_count=path_video_files_checked,
-                                            default=f"Path '{fs_dir_path}': Scanned {path_count} items... Found {path_video_files_checked} videos."))
-
-                # --- Path Scan Finished ---
-                path_end_time = time.time()
-                path_duration = path_end_time - path_start_time
-                self.log(self._("status_scan_finished_duration", path=fs_dir_path, duration=path_duration,
-                                default=f"Scan for path '{fs_dir_path}' finished in {path_duration:.2f} seconds."))
-                self.log(self._("status_scan_summary_items", path=fs_dir_path, count=path_count,
-                                video_count=path_video_files_checked,
-                                default=f"Path '{fs_dir_path}': Total items encountered: {path_count}. Video files processed: {path_video_files_checked}."))
-
-                # Report errors/skips for this path
-                path_warning_parts = []
-                if path_errors_getting_attrs > 0: path_warning_parts.append(
-                    f"{path_errors_getting_attrs} attribute errors")
-                if path_files_skipped_no_sha1 > 0: path_warning_parts.append(
-                    f"{path_files_skipped_no_sha1} files skipped (no/invalid SHA1)")
-                if path_warning_parts:
-                    self.log(self._("status_scan_warnings", path=fs_dir_path, details='; '.join(path_warning_parts),
-                                    default=f"Path '{fs_dir_path}': WARNING: {'; '.join(path_warning_parts)}."))
-
-            except Exception as walk_e:
-                # Catch errors during the fs.walk_path() iteration itself for this path
-                err_msg = self._("error_scan_path", path=fs_dir_path, error=walk_e,
-                                 default=f"Critical error walking cloud path '{fs_dir_path}': {walk_e}")
-                self.log(err_msg)
-                self.log(f"Walk Error Details ({fs_dir_path}): {traceback.format_exc()}")
-                self.log(self._("find_error_processing_path", path=fs_dir_path, error=walk_e,
-                                default=f"Error processing scan path '{fs_dir_path}': {walk_e}. Skipping this path."))
-                continue  # Continue to the next raw_scan_path_entry
+                        attrs = None
+                        mod_time_dt = None
+                        file_size = 0
+                        file_sha1_standardized = None
 
-        # --- All Paths Processed ---
-        overall_end_time = time.time()
-        overall_duration = overall_end_time - overall_start_time
-        self.log(f"Completed scanning all paths in {overall_duration:.2f} seconds.")
-        self.log(
-            f"Overall Summary: Items Scanned={overall_items_scanned}, Videos Processed={overall_videos_processed}, Attr Errors={overall_attr_errors}, SHA1 Skips={overall_sha1_skips}")
+                        try:
+                            attrs = self.fs.attr(path_for_storage)  # Use the corrected path
+                            self.log(self._("log_debug_attrs_received", filename=os.path.basename(path_for_storage),
+                                            attrs=str(attrs)[:100] + "...",
+                                            default=f"[Debug] Attrs for {os.path.basename(path_for_storage)}: {str(attrs)[:100]}..."))
+
+                            # --- Hash Handling ---
+                            file_hashes = _extract_hashes(attrs) # SHA1 and any other hash kinds
+                            file_sha1_standardized = file_hashes.get(HASH_KIND_SHA1)
+
+                            # --- Get Modification Time ---
+                            mod_time_str = attrs.get('writeTime')
+                            mod_time_dt = _parse_datetime(mod_time_str)
+                            if mod_time_str and mod_time_dt is None:
+                                self.log(self._("error_parse_date", path=path_for_storage,
+                                                error=f"unparseable string '{mod_time_str}'",
+                                                default=f"Warning: Could not parse date '{mod_time_str}' for {path_for_storage}"))
+                            elif not mod_time_str:
+                                mtime_ts = attrs.get('mtime')
+                                if isinstance(mtime_ts, (int, float)):
+                                    try:
+                                        mod_time_dt = datetime.fromtimestamp(mtime_ts, tz=timezone.utc)
+                                        self.log(f"[Debug] Used 'mtime' ({mtime_ts}) for {path_for_storage}")
+                                    except (ValueError, OSError):
+                                        self.log(
+                                            f"Warning: Could not convert 'mtime' timestamp ({mtime_ts}) for {path_for_storage}")
+                                        mod_time_dt = None
 
+                            # --- Get Size ---
+                            size_val = attrs.get('size', 0)
+                            try:
+                                file_size = int(size_val) if size_val is not None else 0
+                            except (ValueError, TypeError):
+                                self.log(self._("warning_size_invalid", size=size_val, path=path_for_storage,
+                                                default=f"Warning: Invalid size value '{size_val}' for {path_for_storage}. Using 0."))
+                                file_size = 0
+
+                            file_info = {
+                                'path': path_for_storage,
+                                'modified': mod_time_dt,
+                                'size': file_size,
+                                'sha1': file_sha1_standardized,
+                                'hashes': file_hashes
+                            }
+                            if not file_hashes and not hash_contents:
+                                path_files_skipped_no_sha1 += 1
+                                stats['sha1_skips'] += 1
+                                self.log(self._("log_debug_skipping_no_sha1",
+                                                filename=os.path.basename(path_for_storage),
+                                                default=f"[Debug] SKIPPING file {os.path.basename(path_for_storage)} due to missing/invalid SHA1."))
+                                if self._inventory_db is not None: self._record_inventory(file_info) # Listed without hashes
+                                continue  # Skip this file if SHA1 is invalid/missing
+                            if not file_hashes:
+                                unhashed_files.append(file_info)  # Hashed from its contents after the walk
+                                continue
+                            scanned_files.append(file_info)
+                            if self._inventory_db is not None: self._record_inventory(file_info)
+                            log_hash = file_sha1_standardized or next(iter(file_hashes.values()))
+                            self.log(self._("log_debug_storing_info", filename=os.path.basename(path_for_storage),
+                                            sha1=log_hash[:8] + "...",
+                                            default=f"[Debug] Storing info for {os.path.basename(path_for_storage)} ({log_hash[:8]}...)"))
+
+                        # --- Catch errors getting attributes for a specific file ---
+                        except FileNotFoundError as fnf_e:
+                            # This might be the specific error you are seeing if the path is wrong
+                            err_msg = self._("error_get_attrs", path=path_for_storage, error=fnf_e,
+                                             default=f"Error getting attributes/hash for '{path_for_storage}': {fnf_e}")
+                            self.log(err_msg)
+                            # Log the underlying error message which might contain more details from clouddrive library
+                            self.log(f"Attr Error Detail ({path_for_storage}): {fnf_e}")
+                            path_errors_getting_attrs += 1
+                            stats['attr_errors'] += 1
+                        except Exception as e:
+                            err_msg = self._("error_get_attrs", path=path_for_storage, error=e,
+                                             default=f"Error getting attributes/hash for '{path_for_storage}': {e}")
+                            self.log(err_msg)
+                            self.log(f"Attribute Error Details ({fs_dir_path}): {traceback.format_exc(limit=2)}")
+                            path_errors_getting_attrs += 1
+                            stats['attr_errors'] += 1
+
+                    # Log progress periodically per path
+                    if path_count % 200 == 0:
+                        self.log(self._("status_scan_progress", path=fs_dir_path, count=path_count,
+                                        video_count=path_video_files_checked,
+                                        default=f"Path '{fs_dir_path}': Scanned {path_count} items... Found {path_video_files_checked} videos."))
+
+            # --- Path Scan Finished ---
+            path_end_time = time.time()
+            path_duration = path_end_time - path_start_time
+            self.log(self._("status_scan_finished_duration", path=fs_dir_path, duration=path_duration,
+                            default=f"Scan for path '{fs_dir_path}' finished in {path_duration:.2f} seconds."))
+            self.log(self._("status_scan_summary_items", path=fs_dir_path, count=path_count,
+                            video_count=path_video_files_checked,
+                            default=f"Path '{fs_dir_path}': Total items encountered: {path_count}. Video files processed: {path_video_files_checked}."))
+
+            # Report errors/skips for this path
+            path_warning_parts = []
+            if path_errors_getting_attrs > 0: path_warning_parts.append(
+                f"{path_errors_getting_attrs} attribute errors")
+            if path_files_skipped_no_sha1 > 0: path_warning_parts.append(
+                f"{path_files_skipped_no_sha1} files skipped (no/invalid SHA1)")
+            if path_warning_parts:
+                self.log(self._("status_scan_warnings", path=fs_dir_path, details='; '.join(path_warning_parts),
+                                default=f"Path '{fs_dir_path}': WARNING: {'; '.join(path_warning_parts)}."))
+
+        except Exception as walk_e:
+            # Catch errors during the fs.walk_path() iteration itself for this path
+            err_msg = self._("error_scan_path", path=fs_dir_path, error=walk_e,
+                             default=f"Critical error walking cloud path '{fs_dir_path}': {walk_e}")
+            self.log(err_msg)
+            self.log(f"Walk Error Details ({fs_dir_path}): {traceback.format_exc()}")
+            self.log(self._("find_error_processing_path", path=fs_dir_path, error=walk_e,
+                            default=f"Error processing scan path '{fs_dir_path}': {walk_e}. Skipping this path."))
+        return stats
+
+    def _hash_file_contents(self, file_infos, hashed_files):
+        """
+        Hashing stage for scanned files the backend has no SHA1 for (on sources where fs.can_read_path).
+        Only files sharing their size with another scanned file can be duplicates. Those are first
+        compared by a cheap fingerprint: the size plus fs.fingerprint_sample_bytes read at the start
+        and end (and middle, for backends with fs.fingerprint_middle). Files already hashed by the
+        backend (`hashed_files`) join the comparison so a lone hashless copy of one of them is
+        detected too. Only hashless files whose fingerprint matches another file's are
+        read in full; files no bigger than the samples, or sharing their size with a hashed file
+        whose source cannot be read, are hashed in full straight away.
+        A full read also computes the other hash kinds its possible copies carry (e.g. MD5 when
+        a same-size file only has an MD5), so it can be linked to them.
+        Reads run on a pool of fs.read_workers threads; every fingerprint sample is a separate read,
+        so the ranges of one file are fetched concurrently. Sets 'sha1' and 'hashes' on the hashed
+        file_infos and returns (hashed file_infos, number of files left unhashed).
+        """
+        start_time = time.time()
+        fs = self.fs
+        sample_bytes = fs.fingerprint_sample_bytes
+        sample_count = 3 if fs.fingerprint_middle else 2
+        by_size = defaultdict(list)
+        for info in file_infos:
+            by_size[info['size']].append(info)
+        hashed_by_size = defaultdict(list)
+        for info in hashed_files:
+            if info['size'] in by_size: hashed_by_size[info['size']].append(info)
+
+        def peer_kinds(peers):
+            return frozenset(kind for peer in peers for kind in (peer.get('hashes') or ()))
+        full_candidates = [] # (hashless file, hash kinds of its possible copies), read in full
+        fingerprint_candidates = [] # Files compared by fingerprint first (hashless and, as peers, hashed)
+        for size, infos in by_size.items():
+            peers = hashed_by_size.get(size, [])
+            if len(infos) + len(peers) < 2: continue # Unique size: cannot be a duplicate
+            # Peers on sources that cannot be read have no fingerprint to compare against
+            if size <= sample_count * sample_bytes or not all(fs.can_read_path(peer['path']) for peer in peers):
+                kinds = peer_kinds(peers)
+                full_candidates.extend((info, kinds) for info in infos)
+            else: fingerprint_candidates.extend(infos + peers)
+        candidate_count = len(full_candidates) + sum(1 for info in fingerprint_candidates if not info.get('hashes'))
+        self.log(self._("hash_stage_start", candidates=candidate_count, total=len(file_infos),
+                        default=f"Hashing file contents: {candidate_count} of {len(file_infos)} file(s) without SHA1 share a size with another file..."))
+
+        errors = []
+        def read_safely(function, info):
+            try:
+                return function(info)
+            except Exception as e:
+                errors.append((info['path'], e))
+                return None
+        def sample_offsets(size):
+            offsets = [0, size - sample_bytes]
+            if sample_count == 3: offsets.insert(1, (size - sample_bytes) // 2)
+            return offsets
+        def sample_digest(sample):
+            # One range of a fingerprint; each range is a separate task, so a file's samples are read concurrently
+            info, offset = sample
+            try:
+                return hashlib.sha1(fs.read_range(info['path'], offset, sample_bytes)).digest()
+            except Exception as e:
+                return e
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, fs.read_workers), thread_name_prefix="hash") as executor:
+            by_fingerprint = defaultdict(list)
+            samples = [(info, offset) for info in fingerprint_candidates for offset in sample_offsets(info['size'])]
+            sample_digests = executor.map(sample_digest, samples)
+            for info in fingerprint_candidates:
+                digests = list(itertools.islice(sample_digests, sample_count))
+                failure = next((digest for digest in digests if isinstance(digest, Exception)), None)
+                if failure is not None:
+                    errors.append((info['path'], failure))
+                    continue
+                value = hashlib.sha1(str(info['size']).encode("ascii") + b"".join(digests)).hexdigest()
+                by_fingerprint[(info['size'], value)].append(info)
+            for infos in by_fingerprint.values():
+                if len(infos) > 1:
+                    kinds = peer_kinds(infos)
+                    full_candidates.extend((info, kinds) for info in infos if not info.get('hashes'))
+            def full_hash(candidate):
+                info, kinds = candidate
+                return read_safely(lambda item: fs.content_hashes(item['path'], kinds), info)
+            hashed = []
+            for (info, _kinds), hashes in zip(full_candidates, executor.map(full_hash, full_candidates)):
+                if hashes is None: continue
+                info['sha1'] = hashes[HASH_KIND_SHA1]
+                info['hashes'] = hashes
+                hashed.append(info)
+
+        for path, error in errors[:10]:
+            self.log(self._("hash_read_error", path=path, error=error, default=f"Could not read '{path}' for hashing: {error}"))
+        if len(errors) > 10:
+            self.log(self._("warning_delete_failures_more", count=len(errors) - 10, default=f"  ... and {len(errors) - 10} more."))
+        duration = time.time() - start_time
+        self.log(self._("hash_stage_done", duration=duration, partial=len(fingerprint_candidates), full=len(full_candidates), errors=len(errors),
+                        default=f"Content hashing done in {duration:.2f} seconds: {len(fingerprint_candidates)} partial fingerprint(s), {len(full_candidates)} full hash(es), {len(errors)} read error(s)."))
+        return hashed, len(file_infos) - len(hashed)
+
+    def find_near_duplicates(self):
+        """
+        Optional pass after a scan: groups videos of the last scan that have different hashes but similar
+        names and sizes (see find_near_duplicate_groups). Returns the candidate groups, largest first.
+        """
+        self.log(self._("near_dup_start", count=len(self.last_inventory),
+                        default=f"Searching {len(self.last_inventory)} videos (one per distinct hash) for similar names and sizes..."))
+        start_time = time.time()
+        groups = find_near_duplicate_groups(self.last_inventory)
+        duration = time.time() - start_time
+        file_count = sum(len(group['files']) for group in groups)
+        self.log(self._("near_dup_done", groups=len(groups), files=file_count, duration=duration,
+                        default=f"Found {len(groups)} group(s) of similar videos ({file_count} files) in {duration:.2f} seconds."))
+        return groups
+
+    def _collect_duplicates(self, all_potential_duplicates, overall_sha1_skips=0):
+        """
+        Final grouping step shared by cloud and dump scans: keeps the full inventory (files by SHA1)
+        in last_inventory and returns the sets with more than one file.
+        """
+        self.last_inventory = dict(all_potential_duplicates)
+        if self._inventory_db is not None: self._record_inventory_set_keys(all_potential_duplicates)
         # --- Filter Aggregated Results for Actual Duplicates (more than one file per hash) ---
         actual_duplicates = {sha1: files for sha1, files in all_potential_duplicates.items() if len(files) > 1}
 
@@ -1058,46 +2549,304 @@ class DuplicateFileFinder:
 
         return actual_duplicates  # Return ALL found duplicates for GUI to display
 
-    def write_duplicates_report(self, duplicate_sets, output_file):
-        """ Writes the dictionary of found duplicate file sets (as currently displayed) to a text file. """
+    @staticmethod
+    def _open_dump(dump_path):
+        """ Opens a dump for streaming text reads (gzip if it ends with .gz). Returns (file, format): 'csv' or 'json'. """
+        name = dump_path.lower()
+        compressed = name.endswith(".gz")
+        if compressed: name = name[:-3]
+        dump_format = "csv" if name.endswith(".csv") else "json"
+        if compressed:
+            return gzip.open(dump_path, "rt", encoding="utf-8-sig", newline=""), dump_format
+        return open(dump_path, "r", encoding="utf-8-sig", newline="", buffering=REPORT_WRITE_BUFFER_BYTES), dump_format
+
+    @staticmethod
+    def _iter_json_values(f):
+        """
+        Yields the values of a JSON dump one at a time without loading the file: either a top-level
+        array (decoded element by element) or a sequence of values such as JSON Lines.
+        Raises ValueError on malformed input, including any value longer than DUMP_MAX_VALUE_CHARS.
+        """
+        decoder = json.JSONDecoder()
+        buffer = f.read(DUMP_READ_CHUNK_CHARS)
+        eof = not buffer
+        pos = 0
+        in_array = None # Decided by the first non-whitespace character
+        expect_comma = after_comma = False # Array state: a value was just read / a ',' was just read
+        while True:
+            # Skip whitespace, reading more text when the buffer runs out
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer) or eof: break
+                buffer, pos = f.read(DUMP_READ_CHUNK_CHARS), 0
+                eof = not buffer
+            if pos >= len(buffer):
+                if in_array: raise ValueError("unterminated JSON array")
+                return
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                    continue
+            if in_array:
+                if buffer[pos] == ',':
+                    if not expect_comma: raise ValueError("unexpected ',' in JSON array")
+                    expect_comma, after_comma = False, True
+                    pos += 1
+                    continue
+                if buffer[pos] == ']':
+                    if after_comma: raise ValueError("trailing ',' in JSON array")
+                    return
+                if expect_comma: raise ValueError("missing ',' between JSON array elements")
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                complete = end < len(buffer) or eof # A value ending at the buffer edge may continue (e.g. a number)
+            except ValueError:
+                if eof: raise
+                complete = False
+            if not complete:
+                if len(buffer) - pos > DUMP_MAX_VALUE_CHARS: # Malformed, or not a per-file dump; stop before reading it all
+                    raise ValueError(f"JSON value exceeds {DUMP_MAX_VALUE_CHARS} characters or is malformed")
+                more = f.read(DUMP_READ_CHUNK_CHARS)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            pos = end
+            expect_comma, after_comma = bool(in_array), False
+            yield value
+
+    @staticmethod
+    def _dump_field_map(keys):
+        """ Maps each DUMP_FIELD_NAMES field to the first matching key in `keys` (or None). """
+        by_lower = {}
+        for key in keys:
+            if isinstance(key, str): by_lower.setdefault(key.strip().lower(), key)
+        return {field: next((by_lower[name] for name in names if name in by_lower), None)
+                for field, names in DUMP_FIELD_NAMES.items()}
+
+    def _iter_dump_records(self, dump_path):
+        """
+        Yields one dict per file from a dump: CSV rows, or JSON objects from an array or JSON Lines.
+        Objects with a "files" list (as written by the .jsonl report export) yield one record per
+        file; files of older reports without their own SHA1 inherit the object's.
+        """
+        f, dump_format = self._open_dump(dump_path)
+        with f:
+            if dump_format == "csv":
+                yield from csv.DictReader(f)
+                return
+            for value in self._iter_json_values(f):
+                if not isinstance(value, dict): continue
+                files = value.get("files")
+                if isinstance(files, list):
+                    for file_record in files:
+                        if isinstance(file_record, dict):
+                            if value.get("sha1") and "sha1" not in file_record:
+                                file_record["sha1"] = value["sha1"]
+                            yield file_record
+                else:
+                    yield value
+
+    def _scan_dump(self, dump_path):
+        """
+        Builds the SHA1 index from a local directory-tree dump (JSON array, JSON Lines or CSV, optionally
+        gzipped) with paths, sizes and SHA1s, instead of walking the cloud drive. Records are stream-parsed
+        and grouped like _scan_for_duplicates, so rules, reports and snapshots work the same; no API calls
+        are made. Paths are taken as cloud paths; folders in excluded_paths are skipped.
+        """
+        dump_name = os.path.basename(dump_path)
+        self.log(self._("dump_scan_starting", file=dump_name, default=f"Reading directory dump {dump_name} (offline, no CloudDrive2 calls)..."))
+        start_time = time.time()
+        dump_files = [] # Grouped by their hashes at the end, like scanned files
+        record_count = video_count = sha1_skips = invalid_count = 0
+        field_maps = {} # Key tuple -> field map (records of one dump almost always share their keys)
+        excluded_folders = {} # Folder -> excluded?
+        self.scan_roots = []
+        try:
+            for record in self._iter_dump_records(dump_path):
+                record_count += 1
+                if record_count % DUMP_PROGRESS_INTERVAL == 0:
+                    self.log(self._("dump_scan_progress", file=dump_name, count=record_count, video_count=video_count,
+                                    default=f"Dump {dump_name}: read {record_count} records... Found {video_count} videos."))
+                keys = tuple(record)
+                field_map = field_maps.get(keys)
+                if field_map is None:
+                    field_map = field_maps[keys] = self._dump_field_map(keys)
+
+                raw_path = record.get(field_map["path"]) if field_map["path"] else None
+                if not isinstance(raw_path, str) or not raw_path.strip():
+                    invalid_count += 1
+                    continue
+                path = raw_path.strip().replace('\\', '/')
+                if not path.startswith('/'): path = '/' + path
+                if '//' in path: path = re.sub('/{2,}', '/', path)
+                if len(path) > 1: path = path.rstrip('/')
+                if os.path.splitext(path)[1].lower() not in VIDEO_EXTENSIONS: continue
+                folder = path.rpartition('/')[0] or '/'
+                excluded = excluded_folders.get(folder)
+                if excluded is None:
+                    excluded = excluded_folders[folder] = self._is_excluded(folder)
+                if excluded: continue
+                video_count += 1
+
+                file_hashes = {}
+                for field in ("hashes", "sha1"): # A sha1 field may also hold a '<KIND>:<value>' set key
+                    value = record.get(field_map[field]) if field_map[field] else None
+                    if isinstance(value, str) and value: file_hashes.update(_parse_hashes(value))
+                if 'fileHashes' in record: # CloudDrive attr() style record
+                    file_hashes.update(_extract_hashes(record))
+
+                size_val = record.get(field_map["size"]) if field_map["size"] else None
+                try:
+                    file_size = int(size_val) if size_val not in (None, "") else 0
+                except (ValueError, TypeError):
+                    invalid_count += 1
+                    continue
+
+                modified = record.get(field_map["modified"]) if field_map["modified"] else None
+                mod_time_dt = None
+                if isinstance(modified, str) and modified:
+                    mod_time_dt = _parse_datetime(modified)
+                    if mod_time_dt is None:
+                        try: modified = float(modified) # Epoch seconds written as text (CSV)
+                        except ValueError: pass
+                if isinstance(modified, (int, float)) and not isinstance(modified, bool):
+                    try: mod_time_dt = datetime.fromtimestamp(modified, tz=timezone.utc)
+                    except (ValueError, OSError, OverflowError): mod_time_dt = None
+
+                file_info = {
+                    'path': path,
+                    'modified': mod_time_dt,
+                    'size': file_size,
+                    'sha1': file_hashes.get(HASH_KIND_SHA1),
+                    'hashes': file_hashes
+                }
+                if self._inventory_db is not None: self._record_inventory(file_info) # Hashless files too
+                if not file_hashes:
+                    sha1_skips += 1
+                    continue
+                dump_files.append(file_info)
+        except (OSError, ValueError, csv.Error) as e: # Includes JSON decoding, encoding and gzip errors
+            self.log(self._("dump_scan_error", file=dump_name, error=e, default=f"Could not read directory dump {dump_name}: {e}"))
+            return {}
+
+        duration = time.time() - start_time
+        self.log(self._("dump_scan_summary", file=dump_name, duration=duration, count=record_count, video_count=video_count,
+                        sha1_skips=sha1_skips, invalid=invalid_count,
+                        default=f"Dump {dump_name} read in {duration:.2f} seconds: {record_count} records, {video_count} videos, {sha1_skips} without SHA1, {invalid_count} invalid."))
+        return self._collect_duplicates(_group_by_hashes(dump_files), sha1_skips)
+
+    @staticmethod
+    def report_format(output_file):
+        """ Returns (format, compressed) for a report path: format is 'csv', 'jsonl' or 'txt'; '.gz' means gzip. """
+        name = output_file.lower()
+        compressed = name.endswith(".gz")
+        if compressed: name = name[:-3]
+        if name.endswith(".csv"): return "csv", compressed
+        if name.endswith((".jsonl", ".ndjson")): return "jsonl", compressed
+        return "txt", compressed
+
+    def _report_text_formatters(self):
+        """
+        Translated text-report templates, looked up once per export (not per file).
+        Returns (header, set header template, file label, details template).
+        """
+        default_set_header = "Set {index} (SHA1: {sha1}) - {count} files"
+        default_details = "    (Path: {path}, Modified: {modified}, Size: {size_mb:.2f} MB)"
+        set_header = self._("save_report_set_header", default=default_set_header)
+        details = self._("save_report_details_label", default=default_details)
+        try: # A broken translation must not abort the export
+            set_header.format(index=1, sha1="", count=2)
+        except (KeyError, IndexError, ValueError):
+            set_header = default_set_header
+        try:
+            details.format(path="", modified="", size_mb=0.0)
+        except (KeyError, IndexError, ValueError):
+            details = default_details
+        return (self._("save_report_header", default="Duplicate Video File Sets Found (Based on SHA1):"),
+                set_header, self._("save_report_file_label", default="  - File:"), details)
+
+    def write_duplicates_report(self, duplicate_sets, output_file, progress_callback=None, stop_event=None):
+        """
+        Streams the found duplicate sets (as currently displayed) to a report file. The format follows
+        the extension: .csv (one row per file), .jsonl (one JSON object per set) or plain text;
+        a trailing .gz compresses it. Sets are formatted in chunks and written with large buffered
+        writes into '<file>.part', which replaces `output_file` only when complete.
+        `progress_callback(done_sets, total_sets)` is called after each chunk; setting `stop_event`
+        cancels the export. Safe to call from a worker thread. Returns True on success.
+        """
         if not duplicate_sets:
              self.log(self._("save_report_no_data", default="No duplicate sets found to save."))
              return False
+        report_format, compressed = self.report_format(output_file)
+        # Sort sets by SHA1 for consistent report order (matches the results list numbering)
+        sorted_sha1s = sorted(sha1 for sha1, files_in_set in duplicate_sets.items() if files_in_set and len(files_in_set) > 1)
+        total_sets = len(sorted_sha1s)
+        if report_format == "txt":
+            header, set_header_template, file_label, details_template = self._report_text_formatters()
+        temp_file = output_file + ".part"
+        completed = False
         try:
-            with open(output_file, "w", encoding='utf-8') as f:
-                header = self._("save_report_header", default="Duplicate Video File Sets Found (Based on SHA1):")
-                f.write(f"{header}\n===================================================\n\n")
-                set_count = 0
-                # Sort sets by SHA1 for consistent report order
-                sorted_sha1s = sorted(duplicate_sets.keys())
-
-                for sha1 in sorted_sha1s:
-                    files_in_set = duplicate_sets[sha1]
-                    # Basic check (should be > 1 based on GUI logic, but double check)
-                    if not files_in_set or len(files_in_set) < 2: continue
-
-                    set_count += 1
-                    set_header = self._("save_report_set_header", index=set_count, sha1=sha1, count=len(files_in_set), default=f"Set {set_count} (SHA1: {sha1}) - {len(files_in_set)} files")
-                    f.write(f"{set_header}\n")
+            if compressed:
+                f = gzip.open(temp_file, "wt", encoding='utf-8', newline='', compresslevel=6)
+            else:
+                f = open(temp_file, "w", encoding='utf-8', newline='', buffering=REPORT_WRITE_BUFFER_BYTES)
+            with f:
+                buffer = io.StringIO()
+                csv_writer = csv.writer(buffer) if report_format == "csv" else None
+                if csv_writer:
+                    csv_writer.writerow(REPORT_CSV_COLUMNS)
+                elif report_format == "txt":
+                    buffer.write(f"{header}\n===================================================\n\n")
+
+                for set_index, sha1 in enumerate(sorted_sha1s, start=1):
                     # Sort files within the set by path for readability
-                    sorted_files = sorted(files_in_set, key=lambda item: item.get('path', ''))
-
-                    for file_info in sorted_files:
-                         file_label = self._("save_report_file_label", default="  - File:")
-                         mod_time_obj = file_info.get('modified')
-                         # Format datetime object or use N/A
-                         mod_time_str = mod_time_obj.strftime(DATE_FORMAT) if isinstance(mod_time_obj, datetime) else "N/A"
-                         size_bytes = file_info.get('size')
-                         # Calculate size safely
-                         size_mb = size_bytes / (1024 * 1024) if isinstance(size_bytes, (int, float)) and size_bytes > 0 else 0.0
-                         details_label = self._("save_report_details_label",
-                                                path=file_info.get('path', 'N/A'),
-                                                modified=mod_time_str,
-                                                size_mb=size_mb,
-                                                default=f"    (Path: {file_info.get('path', 'N/A')}, Modified: {mod_time_str}, Size: {size_mb:.2f} MB)")
-                         f.write(f"{file_label}\n{details_label}\n")
-                    f.write("\n") # Blank line between sets
-
+                    files_in_set = sorted(duplicate_sets[sha1], key=lambda item: item.get('path', ''))
+                    if report_format == "jsonl":
+                        files_json = [{"path": info.get('path'),
+                                       "modified": info['modified'].isoformat() if isinstance(info.get('modified'), datetime) else None,
+                                       "size": info.get('size'), "sha1": info.get('sha1'),
+                                       "hashes": _format_hashes(info.get('hashes') or {})} for info in files_in_set]
+                        buffer.write(json.dumps({"set": set_index, "set_key": sha1, "files": files_json}, ensure_ascii=False))
+                        buffer.write("\n")
+                    elif csv_writer:
+                        count = len(files_in_set)
+                        csv_writer.writerows(
+                            (set_index, info.get('sha1') or "", count, info.get('path', ''),
+                             info['modified'].isoformat() if isinstance(info.get('modified'), datetime) else "",
+                             info.get('size', ''), _format_hashes(info.get('hashes') or {}))
+                            for info in files_in_set)
+                    else:
+                        lines = [set_header_template.format(index=set_index, sha1=sha1, count=len(files_in_set))]
+                        for info in files_in_set:
+                            mod_time_obj = info.get('modified')
+                            size_bytes = info.get('size')
+                            lines.append(file_label)
+                            lines.append(details_template.format(
+                                path=info.get('path', 'N/A'),
+                                modified=mod_time_obj.strftime(DATE_FORMAT) if isinstance(mod_time_obj, datetime) else "N/A",
+                                size_mb=size_bytes / (1024 * 1024) if isinstance(size_bytes, (int, float)) and size_bytes > 0 else 0.0))
+                        lines.append("\n") # Blank line between sets
+                        buffer.write("\n".join(lines))
+
+                    if set_index % REPORT_SETS_PER_WRITE == 0 or set_index == total_sets:
+                        f.write(buffer.getvalue())
+                        buffer.seek(0)
+                        buffer.truncate()
+                        if progress_callback: progress_callback(set_index, total_sets)
+                        if stop_event is not None and stop_event.is_set():
+                            break
+                else:
+                    completed = True
+                if not total_sets: # Nothing but the header
+                    f.write(buffer.getvalue())
+                    completed = True
+
+            if not completed:
+                self.log(self._("save_report_cancelled", default="Report export cancelled; partial file removed."))
+                return False
+            os.replace(temp_file, output_file)
             save_msg = self._("save_report_saved", file=output_file, default=f"Report saved successfully to: {output_file}")
             self.log(save_msg)
             return True
@@ -1111,13 +2860,309 @@ class DuplicateFileFinder:
              self.log(error_msg)
              self.log(f"Report Save Unexpected Error Details: {traceback.format_exc()}")
              return False
+        finally:
+            if not completed and os.path.exists(temp_file):
+                try: os.remove(temp_file)
+                except OSError: pass
+
+
+    def _is_excluded(self, folder):
+        """ True if `folder` is one of self.excluded_paths or lies below one. """
+        folder = folder.replace('\\', '/').rstrip('/')
+        excluded_paths = self.excluded_paths
+        if self.fs is not None and excluded_paths: # Excluded folders exist once per source
+            excluded_paths = [path for excluded in excluded_paths for path in self.fs.source_paths(excluded)]
+        for excluded in excluded_paths:
+            excluded = excluded.replace('\\', '/').rstrip('/')
+            if excluded and (folder == excluded or folder.startswith(excluded + '/')):
+                return True
+        return False
+
+    def verify_plan(self, plan_sets, only_paths=None, max_workers=DELETE_MAX_WORKERS):
+        """
+        Re-fetches attributes (concurrently) for the files of a deletion plan and their kept partners,
+        just before removal. A set passes if at least one kept file still exists with the set's SHA1
+        and its scanned size; otherwise all its files are rejected. Files to delete that no longer match are
+        rejected individually. `plan_sets` uses the DeletionJournal set layout; `only_paths` limits
+        the check to those files to delete (e.g. the remaining ones when resuming).
+        Returns {rejected path: reason}.
+        """
+        if not self.fs: return {}
+        wanted = set(only_paths) if only_paths is not None else None
+        checks = [] # (plan_set, delete paths to check)
+        for plan_set in plan_sets:
+            delete_paths = [p for p in plan_set.get("delete", []) if wanted is None or p in wanted]
+            if delete_paths: checks.append((plan_set, delete_paths))
+        paths_to_fetch = list(dict.fromkeys(path for plan_set, delete_paths in checks
+                                            for path in itertools.chain(plan_set.get("keep", []), delete_paths)))
+        self.log(self._("status_verify_start", sets=len(checks), count=len(paths_to_fetch),
+                        default=f"Verifying {len(checks)} duplicate set(s) ({len(paths_to_fetch)} files) against the cloud before removal..."))
+
+        fs = self.fs
+        def fetch(path):
+            try:
+                path = path.replace('\\', '/')
+                attrs = fs.attr(path)
+                if not _extract_hashes(attrs) and fs.can_read_path(path): # No stored hash: hash the contents (cached if unchanged)
+                    attrs = dict(attrs, fileHashes={HASH_KIND_SHA1: fs.content_sha1(path)})
+                return attrs
+            except Exception:
+                return None # Missing or unreadable: treated as changed
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="verify") as executor:
+            attrs_by_path = dict(zip(paths_to_fetch, executor.map(fetch, paths_to_fetch)))
+
+        reason_keep = self._("verify_reason_keep", default="kept copy is missing or no longer matches (SHA1/size)")
+        reason_changed = self._("verify_reason_changed", default="file is missing or no longer matches its set (SHA1/size)")
+        rejected = {}
+        for plan_set, delete_paths in checks:
+            key_hashes = _hashes_of_set_key(plan_set.get("sha1"))
+            scanned_hashes = plan_set.get("hashes", {}) # Per file; older plans only have the set key
+            sizes = plan_set.get("sizes", {})
+            def matches(path):
+                attrs = attrs_by_path.get(path)
+                if attrs is None or not _hashes_agree(_extract_hashes(attrs), scanned_hashes.get(path) or key_hashes): return False
+                expected_size = sizes.get(path) # Scanned size; unknown sizes only check the SHA1
+                return not isinstance(expected_size, (int, float)) or _extract_size(attrs) == expected_size
+            delete_set = set(plan_set.get("delete", []))
+            if not any(matches(kept) for kept in plan_set.get("keep", []) if kept not in delete_set):
+                rejected.update((path, reason_keep) for path in delete_paths)
+                continue
+            rejected.update((path, reason_changed) for path in delete_paths if not matches(path))
+
+        for path, reason in itertools.islice(rejected.items(), 10):
+            self.log(self._("verify_skipped_file", path=path, reason=reason, default=f"Skipped {path}: {reason}"))
+        if len(rejected) > 10:
+            self.log(self._("warning_delete_failures_more", count=len(rejected) - 10, default=f"  ... and {len(rejected) - 10} more."))
+        checked_count = sum(len(delete_paths) for _plan_set, delete_paths in checks)
+        self.log(self._("status_verify_done", ok=checked_count - len(rejected), skipped=len(rejected),
+                        default=f"Verification done: {checked_count - len(rejected)} file(s) confirmed, {len(rejected)} file(s) skipped because their set changed since the scan."))
+        return rejected
+
+    def _cleanup_roots(self):
+        """ Cloud scan roots that bound folder removal (from the last scan, else from the configured paths). """
+        if self.scan_roots:
+            return list(self.scan_roots)
+        roots = []
+        for raw_path, mount_point, source in self._scan_targets():
+            root = self.calculate_fs_path(raw_path, mount_point)
+            if root: roots.append(self.fs.tag_path(source, root) if source is not None else root)
+        return roots
+
+    @staticmethod
+    def _is_below_root(folder, roots):
+        """ True if `folder` lies strictly inside one of `roots` (a root itself is never removable). """
+        folder = folder.rstrip('/')
+        for root in roots:
+            root = root.replace('\\', '/').rstrip('/')
+            if folder.startswith(root + '/') and folder != root:
+                return True
+        return False
+
+    def _remove_tree(self, folder):
+        """ Removes a folder and its contents with a single call. """
+        self.fs.rmtree(folder)
+
+    def _find_whole_folders(self, files_by_folder, roots, executor):
+        """
+        Returns the folders (keys of files_by_folder) whose current listing consists exactly of the
+        files to delete, so the whole folder can go in one call. Listings run on `executor`.
+        """
+        candidates = [folder for folder, paths in files_by_folder.items()
+                      if len(paths) > 1 and self._is_below_root(folder, roots) and not self._is_excluded(folder)]
+        is_whole = lambda folder: self._folder_holds_only(folder, files_by_folder[folder])
+        return {folder for folder, whole in zip(candidates, executor.map(is_whole, candidates)) if whole}
 
+    def _folder_holds_only(self, folder, paths):
+        """ True if the current listing of `folder` is exactly the files in `paths` (False if it cannot be listed). """
+        try:
+            entries = {str(name).rstrip('/').rpartition('/')[2] for name in self.fs.listdir(folder)}
+        except Exception:
+            return False
+        return entries == {path.replace('\\', '/').rpartition('/')[2] for path in paths}
+
+    def remove_empty_folders(self, folders, max_workers=DELETE_MAX_WORKERS):
+        """
+        Bottom-up cleanup after a removal run: deletes folders from `folders` that are now empty,
+        then their parents, one depth level at a time (each level is one concurrent batch).
+        Scan roots and anything outside them are never removed. Returns the number removed.
+        """
+        if not self.fs: return 0
+        roots = self._cleanup_roots()
+        pending = {folder.rstrip('/') for folder in folders if self._is_below_root(folder, roots)}
+        fs = self.fs
+        def remove_if_empty(folder):
+            try:
+                if fs.listdir(folder): return False
+                fs.rmdir(folder)
+                return True
+            except Exception:
+                return False # Already gone, not empty, or not permitted: leave it
+        removed_count = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="cleanup") as executor:
+            while pending:
+                depth = max(folder.count('/') for folder in pending)
+                level = [folder for folder in pending if folder.count('/') == depth]
+                pending.difference_update(level)
+                for folder, removed in zip(level, executor.map(remove_if_empty, level)):
+                    if not removed: continue
+                    removed_count += 1
+                    parent = folder.rpartition('/')[0]
+                    if self._is_below_root(parent, roots): pending.add(parent)
+        if removed_count:
+            self.log(self._("status_empty_folders_removed", count=removed_count, default=f"Removed {removed_count} empty folder(s)."))
+        return removed_count
+
+    def _move_into_folder(self, source_paths, dest_dir):
+        """
+        Moves files into `dest_dir` with server-side moves. Tries one batched move (e.g. a CloudDrive2
+        MoveFile call), falling back to fs.move per file.
+        Returns a list with one error (or None on success) per source path.
+        """
+        try:
+            if self.fs.move_batch(source_paths, dest_dir):
+                return [None] * len(source_paths)
+        except Exception as e:
+            self.log(self._("warning_batch_move_failed", dest=dest_dir, error=e, default=f"Batch move into '{dest_dir}' failed ({e}); moving files one by one."))
+        errors = []
+        for source_path in source_paths:
+            try:
+                self.fs.move(source_path, _build_full_path(dest_dir, source_path.rpartition('/')[2]))
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
 
-    def delete_files(self, files_to_delete):
+    def quarantine_path_error(self, quarantine_root):
         """
-        Deletes a list of file paths from the cloud drive.
+        Why `quarantine_root` cannot be used as the quarantine folder (a translated message), or None.
+        Purging removes the whole folder, so it must not be the drive root, a scan root, a parent of one
+        or a folder inside one. Call while connected; with several sources every source is checked.
+        """
+        folder = (quarantine_root or '').replace('\\', '/').rstrip('/')
+        if not folder:
+            return self._("error_quarantine_path_root", path=quarantine_root, default=f"The quarantine folder cannot be the drive root ('{quarantine_root}').")
+        folders = [path.replace('\\', '/').rstrip('/') for path in self.fs.source_paths(folder)] if self.fs is not None else [folder]
+        for root in self._cleanup_roots():
+            root_norm = root.replace('\\', '/').rstrip('/')
+            for candidate in folders:
+                if (candidate == root_norm or root_norm.startswith(candidate + '/')
+                        or candidate.startswith(root_norm + '/')):
+                    return self._("error_quarantine_path_overlap", path=quarantine_root, root=root,
+                                  default=f"The quarantine folder '{quarantine_root}' overlaps the scan path '{root}'. Choose a folder outside the scanned folders.")
+        return None
+
+    def quarantine_files(self, files_to_move, quarantine_root, file_sizes=None, result_callback=None, max_workers=DELETE_MAX_WORKERS, stop_event=None):
+        """
+        Moves files into `quarantine_root`, mirroring their source folders (/a/b/x.mkv -> <root>/a/b/x.mkv).
+        Files are grouped by source directory so each folder is one batched move; the largest
+        groups go first. `result_callback` and `stop_event` behave as in delete_files.
+        Returns tuple: (moved_count, total_attempted).
+        """
+        if not self.fs:
+            self.log(self._("error_not_connected", default="Error: Not connected to CloudDrive. Cannot move files."))
+            return 0, 0
+        total_to_move = len(files_to_move)
+        if total_to_move == 0:
+            self.log(self._("status_delete_no_files", default="No files provided for deletion."))
+            return 0, 0
+        path_error = self.quarantine_path_error(quarantine_root)
+        if path_error:
+            self.log(path_error)
+            return 0, total_to_move
+
+        file_sizes = file_sizes or {}
+        groups = defaultdict(list)
+        for file_path in files_to_move:
+            groups[file_path.replace('\\', '/').rpartition('/')[0]].append(file_path)
+        def group_size(item):
+            return sum(size for size in (file_sizes.get(p) for p in item[1]) if isinstance(size, (int, float)))
+        ordered_groups = sorted(groups.items(), key=group_size, reverse=True)
+
+        fs = self.fs
+        def move_group(source_dir, paths):
+            dest_dir = fs.mirror_path(quarantine_root, source_dir)
+            fs.makedirs(dest_dir, exist_ok=True)
+            return self._move_into_folder([p.replace('\\', '/') for p in paths], dest_dir)
+
+        moved_count, processed, errors_moving = 0, 0, []
+        next_progress_time = time.time() + DELETE_PROGRESS_INTERVAL_SECONDS
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ordered_groups))), thread_name_prefix="quarantine") as executor:
+            futures = {executor.submit(move_group, source_dir, paths): paths for source_dir, paths in ordered_groups}
+            for future in concurrent.futures.as_completed(futures):
+                if stop_event is not None and stop_event.is_set():
+                    for pending in futures:
+                        pending.cancel() # Groups not started yet stay in the plan
+                if future.cancelled(): continue
+                paths = futures[future]
+                group_error = future.exception()
+                errors = [group_error] * len(paths) if group_error else future.result()
+                for file_path, error in zip(paths, errors):
+                    processed += 1
+                    if error is None:
+                        moved_count += 1
+                    else:
+                        self.log(self._("move_error_file", path=file_path, error=error, default=f"Error moving {file_path}: {error}"))
+                        errors_moving.append(file_path)
+                    if result_callback:
+                        result_callback(file_path, error)
+                if time.time() >= next_progress_time:
+                    next_progress_time = time.time() + DELETE_PROGRESS_INTERVAL_SECONDS
+                    self.log(self._("status_quarantine_progress", done=processed, total=total_to_move, failed=len(errors_moving),
+                                    default=f"Quarantining... {processed}/{total_to_move} processed, {len(errors_moving)} failed."))
+
+        if processed == total_to_move and moved_count:
+            self.remove_empty_folders(groups)
+        if processed < total_to_move:
+            self.log(self._("delete_stopped", done=processed, total=total_to_move, default=f"Stopped: {processed} of {total_to_move} files processed. Use 'Resume Deletion' to continue."))
+        else:
+            self.log(self._("quarantine_finished", moved_count=moved_count, total=total_to_move, path=quarantine_root,
+                            default=f"Quarantine complete. Moved {moved_count} of {total_to_move} files to '{quarantine_root}'."))
+        if errors_moving:
+            self.log(self._("warning_quarantine_failures", count=len(errors_moving), default=f"WARNING: Failed to move {len(errors_moving)} file(s):"))
+            for failed_path in errors_moving[:10]:
+                self.log(f"  - {failed_path}")
+            if len(errors_moving) > 10:
+                self.log(self._("warning_delete_failures_more", count=len(errors_moving) - 10, default=f"  ... and {len(errors_moving) - 10} more."))
+        return moved_count, total_to_move
+
+    def purge_quarantine(self, quarantine_root):
+        """
+        Permanently removes the quarantine folder and its contents in one call (per source when there
+        are several). Returns True on success.
+        """
+        if not self.fs:
+            self.log(self._("error_not_connected", default="Error: Not connected to CloudDrive."))
+            return False
+        path_error = self.quarantine_path_error(quarantine_root)
+        if path_error:
+            self.log(path_error)
+            return False
+        self.log(self._("status_purging", path=quarantine_root, default=f"Purging quarantine folder '{quarantine_root}'..."))
+        purged = True
+        folders = self.fs.source_paths(quarantine_root)
+        for folder in folders:
+            if len(folders) > 1:
+                try: self.fs.attr(folder)
+                except Exception: continue # Nothing was quarantined in this source
+            try:
+                self._remove_tree(folder)
+            except Exception as e:
+                self.log(self._("error_purge", path=folder, error=e, default=f"Could not purge quarantine folder '{folder}': {e}"))
+                purged = False
+        if not purged: return False
+        self.log(self._("purge_finished", path=quarantine_root, default=f"Quarantine folder '{quarantine_root}' purged."))
+        return True
+
+    def delete_files(self, files_to_delete, file_sizes=None, result_callback=None, max_workers=DELETE_MAX_WORKERS, stop_event=None):
+        """
+        Deletes a list of file paths from the cloud drive using a bounded pool of worker threads.
+        Removals are grouped by parent folder, largest folders (per `file_sizes`, {path: bytes}) first.
+        A folder whose whole content is marked is removed with one call; afterwards folders left
+        empty are cleaned up bottom-up (never above the scan roots).
+        `result_callback(path, error)` is called from the calling thread for every finished file
+        (error is None on success). Progress is logged as a throttled summary.
+        Setting `stop_event` stops submitting new work; work already in progress still finishes.
         Returns tuple: (deleted_count, total_attempted).
-        Logs progress and errors using the translator.
         """
         if not self.fs:
             self.log(self._("error_not_connected", default="Error: Not connected to CloudDrive. Cannot delete files."))
@@ -1133,24 +3178,91 @@ class DuplicateFileFinder:
 
         self.log(self._("status_delete_attempting", count=total_to_delete, default=f"Attempting to delete {total_to_delete} marked files..."))
 
-        for i, file_path in enumerate(files_to_delete):
-            # Ensure forward slashes for the API call
-            cloud_path = file_path.replace('\\', '/')
-            self.log(self._("status_deleting_file", current=i+1, total=total_to_delete, path=cloud_path, default=f"Deleting [{i+1}/{total_to_delete}]: {cloud_path}"))
-            try:
-                self.fs.remove(cloud_path)
-                deleted_count += 1
-                # Optional: Small delay to potentially avoid rate limiting (consider removing if not needed)
-                # time.sleep(0.05)
-            except Exception as e:
-                error_log_msg = self._("delete_error_file", path=cloud_path, error=e, default=f"Error deleting {cloud_path}: {e}")
-                self.log(error_log_msg)
-                errors_deleting.append(cloud_path) # Record the failed path
-                # Optional: Add traceback logging here if needed for debugging delete errors
-                # self.log(f"Deletion Error Detail ({cloud_path}): {traceback.format_exc(limit=1)}")
-
-        finish_msg = self._("delete_finished", deleted_count=deleted_count, total_marked=total_to_delete, default=f"Deletion complete. Successfully deleted {deleted_count} of {total_to_delete} marked files.")
-        self.log(finish_msg)
+        file_sizes = file_sizes or {}
+        def size_of(path):
+            size = file_sizes.get(path)
+            return size if isinstance(size, (int, float)) and size > 0 else 0
+        files_by_folder = defaultdict(list)
+        for file_path in files_to_delete:
+            files_by_folder[file_path.replace('\\', '/').rpartition('/')[0] or '/'].append(file_path)
+        folder_sizes = {folder: sum(size_of(p) for p in paths) for folder, paths in files_by_folder.items()}
+
+        fs = self.fs
+        def remove_unit(folder, paths, whole_folder):
+            """ Returns one error (or None) per path. """
+            # Re-listed right before the rmtree: a file added since the first listing (e.g. by a sync) must survive
+            if whole_folder and self._folder_holds_only(folder, paths):
+                self._remove_tree(folder)
+                return [None] * len(paths)
+            errors = []
+            for file_path in paths:
+                try:
+                    fs.remove(file_path.replace('\\', '/')) # Ensure forward slashes for the API call
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+            return errors
+
+        freed_bytes = 0
+        processed = 0
+        next_progress_time = time.time() + DELETE_PROGRESS_INTERVAL_SECONDS
+        max_workers = max(1, min(max_workers, total_to_delete))
+        # Keep a bounded window of submitted work so huge plans don't create one future per file up front
+        window_size = max_workers * 4
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="delete") as executor:
+            whole_folders = self._find_whole_folders(files_by_folder, self._cleanup_roots(), executor)
+            if whole_folders:
+                self.log(self._("status_delete_whole_folders", count=len(whole_folders),
+                                default=f"{len(whole_folders)} folder(s) contain only files marked 'Delete' and will be removed with one call each."))
+            # Work units: (folder, [paths], whole_folder), grouped by folder, biggest folders first
+            def work_units():
+                for folder in sorted(files_by_folder, key=folder_sizes.get, reverse=True):
+                    paths = files_by_folder[folder]
+                    if folder in whole_folders:
+                        yield folder, paths, True
+                    else:
+                        for file_path in sorted(paths, key=size_of, reverse=True):
+                            yield folder, [file_path], False
+            unit_iter = work_units()
+            in_flight = {}
+            for unit in itertools.islice(unit_iter, window_size):
+                in_flight[executor.submit(remove_unit, *unit)] = unit
+            while in_flight:
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    _folder, paths, _whole = in_flight.pop(future)
+                    unit_error = future.exception()
+                    errors = [unit_error] * len(paths) if unit_error else future.result()
+                    for file_path, error in zip(paths, errors):
+                        processed += 1
+                        if error is None:
+                            deleted_count += 1
+                            freed_bytes += size_of(file_path)
+                        else:
+                            cloud_path = file_path.replace('\\', '/')
+                            self.log(self._("delete_error_file", path=cloud_path, error=error, default=f"Error deleting {cloud_path}: {error}"))
+                            errors_deleting.append(cloud_path) # Record the failed path
+                        if result_callback:
+                            result_callback(file_path, error)
+                if stop_event is None or not stop_event.is_set():
+                    for unit in itertools.islice(unit_iter, len(done)):
+                        in_flight[executor.submit(remove_unit, *unit)] = unit
+
+                if time.time() >= next_progress_time:
+                    next_progress_time = time.time() + DELETE_PROGRESS_INTERVAL_SECONDS
+                    freed_mb = freed_bytes / (1024 * 1024)
+                    self.log(self._("status_delete_progress", done=processed, total=total_to_delete, failed=len(errors_deleting), freed_mb=freed_mb,
+                                    default=f"Deleting... {processed}/{total_to_delete} processed, {len(errors_deleting)} failed, {freed_mb:.2f} MB freed."))
+
+        if processed == total_to_delete and deleted_count:
+            # Whole folders are already gone; their parents (and the folders of single removals) may now be empty
+            cleanup_folders = {folder.rpartition('/')[0] if folder in whole_folders else folder for folder in files_by_folder}
+            self.remove_empty_folders(cleanup_folders)
+        if processed < total_to_delete:
+            self.log(self._("delete_stopped", done=processed, total=total_to_delete, default=f"Deletion stopped: {processed} of {total_to_delete} files processed. Use 'Resume Deletion' to continue."))
+        else:
+            finish_msg = self._("delete_finished", deleted_count=deleted_count, total_marked=total_to_delete, default=f"Deletion complete. Successfully deleted {deleted_count} of {total_to_delete} marked files.")
+            self.log(finish_msg)
 
         # Report any files that failed to delete
         if errors_deleting:
@@ -1166,8 +3278,729 @@ class DuplicateFileFinder:
 # --- End of DuplicateFileFinder Class ---
 
 
+# --- Deletion Journal ---
+class DeletionJournal:
+    """
+    Write-ahead journal for one deletion run, stored as JSON lines:
+      {"type": "plan", ...}                      header, written (and fsynced) before anything is deleted
+      {"type": "set", "sha1", "keep", "delete", "sizes", "hashes"}   one line per duplicate set in the plan
+      {"type": "result", "path", "ok", "error"}  appended as each file finishes
+      {"type": "result", "path", "skipped", ...} file dropped by pre-removal verification (not retried)
+      {"type": "end", "status"}                  appended once the plan is completed or discarded
+    A journal without an "end" record and with unfinished paths can be resumed without rescanning.
+    """
+    FILE_PREFIX = "deletion_"
+    FSYNC_EVERY = 50 # Result records between fsync calls (each record is flushed immediately)
+
+    def __init__(self, path):
+        self.path = path
+        self.created = ""
+        self.sets = [] # [{"sha1", "keep": [paths], "delete": [paths], "sizes": {path: bytes}, "hashes": {path: {kind: value}}}]
+        self.results = {} # path -> True (deleted) / False (failed); last outcome wins
+        self.skipped = set() # Paths rejected by verification; never retried
+        self.status = None # "complete"/"discarded" once an end record exists
+        self.action = REMOVAL_DELETE # REMOVAL_DELETE or REMOVAL_QUARANTINE
+        self.target = None # Quarantine folder for REMOVAL_QUARANTINE plans
+        self._file = None
+        self._lock = threading.Lock()
+        self._unsynced = 0
+
+    @classmethod
+    def create(cls, directory, plan_sets, action=REMOVAL_DELETE, target=None):
+        """ Writes a new plan file and returns the journal, open for appending results. Raises OSError. """
+        os.makedirs(directory, exist_ok=True)
+        now = datetime.now()
+        path = os.path.join(directory, f"{cls.FILE_PREFIX}{now.strftime('%Y%m%d_%H%M%S_%f')}.jsonl")
+        journal = cls(path)
+        journal.created = now.strftime(DATE_FORMAT)
+        journal.sets = list(plan_sets)
+        journal.action, journal.target = action, target
+        total = sum(len(plan_set["delete"]) for plan_set in journal.sets)
+        with open(path, "x", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "plan", "version": 1, "created": journal.created, "action": action, "target": target,
+                                "set_count": len(journal.sets), "file_count": total}, ensure_ascii=False) + "\n")
+            for plan_set in journal.sets:
+                f.write(json.dumps(dict(plan_set, type="set"), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        journal._file = open(path, "a", encoding="utf-8")
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a journal file. Torn lines (crash mid-write) are ignored. Raises OSError/ValueError. """
+        journal = cls(path)
+        has_plan = False
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # Torn write from a crash; the file is newline-terminated again on the next append
+            record_type = record.get("type")
+            if record_type == "plan":
+                has_plan = True
+                journal.created = record.get("created", "")
+                journal.action = record.get("action", REMOVAL_DELETE)
+                journal.target = record.get("target")
+            elif record_type == "set":
+                journal.sets.append({"sha1": record.get("sha1"), "keep": record.get("keep", []),
+                                     "delete": record.get("delete", []), "sizes": record.get("sizes", {}),
+                                     "hashes": record.get("hashes", {})})
+            elif record_type == "result":
+                journal.results[record.get("path")] = bool(record.get("ok"))
+                if record.get("skipped"): journal.skipped.add(record.get("path"))
+            elif record_type == "end":
+                journal.status = record.get("status", "complete")
+        if not has_plan:
+            raise ValueError(f"{os.path.basename(path)} is not a deletion plan")
+        return journal
+
+    @classmethod
+    def find_resumable(cls, directory):
+        """ Returns the newest journal in `directory` that has no end record and unfinished paths, or None. """
+        try:
+            names = sorted((name for name in os.listdir(directory)
+                            if name.startswith(cls.FILE_PREFIX) and name.endswith(".jsonl")), reverse=True)
+        except OSError:
+            return None
+        for name in names:
+            try:
+                journal = cls.load(os.path.join(directory, name))
+            except (OSError, ValueError):
+                continue
+            if journal.status is None and journal.remaining_paths():
+                return journal
+        return None
+
+    @property
+    def total_count(self):
+        return sum(len(plan_set["delete"]) for plan_set in self.sets)
+
+    def remaining_paths(self):
+        """ Paths in the plan not yet deleted successfully (failed ones are retried, skipped ones are not). """
+        results, skipped = self.results, self.skipped
+        return [path for plan_set in self.sets for path in plan_set["delete"] if not results.get(path) and path not in skipped]
+
+    def sizes(self):
+        """ Scanned sizes of the files to delete ({path: bytes}). """
+        return {path: plan_set.get("sizes", {}).get(path, 0) for plan_set in self.sets for path in plan_set["delete"]}
+
+    def _append(self, record, force_sync=False):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self._file.tell() > 0 and not self._ends_with_newline():
+                    self._file.write("\n") # Terminate a line torn by a crash
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._unsynced += 1
+            if force_sync or self._unsynced >= self.FSYNC_EVERY:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def record(self, path, error):
+        """ Appends the outcome of one file. Signature matches DuplicateFileFinder.delete_files' result_callback. """
+        self.results[path] = error is None
+        self._append({"type": "result", "path": path, "ok": error is None, "error": str(error) if error is not None else None})
+
+    def skip(self, path, reason):
+        """ Records that verification dropped `path` from the plan. """
+        self.results[path] = False
+        self.skipped.add(path)
+        self._append({"type": "result", "path": path, "ok": False, "skipped": True, "error": reason})
+
+    def finish(self, status="complete"):
+        """ Appends the end record (plan completed or discarded) and closes the file. """
+        self.status = status
+        self._append({"type": "end", "status": status, "time": datetime.now().strftime(DATE_FORMAT)}, force_sync=True)
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                finally:
+                    self._file.close()
+                    self._file = None
+# --- End of Deletion Journal ---
+
+
+# --- Inventory Database ---
+class InventoryDatabase:
+    """
+    SQLite export of every scanned file, for ad-hoc queries without rescanning.
+      files(path PRIMARY KEY, dir, ext, size, mtime, sha1, hashes, set_key)  indexed on sha1, size, dir and set;
+        sha1 is the file's own SHA1 (NULL if it has none), hashes all its hashes ('SHA1:<value>;MD5:<value>'),
+        set_key the key of its duplicate set where that is not its own SHA1 (sets linked through another hash kind)
+      duplicate_sets view: set_key, sha1 (one of the set's SHA1s, if any), copies, size, reclaimable_bytes
+        for sets with more than one file, grouped on COALESCE(set_key, sha1)
+      scan_info(key, value): started, finished, scan_roots
+    Each scan replaces the previous inventory. Rows are buffered and inserted with executemany,
+    one transaction per batch; indexes are built once at the end, which is faster than
+    maintaining them during the bulk load.
+    """
+    BATCH_SIZE = 5000
+    INDEXES = (("idx_files_sha1", "sha1"), ("idx_files_size", "size"), ("idx_files_dir", "dir"),
+               ("idx_files_set", "COALESCE(set_key, sha1)"))
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY, dir TEXT NOT NULL, ext TEXT NOT NULL,
+            size INTEGER, mtime TEXT, sha1 TEXT, hashes TEXT, set_key TEXT);
+        CREATE TABLE IF NOT EXISTS scan_info (key TEXT PRIMARY KEY, value TEXT);
+        CREATE VIEW IF NOT EXISTS duplicate_sets AS
+            SELECT COALESCE(set_key, sha1) AS set_key, MIN(sha1) AS sha1, COUNT(*) AS copies, MAX(size) AS size,
+                   (COUNT(*) - 1) * MAX(size) AS reclaimable_bytes
+            FROM files WHERE COALESCE(set_key, sha1) IS NOT NULL GROUP BY COALESCE(set_key, sha1) HAVING COUNT(*) > 1;
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0 # Rows written (or queued) during this scan
+        self._rows = []
+        self._conn = sqlite3.connect(path, check_same_thread=False) # Scan threads add rows under the finder's lock
+
+    @classmethod
+    def begin(cls, path):
+        """ Opens (or creates) the database and clears the previous inventory. Raises sqlite3.Error/OSError. """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = cls(path)
+        try:
+            conn = db._conn
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(files)")]
+            conn.execute("DROP VIEW IF EXISTS duplicate_sets") # Recreated by SCHEMA, so older views are updated
+            if columns and "set_key" not in columns: # Older layout: the contents are replaced anyway
+                conn.execute("DROP TABLE files")
+            conn.executescript(db.SCHEMA)
+            with conn:
+                for index_name, _column in cls.INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+                conn.execute("DELETE FROM files")
+                conn.execute("DELETE FROM scan_info")
+                conn.execute("INSERT INTO scan_info VALUES ('started', ?)", (datetime.now().strftime(DATE_FORMAT),))
+        except Exception:
+            db.close()
+            raise
+        return db
+
+    def add(self, file_info):
+        """ Queues one FileInfo; a full batch is written in its own transaction. """
+        path = file_info['path']
+        folder, _, name = path.rpartition('/')
+        modified = file_info.get('modified')
+        self._rows.append((path, folder or '/', os.path.splitext(name)[1].lower(), file_info.get('size'),
+                           modified.isoformat() if isinstance(modified, datetime) else None, file_info.get('sha1'),
+                           _format_hashes(file_info.get('hashes') or {}) or None, None))
+        self.count += 1
+        if len(self._rows) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._rows: return
+        rows, self._rows = self._rows, []
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def set_keys(self, rows):
+        """ Sets files.set_key from (set key, path) pairs, after the queued rows are written. """
+        self.flush()
+        with self._conn:
+            self._conn.executemany("UPDATE files SET set_key = ? WHERE path = ?", rows)
+
+    def finish(self, scan_roots=()):
+        """ Writes the remaining rows, builds the indexes and records the scan metadata. """
+        self.flush()
+        with self._conn:
+            for index_name, column in self.INDEXES:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON files({column})")
+            self._conn.execute("INSERT OR REPLACE INTO scan_info VALUES ('finished', ?)", (datetime.now().strftime(DATE_FORMAT),))
+            self._conn.execute("INSERT OR REPLACE INTO scan_info VALUES ('scan_roots', ?)", (json.dumps(list(scan_roots), ensure_ascii=False),))
+        self._conn.execute("ANALYZE")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+# --- End of Inventory Database ---
+
+
+# --- Scan Snapshots ---
+class ScanSnapshot:
+    """
+    Compact binary snapshot of scan results (files grouped by SHA1), read through mmap.
+    Layout (little-endian):
+      header   magic, version, flags, set_count, file_count, then offsets of the sections below
+      sets     per SHA1 group: (SHA1 string offset, SHA1 length, first file index, file count), sorted by SHA1
+      files    per file: (size, modified UTC timestamp or NaN, path string offset, path length,
+               hashes string offset, hashes length), by path within a set (version 1 has no hashes fields)
+      strings  UTF-8 SHA1s, paths and the files' own hashes ('SHA1:<value>;MD5:<value>'), referenced by offset/length
+      meta     JSON: created, scan_roots, inventory (True if groups with a single file are included)
+    Opening only parses the header; sets and files are decoded when iterated.
+    """
+    MAGIC = b"DDSNAP\x00\x00"
+    VERSION = 2
+    _HEADER = struct.Struct("<8sIIQQQQQQ") # magic, version, flags, set_count, file_count, sets/files/strings/meta offsets
+    _SET = struct.Struct("<QIII")
+    _FILE = struct.Struct("<qdQIQI")
+    _FILE_V1 = struct.Struct("<qdQI") # Version 1 files: no hashes of their own (the set key stands in)
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = {}
+        self.set_count = 0
+        self.file_count = 0
+        self.version = self.VERSION
+        self._file = None
+        self._mm = None
+        self._offsets = (0, 0, 0, 0)
+
+    @classmethod
+    def write(cls, path, groups, meta=None):
+        """
+        Writes {sha1: [FileInfo, ...]} to `path` (via a temporary file, so readers never see a partial
+        snapshot). Returns (set_count, file_count). Raises OSError.
+        """
+        strings = bytearray()
+        def add_string(text):
+            data = text.encode("utf-8")
+            offset = len(strings)
+            strings.extend(data)
+            return offset, len(data)
+        set_records, file_records = [], []
+        file_index = 0
+        for sha1 in sorted(groups):
+            files_in_set = sorted((info for info in groups[sha1] if info.get('path')), key=lambda info: info['path'])
+            if not files_in_set: continue
+            sha1_offset, sha1_length = add_string(sha1)
+            set_records.append(cls._SET.pack(sha1_offset, sha1_length, file_index, len(files_in_set)))
+            for info in files_in_set:
+                path_offset, path_length = add_string(info['path'])
+                hashes_offset, hashes_length = add_string(_format_hashes(info.get('hashes') or {}))
+                modified = info.get('modified')
+                size = info.get('size')
+                file_records.append(cls._FILE.pack(
+                    int(size) if isinstance(size, (int, float)) else -1,
+                    modified.timestamp() if isinstance(modified, datetime) else math.nan,
+                    path_offset, path_length, hashes_offset, hashes_length))
+            file_index += len(files_in_set)
+
+        meta_bytes = json.dumps(dict(meta or {}), ensure_ascii=False).encode("utf-8")
+        sets_offset = cls._HEADER.size
+        files_offset = sets_offset + len(set_records) * cls._SET.size
+        strings_offset = files_offset + len(file_records) * cls._FILE.size
+        meta_offset = strings_offset + len(strings)
+        header = cls._HEADER.pack(cls.MAGIC, cls.VERSION, 0, len(set_records), file_index,
+                                  sets_offset, files_offset, strings_offset, meta_offset)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = path + ".part"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(header)
+                f.write(b"".join(set_records))
+                f.write(b"".join(file_records))
+                f.write(strings)
+                f.write(meta_bytes)
+            os.replace(temp_path, path)
+        except OSError:
+            try: os.remove(temp_path)
+            except OSError: pass
+            raise
+        return len(set_records), file_index
+
+    @classmethod
+    def open(cls, path):
+        """ Maps a snapshot file and reads its header and metadata. Raises OSError/ValueError. """
+        snapshot = cls(path)
+        snapshot._file = open(path, "rb")
+        try:
+            if os.fstat(snapshot._file.fileno()).st_size < cls._HEADER.size:
+                raise ValueError(f"{os.path.basename(path)} is not a scan snapshot")
+            snapshot._mm = mmap.mmap(snapshot._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _flags, set_count, file_count, *offsets = cls._HEADER.unpack_from(snapshot._mm, 0)
+            if magic != cls.MAGIC:
+                raise ValueError(f"{os.path.basename(path)} is not a scan snapshot")
+            if version > cls.VERSION:
+                raise ValueError(f"{os.path.basename(path)} was written by a newer version (format {version})")
+            snapshot.set_count, snapshot.file_count, snapshot.version = set_count, file_count, version
+            snapshot._offsets = tuple(offsets)
+            try:
+                snapshot.meta = json.loads(snapshot._mm[offsets[3]:].decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                snapshot.meta = {}
+        except Exception:
+            snapshot.close()
+            raise
+        return snapshot
+
+    def iter_sets(self, min_files=2):
+        """ Yields (sha1, [FileInfo, ...]) for every group with at least `min_files` files. """
+        mm = self._mm
+        sets_offset, files_offset, strings_offset, _meta_offset = self._offsets
+        unpack_set, set_size = self._SET.unpack_from, self._SET.size
+        file_struct = self._FILE if self.version >= 2 else self._FILE_V1
+        unpack_file, file_size = file_struct.unpack_from, file_struct.size
+        fromtimestamp, utc = datetime.fromtimestamp, timezone.utc
+        for set_index in range(self.set_count):
+            sha1_offset, sha1_length, first_file, count = unpack_set(mm, sets_offset + set_index * set_size)
+            if count < min_files: continue # Skipped without decoding its files
+            start = strings_offset + sha1_offset
+            sha1 = mm[start:start + sha1_length].decode("utf-8")
+            key_hashes = _hashes_of_set_key(sha1) # Version 1 keeps only the set key; it stands in for the files' own hashes
+            files_in_set = []
+            for file_index in range(first_file, first_file + count):
+                size, modified_ts, path_offset, path_length, *hashes_field = unpack_file(mm, files_offset + file_index * file_size)
+                hashes = key_hashes
+                if hashes_field:
+                    start = strings_offset + hashes_field[0]
+                    hashes = _parse_hashes(mm[start:start + hashes_field[1]].decode("utf-8"))
+                start = strings_offset + path_offset
+                files_in_set.append({
+                    'path': mm[start:start + path_length].decode("utf-8"),
+                    'modified': fromtimestamp(modified_ts, tz=utc) if not math.isnan(modified_ts) else None,
+                    'size': size if size >= 0 else None,
+                    'sha1': hashes.get(HASH_KIND_SHA1),
+                    'hashes': hashes,
+                    'set_key': sha1,
+                })
+            yield sha1, files_in_set
+
+    def duplicate_sets(self):
+        """ Returns {sha1: [FileInfo, ...]} for the groups with more than one file (as find_duplicates does). """
+        return dict(self.iter_sets(min_files=2))
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def diff_duplicate_sets(old_sets, new_sets):
+    """
+    Compares duplicate sets keyed by SHA1 and path with hash joins: the old side is loaded into a
+    {sha1: frozenset(paths)} table, then each new set is probed once.
+    `old_sets`/`new_sets` are {sha1: [FileInfo, ...]} or iterables of (sha1, [FileInfo, ...])
+    (e.g. ScanSnapshot.iter_sets()). Returns (changes, unchanged_count, resolved_sha1s) where
+    changes is {sha1: SET_CHANGE_NEW/GROWN/SHRUNK} for the new sets that differ.
+    """
+    old_items = old_sets.items() if isinstance(old_sets, dict) else old_sets
+    old_paths = {sha1: frozenset(info.get('path') for info in files) for sha1, files in old_items}
+    changes = {}
+    unchanged_count = 0
+    for sha1, files in new_sets.items():
+        paths = frozenset(info.get('path') for info in files)
+        before = old_paths.pop(sha1, None)
+        if before is None or len(before) < 2:
+            changes[sha1] = SET_CHANGE_NEW
+        elif paths == before:
+            unchanged_count += 1
+        elif not paths <= before:
+            changes[sha1] = SET_CHANGE_GROWN
+        else:
+            changes[sha1] = SET_CHANGE_SHRUNK
+    resolved = [sha1 for sha1, paths in old_paths.items() if len(paths) > 1]
+    return changes, unchanged_count, resolved
+# --- End of Scan Snapshots ---
+
+
+# --- Results Model ---
+class ResultsModel:
+    """
+    Flat, row-oriented model of the duplicate sets shown in the results Treeview.
+    Display strings are computed once when the model is built (safe to do off the
+    main thread), so the GUI only has to insert ready-made rows.
+    """
+    def __init__(self):
+        self.item_ids = [] # Treeview item ID per row (the file path)
+        self.file_infos = [] # FileInfo dict per row
+        self.set_numbers = [] # Display set index (int) per row
+        self.set_keys = [] # Key of the row's set in duplicate_sets (the SHA1)
+        self.values = [] # Precomputed Treeview value tuples per row
+        self.actions = [] # None, ACTION_KEEP or ACTION_DELETE per row
+        self.delete_count = 0 # Number of rows currently marked ACTION_DELETE
+        self.skipped = 0 # Files skipped while building (missing or repeated path)
+        # --- Membership indexes (rebuilt whenever rows are added or removed) ---
+        self.row_of = {} # item ID -> row index
+        self.set_members = {} # set number -> [item ID, ...]
+        self._sort_key_cache = {} # Column ID -> list of sort keys per row
+        self._sort_order_cache = {} # Column ID -> ascending row order
+        self._sorted_item_ids = None # Lazily built sorted path list for folder-prefix lookups
+        self.failed_items = set() # Item IDs whose last deletion attempt failed (highlighted)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @classmethod
+    def from_duplicate_sets(cls, duplicate_sets, set_id_template="{index}"):
+        """
+        Builds the model from {sha1: [FileInfo, ...]}. Sets are ordered by SHA1 and files
+        within a set by path, matching the order the results list has always used.
+        `set_id_template` is the already-translated 'tree_set_col_value' string.
+        """
+        model = cls()
+        seen_paths = set()
+        set_index = 0
+        for sha1 in sorted(duplicate_sets.keys()):
+            files_in_set = duplicate_sets[sha1]
+            if not isinstance(files_in_set, list) or len(files_in_set) < 2:
+                continue # Safety check
+            set_index += 1
+            try:
+                set_id_str = set_id_template.format(index=set_index)
+            except (KeyError, IndexError, ValueError):
+                set_id_str = str(set_index)
+            hash_kind = files_in_set[0].get('hash_kind')
+            if hash_kind and hash_kind != HASH_KIND_NAMES[HASH_KIND_SHA1]:
+                set_id_str = f"{set_id_str} ({hash_kind})" # Sets not (only) matched by SHA1 say how they were linked
+
+            for file_info in sorted(files_in_set, key=lambda x: x.get('path', '')):
+                path = file_info.get('path')
+                if not path or path in seen_paths:
+                    model.skipped += 1
+                    continue
+                seen_paths.add(path)
+                mod_time = file_info.get('modified')
+                mod_time_str = mod_time.strftime(DATE_FORMAT) if isinstance(mod_time, datetime) else "N/A"
+                size = file_info.get('size')
+                size_mb = size / (1024 * 1024) if isinstance(size, (int, float)) and size > 0 else 0.0
+                # Store the Set ID within the file_info for easier lookup later
+                file_info['_set_id_display'] = set_id_str
+
+                model.item_ids.append(path) # Use path as the unique item ID
+                model.file_infos.append(file_info)
+                model.set_numbers.append(set_index)
+                model.set_keys.append(sha1)
+                # Initial Action is empty
+                model.values.append(("", path, mod_time_str, f"{size_mb:.2f}", set_id_str))
+                model.actions.append(None)
+        model._rebuild_indexes()
+        return model
+
+    def _rebuild_indexes(self):
+        """ Rebuilds item->row and set->members indexes from the row lists. """
+        self.row_of = {item_id: row for row, item_id in enumerate(self.item_ids)}
+        set_members = {}
+        for item_id, set_number in zip(self.item_ids, self.set_numbers):
+            set_members.setdefault(set_number, []).append(item_id)
+        self.set_members = set_members
+        self.delete_count = sum(1 for action in self.actions if action == ACTION_DELETE)
+        self._sorted_item_ids = None
+
+    # --- Membership Lookups ---
+    def set_of(self, item_id):
+        """ Returns the set number of an item, or None if it is not in the model. """
+        row = self.row_of.get(item_id)
+        return self.set_numbers[row] if row is not None else None
+
+    def members_of_set(self, set_number):
+        """ Returns the item IDs belonging to a set (empty list if unknown). """
+        return self.set_members.get(set_number, [])
+
+    def get_action(self, item_id):
+        row = self.row_of.get(item_id)
+        return self.actions[row] if row is not None else None
+
+    def set_action(self, item_id, action):
+        """ Updates the action of one item, keeping delete_count in sync. Returns True if it changed. """
+        row = self.row_of.get(item_id)
+        if row is None: return False
+        old_action = self.actions[row]
+        if old_action == action: return False
+        if old_action == ACTION_DELETE: self.delete_count -= 1
+        if action == ACTION_DELETE: self.delete_count += 1
+        self.actions[row] = action
+        return True
+
+    def apply_actions(self, new_actions):
+        """
+        Replaces the action of every row with `new_actions` (same order as the rows).
+        Returns the item IDs whose action actually changed, so callers only redraw those.
+        """
+        if len(new_actions) != len(self.actions):
+            raise ValueError("Action vector length does not match the number of rows.")
+        old_actions = self.actions
+        item_ids = self.item_ids
+        changed = [item_ids[row] for row, (old, new) in enumerate(zip(old_actions, new_actions)) if old != new]
+        self.actions = list(new_actions)
+        self.delete_count = self.actions.count(ACTION_DELETE)
+        return changed
+
+    def update_actions(self, action_by_item):
+        """ Applies {item ID: action} in one batch. Returns the item IDs whose action changed. """
+        return [item_id for item_id, action in action_by_item.items() if self.set_action(item_id, action)]
+
+    def items_under_folder(self, folder):
+        """ Returns item IDs whose path lies under `folder`, via binary search over the sorted paths. """
+        if self._sorted_item_ids is None:
+            self._sorted_item_ids = sorted(self.item_ids)
+        paths = self._sorted_item_ids
+        prefix = folder.rstrip("/") + "/"
+        low = bisect.bisect_left(paths, prefix)
+        high = bisect.bisect_left(paths, prefix[:-1] + "0", low) # '0' is the character right after '/'
+        return paths[low:high]
+
+    def plan_bulk_mark(self, item_ids, action):
+        """
+        Computes the actions needed to mark `item_ids` with `action` while keeping exactly one
+        Keep per set. Returns ({item ID: action}, sets needing a tie-break/fallback).
+        - Delete: if every member of a set is targeted, its current Keep (or shortest path) stays Keep.
+        - Keep: if several members of a set are targeted, the shortest path is kept, the rest Delete.
+        """
+        targets_by_set = {}
+        for item_id in item_ids:
+            set_number = self.set_of(item_id)
+            if set_number is not None:
+                targets_by_set.setdefault(set_number, []).append(item_id)
+
+        def shortest(ids):
+            return min(ids, key=lambda p: (len(p), p))
+
+        planned, conflicts = {}, 0
+        for set_number, targets in targets_by_set.items():
+            members = self.set_members[set_number]
+            if action == ACTION_KEEP:
+                if len(targets) > 1: conflicts += 1
+                keep_id = shortest(targets)
+                for member in members:
+                    planned[member] = ACTION_KEEP if member == keep_id else ACTION_DELETE
+                continue
+            target_set = set(targets)
+            survivors = [member for member in members if member not in target_set]
+            if not survivors:
+                conflicts += 1
+                current_keeps = [member for member in members if self.get_action(member) == ACTION_KEEP]
+                keep_id = current_keeps[0] if current_keeps else shortest(members)
+                for member in members:
+                    planned[member] = ACTION_KEEP if member == keep_id else ACTION_DELETE
+                continue
+            for member in targets:
+                planned[member] = ACTION_DELETE
+            if not any(self.get_action(member) == ACTION_KEEP for member in survivors):
+                planned[shortest(survivors)] = ACTION_KEEP
+        return planned, conflicts
+
+    def items_with_action(self, action):
+        """ Returns item IDs (in model order) whose action equals `action`. """
+        return [item_id for item_id, item_action in zip(self.item_ids, self.actions) if item_action == action]
+
+    def remove_items(self, item_ids):
+        """ Removes rows for the given item IDs and updates all indexes. Returns the number removed. """
+        to_remove = {item_id for item_id in item_ids if item_id in self.row_of}
+        if not to_remove:
+            return 0
+        keep_rows = [row for row, item_id in enumerate(self.item_ids) if item_id not in to_remove]
+        for attr in ("item_ids", "file_infos", "set_numbers", "set_keys", "values", "actions"):
+            column = getattr(self, attr)
+            setattr(self, attr, [column[row] for row in keep_rows])
+        self.failed_items -= to_remove
+        self._rebuild_indexes()
+        self.invalidate_sort_cache()
+        return len(to_remove)
+
+    def set_keys_of(self, item_ids):
+        """ Returns {set key (SHA1): [item ID, ...]} for the given items that are in the model. """
+        by_set = defaultdict(list)
+        for item_id in item_ids:
+            row = self.row_of.get(item_id)
+            if row is not None:
+                by_set[self.set_keys[row]].append(item_id)
+        return by_set
+
+    def singleton_items(self):
+        """ Returns item IDs that are the only remaining member of their set. """
+        return [members[0] for members in self.set_members.values() if len(members) == 1]
+
+    def truncate(self, row_count):
+        """ Drops all rows from `row_count` onwards (used when population is aborted). """
+        del self.item_ids[row_count:]
+        del self.file_infos[row_count:]
+        del self.set_numbers[row_count:]
+        del self.set_keys[row_count:]
+        del self.values[row_count:]
+        del self.actions[row_count:]
+        self._rebuild_indexes()
+        self.invalidate_sort_cache()
+
+    # --- Sorting ---
+    # Columns whose keys depend only on the scanned data; computed once and cached.
+    STATIC_SORT_COLUMNS = ("path", "modified", "size_mb", "set_id")
+
+    def invalidate_sort_cache(self, col=None):
+        """ Forgets cached keys/orderings for one column (or all columns). """
+        if col is None:
+            self._sort_key_cache.clear()
+            self._sort_order_cache.clear()
+        else:
+            self._sort_key_cache.pop(col, None)
+            self._sort_order_cache.pop(col, None)
+
+    def sort_keys(self, col):
+        """ Returns (and caches) one comparable sort key per row for a static column. """
+        keys = self._sort_key_cache.get(col)
+        if keys is not None:
+            return keys
+        if col == 'path':
+            keys = [path.lower() for path in self.item_ids]
+        elif col == 'modified':
+            # Files without a valid date sort before all dated files
+            neg_inf = float('-inf')
+            keys = [f['modified'].timestamp() if isinstance(f.get('modified'), datetime) else neg_inf
+                    for f in self.file_infos]
+        elif col == 'size_mb':
+            keys = [f['size'] if isinstance(f.get('size'), (int, float)) and f['size'] > 0 else 0
+                    for f in self.file_infos]
+        elif col == 'set_id':
+            keys = self.set_numbers
+        else:
+            raise KeyError(col)
+        self._sort_key_cache[col] = keys
+        return keys
+
+    def sorted_rows(self, col, ascending=True, keys=None):
+        """
+        Returns row indices ordered by `col`; rows with equal keys keep their order in both directions.
+        Ascending orders of static columns are cached, descending reverses the cached order's runs of
+        equal keys. Pass `keys` for dynamic columns (not cached).
+        """
+        if keys is not None:
+            return sorted(range(len(keys)), key=keys.__getitem__, reverse=not ascending)
+        col_keys = self.sort_keys(col)
+        order = self._sort_order_cache.get(col)
+        if order is None:
+            order = sorted(range(len(col_keys)), key=col_keys.__getitem__)
+            self._sort_order_cache[col] = order
+        if ascending: return order
+        runs = [list(run) for _key, run in itertools.groupby(order, key=col_keys.__getitem__)]
+        return [row for run in reversed(runs) for row in run]
+# --- End of Results Model ---
+
+
 # --- GUI Application Class ---
 class DuplicateFinderApp:
+    # Rules with an extra entry field: rule -> (widget key prefix, label text key)
+    RULE_ARGUMENT_WIDGETS = {
+        RULE_KEEP_SUFFIX: ("suffix", "rule_suffix_entry_label"),
+        RULE_KEEP_CUSTOM: ("policy", "rule_policy_entry_label"),
+    }
+
     def __init__(self, master):
         self.master = master
         self.current_language = self.load_language_preference()
@@ -1177,6 +4010,29 @@ class DuplicateFinderApp:
         # Application state
         self.duplicate_sets = {} # Stores {sha1: [FileInfo, ...]} - ALL found video types
         self.treeview_item_map = {} # Maps tree item ID (file path) -> FileInfo dict
+        self.results_model = ResultsModel() # Row model backing the treeview
+
+        # --- Chunked Treeview Population State ---
+        self._populate_generation = 0 # Incremented to invalidate in-flight population
+        self._populate_job = None # Pending after() ID for the next insert chunk
+        self._populate_abort_requested = False
+        self._similar_generation = 0 # Same for the Similar Videos tab
+        self._similar_job = None
+
+        # --- Batched Row Re-render State (rule application) ---
+        self._pending_render = {} # Insertion-ordered item IDs waiting to be redrawn (values unused)
+        self._render_job = None
+        self._rule_argument_job = None # Debounce timer for suffix/policy entry edits
+        self._ui_mode = 'initial' # Last mode passed to set_ui_state
+
+        # --- Deletion State ---
+        self._delete_stop_event = threading.Event() # Set by 'Stop Deleting'
+        self._export_stop_event = threading.Event() # Set by 'Stop Export'
+        self._resumable_journal = None # Newest unfinished DeletionJournal, if any
+
+        # --- Rule Suggestion Cache ---
+        self._dataset_version = 0 # Bumped whenever duplicate_sets changes (rescan, deletions)
+        self._rule_cache = {} # (rule, suffix/policy, dataset version) -> frozenset of paths to delete
 
         # Tkinter variables
         self.widgets = {} # Holds widget references
@@ -1185,6 +4041,16 @@ class DuplicateFinderApp:
         self.rule_radios = {} # Holds Radiobutton widgets specific to rules
         self.deletion_rule_var = tk.StringVar(value="") # For deletion rule radio buttons
         self.suffix_entry_var = tk.StringVar() # For suffix entry text
+        self.suffix_entry_var.trace_add("write", self._on_rule_argument_change)
+        self.policy_entry_var = tk.StringVar(value=DEFAULT_KEEP_POLICY) # For custom keep policy text
+        self.policy_entry_var.trace_add("write", self._on_rule_argument_change)
+        self.snapshot_inventory_var = tk.BooleanVar(value=False) # Include non-duplicate files in scan snapshots
+        self.local_backend_var = tk.BooleanVar(value=False) # Scan local folders below the Mount Point instead of CloudDrive2
+        self.source_name = DEFAULT_SOURCE_NAME # Name of the main connection when the config has extra sources
+        self.extra_sources = [] # Extra connections from the config's [source <name>] sections
+        self._scan_snapshot_inventory = False # Value of snapshot_inventory_var when the running scan started
+        self.show_changes_only_var = tk.BooleanVar(value=False) # Limit the results list to set_changes
+        self.set_changes = None # sha1 -> SET_CHANGE_* from the last snapshot comparison (None: not compared)
         # <<< REMOVED: Variable for filter extensions >>>
         # self.filter_extensions_var = tk.StringVar()
 
@@ -1221,6 +4087,7 @@ class DuplicateFinderApp:
 
         # --- Final Setup ---
         self.load_config() # Load settings on startup
+        self._refresh_resumable_journal()
         self.update_ui_language() # Set initial UI text
         self.set_ui_state('initial') # Initial state before connection
 
@@ -1252,6 +4119,8 @@ class DuplicateFinderApp:
             ("account", "account_label", 1, False),
             ("password", "password_label", 2, True),
             ("mount_point", "mount_point_label", 4, False), # Moved up from 5
+            ("quarantine_path", "quarantine_path_label", 5, False),
+            ("inventory_db", "inventory_db_label", 6, False),
         ]
 
         for key, label_key, row, is_password in simple_config_fields:
@@ -1328,9 +4197,10 @@ class DuplicateFinderApp:
             ("longest_path", RULE_KEEP_LONGEST, 1),
             ("oldest", RULE_KEEP_OLDEST, 2),
             ("newest", RULE_KEEP_NEWEST, 3),
-            ("keep_suffix", RULE_KEEP_SUFFIX, 4)
+            ("keep_suffix", RULE_KEEP_SUFFIX, 4),
+            ("custom", RULE_KEEP_CUSTOM, 5)
         ]
-        suffix_row_index = -1
+        argument_rows = {}
 
         for row_idx, (t_key_suffix, value, grid_row) in enumerate(rule_options):
             t_key = f"rule_{t_key_suffix}"
@@ -1340,30 +4210,38 @@ class DuplicateFinderApp:
             radio.grid(row=grid_row, column=0, columnspan=1, padx=5, pady=2, sticky="w")
             self.rule_radios[value] = radio
             self.widgets[f"radio_{value}"] = radio
-            if value == RULE_KEEP_SUFFIX:
-                suffix_row_index = grid_row
+            if value in self.RULE_ARGUMENT_WIDGETS:
+                argument_rows[value] = grid_row
 
-        lbl = ttk.Label(rules_frame, text=self._("rule_suffix_entry_label"), state=tk.DISABLED)
-        lbl.grid(row=suffix_row_index, column=1, padx=(15, 2), pady=2, sticky="e")
-        self.widgets["suffix_label"] = lbl
+        # Label + entry for rules that take an argument (suffix, custom policy)
+        argument_vars = {RULE_KEEP_SUFFIX: self.suffix_entry_var, RULE_KEEP_CUSTOM: self.policy_entry_var}
+        for value, (w_key, t_key) in self.RULE_ARGUMENT_WIDGETS.items():
+            lbl = ttk.Label(rules_frame, text=self._(t_key), state=tk.DISABLED)
+            lbl.grid(row=argument_rows[value], column=1, padx=(15, 2), pady=2, sticky="e")
+            self.widgets[f"{w_key}_label"] = lbl
 
-        entry = ttk.Entry(rules_frame, textvariable=self.suffix_entry_var, state=tk.DISABLED)
-        entry.grid(row=suffix_row_index, column=2, padx=(0, 5), pady=2, sticky="ew")
-        self.widgets["suffix_entry"] = entry
-        self.entries["suffix"] = entry
+            entry = ttk.Entry(rules_frame, textvariable=argument_vars[value], state=tk.DISABLED)
+            entry.grid(row=argument_rows[value], column=2, padx=(0, 5), pady=2, sticky="ew")
+            self.widgets[f"{w_key}_entry"] = entry
+            self.entries[w_key] = entry
 
         # --- 4. Results TreeView Section ---
-        # Row numbering remains the same (row=3)
-        tree_frame = ttk.Frame(master)
-        tree_frame.grid(row=3, column=0, padx=10, pady=(5, 5), sticky="nsew")
+        # Row numbering remains the same (row=3); exact duplicates and similar videos are separate tabs
+        results_notebook = ttk.Notebook(master)
+        results_notebook.grid(row=3, column=0, padx=10, pady=(5, 5), sticky="nsew")
+        self.widgets["results_notebook"] = results_notebook
+        tree_frame = ttk.Frame(results_notebook)
         tree_frame.rowconfigure(0, weight=1)
         tree_frame.columnconfigure(0, weight=1)
+        results_notebook.add(tree_frame, text=self._("near_dup_tab_duplicates"))
         self.widgets["tree_frame"] = tree_frame
 
         self.columns = ("action", "path", "modified", "size_mb", "set_id")
-        self.tree = ttk.Treeview(tree_frame, columns=self.columns, show="headings", selectmode="browse")
+        self.tree = ttk.Treeview(tree_frame, columns=self.columns, show="headings", selectmode="extended")
         self.widgets["treeview"] = self.tree
         self.tree.bind("<ButtonRelease-1>", self._on_tree_click)
+        # Right-click menu for bulk marking (Button-2 is the secondary button on macOS)
+        self.tree.bind("<Button-2>" if sys.platform == "darwin" else "<Button-3>", self._on_tree_right_click)
 
         self.tree.column("action", width=80, anchor=tk.CENTER, stretch=tk.NO)
         self.tree.column("path", width=550, anchor=tk.W, stretch=tk.YES)
@@ -1381,8 +4259,30 @@ class DuplicateFinderApp:
 
         self.tree.tag_configure('keep', foreground='darkgreen')
         self.tree.tag_configure('delete', foreground='#CC0000', font=('TkDefaultFont', 9, 'bold'))
+        self.tree.tag_configure('failed', background='#FFE4B5') # Deletion attempted but failed
         # Headings setup called later
 
+        # Similar Videos tab: near-duplicate candidate groups (read-only, nothing is marked or deleted here)
+        similar_frame = ttk.Frame(results_notebook)
+        similar_frame.rowconfigure(0, weight=1)
+        similar_frame.columnconfigure(0, weight=1)
+        results_notebook.add(similar_frame, text=self._("near_dup_tab_similar"))
+        self.widgets["similar_frame"] = similar_frame
+        similar_tree = ttk.Treeview(similar_frame, columns=("group", "path", "modified", "size_mb", "match"), show="headings", selectmode="extended")
+        self.widgets["similar_treeview"] = similar_tree
+        similar_tree.column("group", width=60, anchor=tk.CENTER, stretch=tk.NO)
+        similar_tree.column("path", width=550, anchor=tk.W, stretch=tk.YES)
+        similar_tree.column("modified", width=150, anchor=tk.W, stretch=tk.NO)
+        similar_tree.column("size_mb", width=100, anchor=tk.E, stretch=tk.NO)
+        similar_tree.column("match", width=130, anchor=tk.W, stretch=tk.NO)
+        similar_vsb = ttk.Scrollbar(similar_frame, orient="vertical", command=similar_tree.yview)
+        similar_hsb = ttk.Scrollbar(similar_frame, orient="horizontal", command=similar_tree.xview)
+        similar_tree.configure(yscrollcommand=similar_vsb.set, xscrollcommand=similar_hsb.set)
+        similar_tree.grid(row=0, column=0, sticky='nsew')
+        similar_vsb.grid(row=0, column=1, sticky='ns')
+        similar_hsb.grid(row=1, column=0, sticky='ew')
+        similar_tree.tag_configure('group_alt', background='#F0F0F0') # Every other group, to tell groups apart
+
         # --- 5. Final Action Buttons Frame (Delete, Chart, Save Report) ---
         # Row numbering remains the same (row=4)
         final_action_frame = ttk.Frame(master)
@@ -1392,8 +4292,12 @@ class DuplicateFinderApp:
 
         final_buttons_info = [
              ("delete", "delete_selected_button", self.start_delete_selected_thread, tk.DISABLED, "Danger.TButton"),
+             ("quarantine", "quarantine_button", self.start_quarantine_selected_thread, tk.DISABLED, ""),
+             ("resume_delete", "resume_delete_button", self.start_resume_deletion, tk.DISABLED, ""),
+             ("purge_quarantine", "purge_quarantine_button", self.start_purge_quarantine_thread, tk.DISABLED, ""),
              ("chart", "show_chart_button", self.show_cloud_file_types, tk.DISABLED, ""),
              ("save_list", "save_list_button", self.save_duplicates_report, tk.DISABLED, ""),
+             ("find_similar", "find_similar_button", self.start_find_similar_thread, tk.DISABLED, ""),
         ]
 
         for idx, (w_key, t_key, cmd, initial_state, style_name) in enumerate(final_buttons_info):
@@ -1410,6 +4314,19 @@ class DuplicateFinderApp:
             button.pack(side=tk.LEFT, padx=padx_val, pady=5)
             self.widgets[f"{w_key}_button"] = button
 
+        # Progress indicator for long-running GUI work (hidden until needed)
+        progress_frame = ttk.Frame(final_action_frame)
+        self.widgets["progress_frame"] = progress_frame
+        progress_label = ttk.Label(progress_frame, text="")
+        progress_label.pack(side=tk.LEFT, padx=(0, 5))
+        self.widgets["progress_label"] = progress_label
+        progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, length=160, mode='determinate')
+        progress_bar.pack(side=tk.LEFT, padx=(0, 5))
+        self.widgets["progress_bar"] = progress_bar
+        abort_button = ttk.Button(progress_frame, text=self._("abort_populate_button"), command=self._on_progress_abort)
+        abort_button.pack(side=tk.LEFT)
+        self.widgets["abort_populate_button"] = abort_button
+
         # --- 6. Log Output Area Section ---
         # Row numbering remains the same (row=5)
         log_frame = ttk.LabelFrame(master, text=self._("log_title"), padding=(5, 5))
@@ -1477,7 +4394,22 @@ class DuplicateFinderApp:
         return DEFAULT_LANG
 
     def create_menus(self):
-        """ Creates the application's menu bar (currently just Language). """
+        """ Creates the application's menu bar (File and Language). """
+        file_menu = Menu(self.menu_bar, tearoff=0)
+        self.widgets["file_menu"] = file_menu
+        file_menu.add_command(label=self._("menu_open_snapshot"), command=self.open_snapshot)
+        file_menu.add_command(label=self._("menu_save_snapshot"), command=self.save_snapshot_as)
+        file_menu.add_command(label=self._("menu_compare_snapshot"), command=self.compare_with_snapshot)
+        file_menu.add_command(label=self._("menu_scan_dump"), command=self.scan_dump_file)
+        file_menu.add_separator()
+        file_menu.add_checkbutton(label=self._("menu_snapshot_inventory"), variable=self.snapshot_inventory_var)
+        file_menu.add_checkbutton(label=self._("menu_show_changes_only"), variable=self.show_changes_only_var,
+                                  command=self._on_show_changes_only_toggle)
+        file_menu.add_separator()
+        file_menu.add_checkbutton(label=self._("menu_local_backend"), variable=self.local_backend_var,
+                                  command=self._on_storage_backend_toggle)
+        self.menu_bar.add_cascade(label="File", menu=file_menu) # Label updated later
+
         lang_menu = Menu(self.menu_bar, tearoff=0)
         self.widgets["lang_menu"] = lang_menu
         lang_menu.add_command(label="English", command=lambda: self.change_language("en"))
@@ -1512,8 +4444,17 @@ class DuplicateFinderApp:
 
             # Menu Bar
             if self.menu_bar and self.menu_bar.winfo_exists():
-                try: self.menu_bar.entryconfig(0, label=self._("menu_language"))
+                try: self.menu_bar.entryconfig(0, label=self._("menu_file"))
+                except (tk.TclError, IndexError): pass
+                try: self.menu_bar.entryconfig(1, label=self._("menu_language"))
                 except (tk.TclError, IndexError): pass
+                file_menu = self.widgets.get("file_menu")
+                if file_menu and file_menu.winfo_exists():
+                    for index, text_key in ((0, "menu_open_snapshot"), (1, "menu_save_snapshot"), (2, "menu_compare_snapshot"),
+                                            (3, "menu_scan_dump"), (5, "menu_snapshot_inventory"), (6, "menu_show_changes_only"),
+                                            (8, "menu_local_backend")):
+                        try: file_menu.entryconfig(index, label=self._(text_key))
+                        except (tk.TclError, IndexError): pass
                 lang_menu = self.widgets.get("lang_menu")
                 if lang_menu and lang_menu.winfo_exists():
                     try: lang_menu.entryconfig(0, label=self._("menu_english"))
@@ -1536,7 +4477,10 @@ class DuplicateFinderApp:
                 "label_password": "password_label",
                 "label_scan_paths": "scan_paths_label",
                 "label_mount_point": "mount_point_label",
+                "label_quarantine_path": "quarantine_path_label",
+                "label_inventory_db": "inventory_db_label",
                 "suffix_label": "rule_suffix_entry_label",
+                "policy_label": "rule_policy_entry_label",
                 # <<< REMOVED: Filter label update >>>
                 # "label_filter_extensions": "filter_extensions_label",
             }
@@ -1555,6 +4499,11 @@ class DuplicateFinderApp:
                 "save_list_button": "save_list_button",
                 "add_scan_path_button": "add_path_button",
                 "remove_scan_path_button": "remove_path_button",
+                "abort_populate_button": {"deleting": "abort_delete_button", "exporting": "abort_export_button"}.get(self._ui_mode, "abort_populate_button"),
+                "resume_delete_button": "resume_delete_button",
+                "quarantine_button": "quarantine_button",
+                "purge_quarantine_button": "purge_quarantine_button",
+                "find_similar_button": "find_similar_button",
             }
             for widget_key, text_key in button_keys.items():
                 widget = self.widgets.get(widget_key)
@@ -1574,7 +4523,7 @@ class DuplicateFinderApp:
             radio_keys = {
                 RULE_KEEP_SHORTEST: "rule_shortest_path", RULE_KEEP_LONGEST: "rule_longest_path",
                 RULE_KEEP_OLDEST: "rule_oldest", RULE_KEEP_NEWEST: "rule_newest",
-                RULE_KEEP_SUFFIX: "rule_keep_suffix"
+                RULE_KEEP_SUFFIX: "rule_keep_suffix", RULE_KEEP_CUSTOM: "rule_custom"
             }
             for value, text_key in radio_keys.items():
                 widget = self.rule_radios.get(value)
@@ -1582,8 +4531,16 @@ class DuplicateFinderApp:
                     try: widget.config(text=self._(text_key))
                     except tk.TclError: pass
 
+            # Results tabs
+            results_notebook = self.widgets.get("results_notebook")
+            if results_notebook and results_notebook.winfo_exists():
+                for index, text_key in ((0, "near_dup_tab_duplicates"), (1, "near_dup_tab_similar")):
+                    try: results_notebook.tab(index, text=self._(text_key))
+                    except tk.TclError: pass
+
             # Treeview Headings
             self.setup_treeview_headings()
+            self._setup_similar_treeview_headings()
 
             # Re-apply rule highlighting if data exists and a rule was selected
             tree = self.widgets.get("treeview")
@@ -1630,10 +4587,26 @@ class DuplicateFinderApp:
             self.log_message(f"Error configuring treeview headers: {e}")
 
 
+    def _setup_similar_treeview_headings(self):
+        """ Sets the headings of the Similar Videos list (not sortable: rows are ordered by group). """
+        similar_tree = self.widgets.get("similar_treeview")
+        if not similar_tree or not similar_tree.winfo_exists(): return
+        heading_keys = {"group": "tree_group_col", "path": "tree_path_col", "modified": "tree_modified_col",
+                        "size_mb": "tree_size_col", "match": "tree_match_col"}
+        try:
+            for col_id, text_key in heading_keys.items():
+                anchor = tk.CENTER if col_id == "group" else (tk.E if col_id == "size_mb" else tk.W)
+                similar_tree.heading(col_id, text=self._(text_key, default=col_id.replace('_', ' ').title()), anchor=anchor)
+        except tk.TclError: pass
+
     def _treeview_sort_column(self, col):
-        """Sorts the treeview rows based on the clicked column header."""
+        """
+        Sorts the treeview rows based on the clicked column header. Sort keys come from the
+        results model (computed once per column) and the view is reordered in one call.
+        """
         tree = self.widgets.get("treeview")
-        if not tree or not tree.winfo_exists() or not self.treeview_item_map:
+        model = self.results_model
+        if not tree or not tree.winfo_exists() or not self.treeview_item_map or not len(model):
             self.log_message("No data in the list to sort.")
             return
 
@@ -1644,75 +4617,26 @@ class DuplicateFinderApp:
             self._sort_ascending = True
             self._last_sort_col = col
 
-        # Prepare Data for Sorting
-        items_to_sort = []
-        now_aware = datetime.now(timezone.utc)
-        min_datetime_sort = datetime.min.replace(tzinfo=timezone.utc)
-        max_datetime_sort = datetime.max.replace(tzinfo=timezone.utc) - timedelta(seconds=1)
-
-        def get_sortable_datetime(dt_obj):
-            if isinstance(dt_obj, datetime):
-                if dt_obj.tzinfo is None or dt_obj.tzinfo.utcoffset(dt_obj) is None:
-                     return min_datetime_sort if self._sort_ascending else max_datetime_sort
-                else:
-                    return dt_obj
+        try:
+            if col in ResultsModel.STATIC_SORT_COLUMNS:
+                order = model.sorted_rows(col, self._sort_ascending)
             else:
-                return min_datetime_sort if self._sort_ascending else max_datetime_sort
+                # Action values change with every rule/click, so they are read fresh from the model
+                action_texts = {action: text.lower() for action, text in self._action_display_texts().items()}
+                dynamic_keys = [action_texts[action] for action in model.actions]
+                order = model.sorted_rows(col, self._sort_ascending, keys=dynamic_keys)
+        except Exception as e:
+            self.log_message(f"Error: Could not sort column '{col}'. ({e})")
+            self._last_sort_col = None
+            self.setup_treeview_headings() # Reset header visuals
+            return
 
-        for item_id in tree.get_children(''):
-            if item_id in self.treeview_item_map:
-                file_info = self.treeview_item_map[item_id]
-                sort_value = None
-                try:
-                    if col == 'path':
-                        sort_value = file_info.get('path', '').lower()
-                    elif col == 'modified':
-                        sort_value = get_sortable_datetime(file_info.get('modified'))
-                    elif col == 'size_mb':
-                        size_str = tree.set(item_id, col)
-                        try:
-                            sort_value = float(size_str)
-                        except ValueError:
-                            sort_value = 0.0
-                    elif col == 'set_id':
-                        current_val_str = tree.set(item_id, col)
-                        match = re.search(r'\d+', current_val_str)
-                        sort_value = int(match.group(0)) if match else 0
-                    elif col == 'action':
-                        sort_value = tree.set(item_id, col).lower()
-                    else:
-                        sort_value = tree.set(item_id, col).lower()
-                    items_to_sort.append((sort_value, item_id))
-                except Exception as e:
-                    print(f"Error getting sort value for item {item_id}, col {col}: {e}")
-                    default_sort_val = 0
-                    if col == 'modified': default_sort_val = min_datetime_sort if self._sort_ascending else max_datetime_sort
-                    elif col in ['path', 'action']: default_sort_val = "" if self._sort_ascending else "~"
-                    elif col == 'size_mb': default_sort_val = 0.0
-                    items_to_sort.append((default_sort_val, item_id))
-
-        # Perform the Sort
+        # Reorder Items in the Treeview with a single bulk operation
+        item_ids = model.item_ids
         try:
-            items_to_sort.sort(key=lambda x: x[0], reverse=not self._sort_ascending)
-        except TypeError as te:
-            self.log_message(f"Error: Could not sort column '{col}'. Inconsistent data types found. ({te})")
-            print(f"Sorting TypeError for column {col}: {te}")
-            try:
-                print(f"Attempting fallback string sort for column {col}")
-                items_to_sort.sort(key=lambda x: str(x[0]), reverse=not self._sort_ascending)
-            except Exception as fallback_e:
-                self.log_message(f"Error: Fallback sort for column '{col}' also failed. ({fallback_e})")
-                self._last_sort_col = None
-                self.setup_treeview_headings() # Reset header visuals
-                return
-
-        # Reorder Items in the Treeview
-        for i, (_, item_id) in enumerate(items_to_sort):
-            try:
-                if tree.exists(item_id):
-                    tree.move(item_id, '', i)
-            except tk.TclError as e:
-                print(f"Error moving tree item {item_id}: {e}")
+            tree.set_children('', *[item_ids[i] for i in order])
+        except tk.TclError as e:
+            self.log_message(f"Error reordering list for column '{col}': {e}")
 
         self.setup_treeview_headings()
 
@@ -1767,6 +4691,10 @@ class DuplicateFinderApp:
         # Clear other fields and listbox before loading
         for key in ["account", "password", "mount_point"]:
             if key in self.string_vars: self.string_vars[key].set("")
+        self.string_vars["quarantine_path"].set(DEFAULT_QUARANTINE_PATH)
+        self.string_vars["inventory_db"].set("")
+        self.source_name = DEFAULT_SOURCE_NAME
+        self.extra_sources = []
         scan_listbox = self.widgets.get("scan_path_listbox")
         if scan_listbox and scan_listbox.winfo_exists():
             try: scan_listbox.delete(0, tk.END)
@@ -1789,6 +4717,14 @@ class DuplicateFinderApp:
                 self.string_vars["account"].set(cfg_section.get("clouddrive2_account", ""))
                 self.string_vars["password"].set(cfg_section.get("clouddrive2_passwd", ""))
                 self.string_vars["mount_point"].set(cfg_section.get("clouddrive2_root_path", ""))
+                self.policy_entry_var.set(cfg_section.get("keep_policy", DEFAULT_KEEP_POLICY))
+                self.string_vars["quarantine_path"].set(cfg_section.get("quarantine_path", DEFAULT_QUARANTINE_PATH))
+                self.string_vars["inventory_db"].set(cfg_section.get("inventory_db", ""))
+                try: self.snapshot_inventory_var.set(cfg_section.getboolean("snapshot_inventory", fallback=False))
+                except ValueError: self.snapshot_inventory_var.set(False)
+                self.local_backend_var.set(cfg_section.get("storage_backend", BACKEND_CLOUDDRIVE).strip().lower() == BACKEND_LOCAL)
+                self.source_name = cfg_section.get("source_name", DEFAULT_SOURCE_NAME).strip() or DEFAULT_SOURCE_NAME
+                self.extra_sources = self._read_source_sections(config)
                 # <<< REMOVED: Load filter extensions >>>
                 # self.filter_extensions_var.set(cfg_section.get("filter_extensions", ""))
 
@@ -1814,6 +4750,40 @@ class DuplicateFinderApp:
              self.log_message(traceback.format_exc())
 
 
+    def _read_source_sections(self, config):
+        """
+        Extra connections from the [source <name>] sections, which use the same keys as [config].
+        Invalid sections are logged and skipped.
+        """
+        sources = []
+        for section in config.sections():
+            if not section.lower().startswith(SOURCE_SECTION_PREFIX): continue
+            name = section[len(SOURCE_SECTION_PREFIX):].strip()
+            cfg_section = config[section]
+            source = {
+                "name": name,
+                "backend": cfg_section.get("storage_backend", BACKEND_CLOUDDRIVE).strip().lower(),
+                "address": cfg_section.get("clouddrvie2_address", DEFAULT_API_ADDRESS),
+                "account": cfg_section.get("clouddrive2_account", ""),
+                "passwd": cfg_section.get("clouddrive2_passwd", ""),
+                "mount_point": cfg_section.get("clouddrive2_root_path", "").strip(),
+                "scan_paths": [p.strip() for p in cfg_section.get("root_path", "").split('\n') if p.strip()],
+            }
+            reason = None
+            if not name or '/' in name or '\\' in name:
+                reason = "the source name must not be empty or contain slashes"
+            elif not source["mount_point"] or not source["scan_paths"]:
+                reason = "clouddrive2_root_path and root_path are required"
+            if reason:
+                self.log_message(self._("warning_source_invalid", section=section, reason=reason, default=f"Ignoring config section [{section}]: {reason}"))
+                continue
+            sources.append(source)
+        if sources:
+            names = ", ".join(source["name"] for source in sources)
+            self.log_message(self._("status_sources_loaded", count=len(sources), names=names,
+                                    default=f"Loaded {len(sources)} additional source(s) from the config: {names}."))
+        return sources
+
     def save_config(self):
         """ Saves current configuration from GUI fields to the ini file. """
         config_path = CONFIG_FILE
@@ -1834,6 +4804,12 @@ class DuplicateFinderApp:
             "clouddrive2_passwd": self.string_vars["password"].get(),
             "root_path": root_path_value,
             "clouddrive2_root_path": self.string_vars["mount_point"].get(),
+            "keep_policy": self.policy_entry_var.get().strip(),
+            "quarantine_path": self.string_vars["quarantine_path"].get().strip(),
+            "snapshot_inventory": "true" if self.snapshot_inventory_var.get() else "false",
+            "inventory_db": self.string_vars["inventory_db"].get().strip(),
+            "storage_backend": BACKEND_LOCAL if self.local_backend_var.get() else BACKEND_CLOUDDRIVE,
+            "source_name": self.source_name,
             # <<< REMOVED: Save filter extensions >>>
             # "filter_extensions": self.filter_extensions_var.get(),
         }
@@ -1969,52 +4945,42 @@ class DuplicateFinderApp:
     def set_ui_state(self, mode):
         """
         Enable/disable UI elements based on the application's current mode.
-        Modes: 'initial', 'normal' (connected/idle), 'testing_connection', 'finding', 'deleting', 'charting'
+        Modes: 'initial', 'normal' (connected/idle), 'testing_connection', 'finding', 'populating', 'deleting', 'charting', 'exporting'
         """
+        self._ui_mode = mode
         is_idle_state = mode in ['initial', 'normal']
         is_connected = mode != 'initial' and self.finder is not None and self.finder.fs is not None
-        has_duplicates = is_connected and bool(self.duplicate_sets) # Check displayed sets
+        has_duplicates = bool(self.duplicate_sets) # Check displayed sets (rules and reports also work offline)
 
-        # Check treeview directly for delete state
-        has_files_marked_for_deletion = False
-        tree = self.widgets.get("treeview")
-        if is_connected and has_duplicates and tree and tree.winfo_exists():
-             delete_text = self._("tree_action_delete", default="Delete")
-             try: # Added try block here
-                 for item_id in tree.get_children(''):
-                     if tree.exists(item_id) and tree.set(item_id, "action") == delete_text:
-                         has_files_marked_for_deletion = True
-                         break
-             except tk.TclError as e:
-                 print(f"Warning: TclError while checking tree for deletable items: {e}")
-                 # Assume no files marked if error occurs during check
-                 has_files_marked_for_deletion = False
-             except Exception as e:
-                 print(f"Warning: Unexpected error while checking tree for deletable items: {e}")
-                 has_files_marked_for_deletion = False
+        # Delete state comes from the results model's running count (no tree scan)
+        has_files_marked_for_deletion = is_connected and has_duplicates and self.results_model.delete_count > 0
 
 
         # Calculate widget states
         config_entry_state = tk.NORMAL if is_idle_state else tk.DISABLED
         config_button_state = tk.NORMAL if is_idle_state else tk.DISABLED
         find_button_state = tk.NORMAL if is_idle_state and is_connected else tk.DISABLED
-        rules_radio_state = tk.NORMAL if is_idle_state and is_connected and has_duplicates else tk.DISABLED
+        rules_radio_state = tk.NORMAL if is_idle_state and has_duplicates else tk.DISABLED
         scan_path_listbox_state = tk.NORMAL if is_idle_state else tk.DISABLED
         scan_path_button_state = tk.NORMAL if is_idle_state else tk.DISABLED
 
-        suffix_widgets_state = tk.DISABLED
-        if rules_radio_state == tk.NORMAL and self.deletion_rule_var.get() == RULE_KEEP_SUFFIX:
-            suffix_widgets_state = tk.NORMAL
+        selected_rule = self.deletion_rule_var.get()
+        argument_widgets_active = rules_radio_state == tk.NORMAL and selected_rule in self.RULE_ARGUMENT_WIDGETS
 
         # Delete button depends on files marked in tree
         delete_button_state = tk.NORMAL if is_idle_state and is_connected and has_duplicates and has_files_marked_for_deletion else tk.DISABLED
-        save_report_button_state = tk.NORMAL if is_idle_state and is_connected and has_duplicates else tk.DISABLED
+        save_report_button_state = tk.NORMAL if is_idle_state and has_duplicates else tk.DISABLED
+        resume_delete_button_state = tk.NORMAL if is_idle_state and is_connected and self._resumable_journal is not None else tk.DISABLED
+        has_quarantine_path = bool(self.string_vars["quarantine_path"].get().strip()) if "quarantine_path" in self.string_vars else False
+        quarantine_button_state = delete_button_state if has_quarantine_path else tk.DISABLED
+        purge_quarantine_button_state = tk.NORMAL if is_idle_state and is_connected and has_quarantine_path else tk.DISABLED
         chart_button_state = tk.NORMAL if is_idle_state and is_connected and MATPLOTLIB_AVAILABLE else tk.DISABLED
+        find_similar_button_state = tk.NORMAL if is_idle_state and self.finder is not None and self.finder.last_inventory else tk.DISABLED
 
         # Apply states safely
         for key, entry in self.entries.items():
             # <<< REMOVED: State setting for filter entry >>>
-            if key != "suffix" and entry and entry.winfo_exists():
+            if key not in ("suffix", "policy") and entry and entry.winfo_exists():
                 try: entry.config(state=config_entry_state)
                 except tk.TclError: pass
 
@@ -2047,14 +5013,7 @@ class DuplicateFinderApp:
              if radio and radio.winfo_exists():
                  try: radio.config(state=rules_radio_state)
                  except tk.TclError: pass
-        widget = self.widgets.get("suffix_label")
-        if widget and widget.winfo_exists():
-             try: widget.config(state=suffix_widgets_state)
-             except tk.TclError: pass
-        widget = self.widgets.get("suffix_entry")
-        if widget and widget.winfo_exists():
-             try: widget.config(state=suffix_widgets_state)
-             except tk.TclError: pass
+        self._set_rule_argument_widgets_state(selected_rule if argument_widgets_active else None)
 
         widget = self.widgets.get("delete_button")
         if widget and widget.winfo_exists():
@@ -2064,6 +5023,22 @@ class DuplicateFinderApp:
         if widget and widget.winfo_exists():
              try: widget.config(state=save_report_button_state)
              except tk.TclError: pass
+        widget = self.widgets.get("resume_delete_button")
+        if widget and widget.winfo_exists():
+             try: widget.config(state=resume_delete_button_state)
+             except tk.TclError: pass
+        widget = self.widgets.get("quarantine_button")
+        if widget and widget.winfo_exists():
+             try: widget.config(state=quarantine_button_state)
+             except tk.TclError: pass
+        widget = self.widgets.get("purge_quarantine_button")
+        if widget and widget.winfo_exists():
+             try: widget.config(state=purge_quarantine_button_state)
+             except tk.TclError: pass
+        widget = self.widgets.get("find_similar_button")
+        if widget and widget.winfo_exists():
+             try: widget.config(state=find_similar_button_state)
+             except tk.TclError: pass
         widget = self.widgets.get("chart_button")
         if widget and widget.winfo_exists():
             try:
@@ -2079,8 +5054,14 @@ class DuplicateFinderApp:
         mount_point = self.string_vars["mount_point"].get()
         scan_listbox = self.widgets.get("scan_path_listbox")
         scan_paths = list(scan_listbox.get(0, tk.END)) if scan_listbox else []
+        backend = BACKEND_LOCAL if self.local_backend_var.get() else BACKEND_CLOUDDRIVE
 
-        if not all([address, account, mount_point]):
+        if backend == BACKEND_LOCAL and not mount_point:
+             error_msg = self._("error_input_missing_local", default="The Mount Point (local base folder) is required to scan local folders.")
+             self.log_message(error_msg)
+             if self.master.winfo_exists(): messagebox.showerror(self._("error_input_title", default="Input Error"), error_msg, master=self.master)
+             return
+        if backend == BACKEND_CLOUDDRIVE and not all([address, account, mount_point]):
              error_msg = self._("error_input_missing_conn", default="API Address, Account, and Mount Point are required for connection test.")
              self.log_message(error_msg)
              if self.master.winfo_exists(): messagebox.showerror(self._("error_input_title", default="Input Error"), error_msg, master=self.master)
@@ -2088,7 +5069,7 @@ class DuplicateFinderApp:
 
         # Check mount point, but not scan paths for connection test char validation
         paths_to_check_conn = {
-            "address": address,
+            "address": address if backend == BACKEND_CLOUDDRIVE else "",
             "mount_point": mount_point,
             # <<< REMOVED: Filter field check >>>
         }
@@ -2098,16 +5079,19 @@ class DuplicateFinderApp:
         self.log_message(self._("status_connecting", default="Attempting connection test..."))
         self.set_ui_state("testing_connection")
         thread = threading.Thread(target=self._test_connection_worker,
-                                  args=(address, account, self.string_vars["password"].get(), scan_paths, mount_point),
+                                  args=(address, account, self.string_vars["password"].get(), scan_paths, mount_point, backend,
+                                        list(self.extra_sources), self.source_name),
                                   daemon=True)
         thread.start()
 
-    def _test_connection_worker(self, address, account, passwd, scan_paths, mount_point):
-        """ Worker thread for testing the CloudDrive2 connection. """
+    def _test_connection_worker(self, address, account, passwd, scan_paths, mount_point, backend=BACKEND_CLOUDDRIVE,
+                                extra_sources=None, source_name=DEFAULT_SOURCE_NAME):
+        """ Worker thread for testing the CloudDrive2 connection (or access to the local base folder), plus any extra sources. """
         connected = False
         try:
             # Pass log_message callback here
-            connected = self.finder.set_config(address, account, passwd, scan_paths, mount_point, self.log_message)
+            connected = self.finder.set_config(address, account, passwd, scan_paths, mount_point, self.log_message, backend=backend,
+                                               extra_sources=extra_sources, source_name=source_name)
 
             if self.master.winfo_exists():
                  if connected:
@@ -2150,8 +5134,9 @@ class DuplicateFinderApp:
         # filter_ext_val = self.filter_extensions_var.get()
 
         missing = []
-        if not address_val: missing.append(f"'{self._('address_label').rstrip(': ')}'")
-        if not account_val: missing.append(f"'{self._('account_label').rstrip(': ')}'")
+        if self.finder.fs.name == BACKEND_CLOUDDRIVE: # Local folders need no API address or account
+            if not address_val: missing.append(f"'{self._('address_label').rstrip(': ')}'")
+            if not account_val: missing.append(f"'{self._('account_label').rstrip(': ')}'")
         if not mount_point_val: missing.append(f"'{self._('mount_point_label').rstrip(': ')}'")
         if not scan_paths_val: missing.append(f"'{self._('scan_paths_label').rstrip(': ')} (at least one)")
 
@@ -2168,15 +5153,54 @@ class DuplicateFinderApp:
             return
 
         self.clear_results() # Clear previous results and tree
+        self._apply_scan_options()
         self.log_message(self._("find_starting", num_paths=len(scan_paths_val), default=f"Starting duplicate scan ({len(scan_paths_val)} paths)..."))
         self.set_ui_state("finding")
 
         thread = threading.Thread(target=self._find_duplicates_worker, daemon=True)
         thread.start()
 
-    def _find_duplicates_worker(self):
-        """ Worker thread for finding duplicates. Calls finder method and schedules GUI update. """
-        if not self.finder or not self.finder.fs:
+    def _on_storage_backend_toggle(self):
+        """ File > Scan Local Folders: switching storage drops the current connection (it belongs to the other backend). """
+        if self._ui_mode not in ('initial', 'normal'):
+            self.local_backend_var.set(not self.local_backend_var.get()) # Not while a task runs
+            return
+        backend = BACKEND_LOCAL if self.local_backend_var.get() else BACKEND_CLOUDDRIVE
+        if self.finder.fs is not None and self.finder.fs.name != backend:
+            self.finder.fs = None
+        self.log_message(self._("storage_backend_changed", backend=backend, default=f"Storage switched to {backend}. Click 'Test Connection' to connect."))
+        self.set_ui_state('normal' if self.finder.fs is not None else 'initial')
+
+    def _apply_scan_options(self):
+        """ Copies the scan options from the UI to the finder (main thread: Tk variables are read here). """
+        quarantine_path = self.string_vars["quarantine_path"].get().strip()
+        self.finder.excluded_paths = [quarantine_path] if quarantine_path else []
+        self._scan_snapshot_inventory = self.snapshot_inventory_var.get()
+        inventory_db = self.string_vars["inventory_db"].get().strip()
+        # Relative database paths are kept next to the script, like the other data files
+        self.finder.inventory_db_path = (inventory_db if os.path.isabs(inventory_db) else resource_path(inventory_db)) if inventory_db else None
+
+    def scan_dump_file(self):
+        """
+        File > Scan Directory Dump: builds the results from a local JSON/CSV listing (paths, sizes, SHA1)
+        instead of walking the cloud drive. Works without a connection; deleting still needs one.
+        """
+        if self._ui_mode not in ('initial', 'normal'): return
+        path = filedialog.askopenfilename(
+            filetypes=[(self._("dump_filetype", default="Directory dumps (JSON, JSON Lines, CSV)"), "*.json *.jsonl *.ndjson *.csv *.gz"), ("All files", "*.*")],
+            title=self._("menu_scan_dump", default="Scan Directory Dump (Offline)..."), parent=self.master)
+        if not path: return
+        previous_mode = self._ui_mode
+        self.clear_results()
+        self._apply_scan_options()
+        self.finder.progress_callback = self.log_message # Not set yet when no connection was made
+        self.set_ui_state("finding")
+        thread = threading.Thread(target=self._find_duplicates_worker, args=(path, previous_mode), daemon=True)
+        thread.start()
+
+    def _find_duplicates_worker(self, dump_path=None, previous_mode='normal'):
+        """ Worker thread for finding duplicates (in the cloud, or in `dump_path`). Calls finder method and schedules GUI update. """
+        if not dump_path and (not self.finder or not self.finder.fs):
             self.log_message("Error: Connection lost before Find Duplicates scan could execute.")
             if self.master.winfo_exists(): self.master.after(0, self.set_ui_state, 'normal')
             return
@@ -2184,7 +5208,8 @@ class DuplicateFinderApp:
         all_found_duplicates = {}
         try:
             # Call the core logic - returns ALL video duplicates found based on VIDEO_EXTENSIONS
-            all_found_duplicates = self.finder.find_duplicates()
+            all_found_duplicates = self.finder.find_duplicates(dump_path=dump_path)
+            self._save_scan_snapshot(all_found_duplicates)
 
             if self.master.winfo_exists():
                 # Pass the *full* results to the GUI thread for processing (no filtering needed here anymore)
@@ -2198,7 +5223,130 @@ class DuplicateFinderApp:
                  error_title = self._("error_title", default="Scan Error")
                  self.master.after(10, lambda et=error_title, em=err_msg: messagebox.showerror(et, em, master=self.master))
                  # Reset state even on error, but don't call process_find_results
-                 self.master.after(0, self.set_ui_state, 'normal')
+                 self.master.after(0, self.set_ui_state, previous_mode)
+
+    def _save_scan_snapshot(self, duplicate_sets):
+        """
+        Saves the results of a finished scan to SNAPSHOT_DIR (runs in the scan worker thread), with the
+        full inventory when enabled in the File menu. Only the newest SNAPSHOT_KEEP_COUNT are kept.
+        """
+        include_inventory = self._scan_snapshot_inventory and bool(self.finder.last_inventory)
+        groups = self.finder.last_inventory if include_inventory else duplicate_sets
+        if not groups: return
+        path = os.path.join(SNAPSHOT_DIR, f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}{SNAPSHOT_EXTENSION}")
+        self._write_snapshot(path, groups, include_inventory)
+        try:
+            old_snapshots = sorted(name for name in os.listdir(SNAPSHOT_DIR) if name.startswith("scan_") and name.endswith(SNAPSHOT_EXTENSION))
+            for name in old_snapshots[:-SNAPSHOT_KEEP_COUNT]:
+                os.remove(os.path.join(SNAPSHOT_DIR, name))
+        except OSError: pass
+
+    def _write_snapshot(self, path, groups, include_inventory=False):
+        """ Writes a snapshot and logs the outcome. Returns True on success. """
+        meta = {"created": datetime.now().strftime(DATE_FORMAT), "scan_roots": list(self.finder.scan_roots),
+                "inventory": include_inventory}
+        try:
+            set_count, file_count = ScanSnapshot.write(path, groups, meta)
+        except OSError as e:
+            self.log_message(self._("snapshot_save_error", file=os.path.basename(path), error=e, default=f"Could not save snapshot {os.path.basename(path)}: {e}"))
+            return False
+        self.log_message(self._("snapshot_saved", file=os.path.basename(path), sets=set_count, files=file_count,
+                                default=f"Snapshot saved: {os.path.basename(path)} ({set_count} sets, {file_count} files)."))
+        return True
+
+    def _snapshot_filetypes(self):
+        return [(self._("snapshot_filetype", default="Scan snapshots"), f"*{SNAPSHOT_EXTENSION}"), ("All files", "*.*")]
+
+    def save_snapshot_as(self):
+        """ File > Save Snapshot As: writes the duplicate sets currently shown to a snapshot file. """
+        if not self.duplicate_sets:
+            self.log_message(self._("save_report_no_data", default="No duplicate sets available to save."))
+            return
+        if self._ui_mode not in ('initial', 'normal'): return
+        path = filedialog.asksaveasfilename(
+            defaultextension=SNAPSHOT_EXTENSION, filetypes=self._snapshot_filetypes(),
+            title=self._("menu_save_snapshot", default="Save Snapshot As..."), initialdir=SNAPSHOT_DIR,
+            initialfile=f"duplicates_{datetime.now().strftime('%Y%m%d_%H%M%S')}{SNAPSHOT_EXTENSION}", parent=self.master)
+        if not path: return
+        thread = threading.Thread(target=self._write_snapshot, args=(path, dict(self.duplicate_sets)), daemon=True)
+        thread.start()
+
+    def open_snapshot(self):
+        """ File > Open Snapshot: replaces the results with the duplicate sets of a snapshot file (no rescan). """
+        if self._ui_mode not in ('initial', 'normal'): return
+        path = filedialog.askopenfilename(filetypes=self._snapshot_filetypes(), initialdir=SNAPSHOT_DIR,
+                                          title=self._("menu_open_snapshot", default="Open Snapshot..."), parent=self.master)
+        if not path: return
+        previous_mode = self._ui_mode
+        self.clear_results()
+        self.log_message(self._("snapshot_loading", file=os.path.basename(path), default=f"Loading snapshot {os.path.basename(path)}..."))
+        self.set_ui_state("finding")
+        thread = threading.Thread(target=self._open_snapshot_worker, args=(path, previous_mode), daemon=True)
+        thread.start()
+
+    def _open_snapshot_worker(self, path, previous_mode):
+        """ Worker thread: decodes the snapshot's duplicate sets and hands them to the normal results path. """
+        try:
+            with ScanSnapshot.open(path) as snapshot:
+                duplicate_sets = snapshot.duplicate_sets()
+                meta = snapshot.meta
+        except (OSError, ValueError) as e:
+            self.log_message(self._("snapshot_load_error", file=os.path.basename(path), error=e, default=f"Could not open snapshot {os.path.basename(path)}: {e}"))
+            if self.master.winfo_exists(): self.master.after(0, self.set_ui_state, previous_mode)
+            return
+        if meta.get("scan_roots"):
+            self.finder.scan_roots = list(meta["scan_roots"]) # Bounds folder cleanup for deletions from this snapshot
+        self.log_message(self._("snapshot_loaded", file=os.path.basename(path), created=meta.get("created", "?"), sets=len(duplicate_sets),
+                                default=f"Snapshot {os.path.basename(path)} loaded: {len(duplicate_sets)} duplicate sets."))
+        if self.master.winfo_exists():
+            self.master.after(0, self._process_find_results, duplicate_sets)
+
+    def compare_with_snapshot(self):
+        """ File > Compare with Snapshot: classifies the current sets against an older snapshot. """
+        if not self.duplicate_sets:
+            self.log_message(self._("save_report_no_data", default="No duplicate sets available to compare."))
+            return
+        if self._ui_mode not in ('initial', 'normal'): return
+        path = filedialog.askopenfilename(filetypes=self._snapshot_filetypes(), initialdir=SNAPSHOT_DIR,
+                                          title=self._("menu_compare_snapshot", default="Compare with Snapshot..."), parent=self.master)
+        if not path: return
+        self.log_message(self._("snapshot_comparing", file=os.path.basename(path), default=f"Comparing current results with snapshot {os.path.basename(path)}..."))
+        thread = threading.Thread(target=self._compare_snapshot_worker, args=(path, dict(self.duplicate_sets)), daemon=True)
+        thread.start()
+
+    def _compare_snapshot_worker(self, path, duplicate_sets):
+        """ Worker thread: diffs the snapshot's duplicate sets against `duplicate_sets`. """
+        try:
+            with ScanSnapshot.open(path) as snapshot:
+                changes, unchanged_count, resolved = diff_duplicate_sets(snapshot.iter_sets(min_files=2), duplicate_sets)
+        except (OSError, ValueError) as e:
+            self.log_message(self._("snapshot_load_error", file=os.path.basename(path), error=e, default=f"Could not open snapshot {os.path.basename(path)}: {e}"))
+            return
+        counts = Counter(changes.values())
+        self.log_message(self._("snapshot_compare_done", file=os.path.basename(path), new=counts[SET_CHANGE_NEW], grown=counts[SET_CHANGE_GROWN],
+                                shrunk=counts[SET_CHANGE_SHRUNK], unchanged=unchanged_count, resolved=len(resolved),
+                                default=f"Compared with {os.path.basename(path)}: {counts[SET_CHANGE_NEW]} new, {counts[SET_CHANGE_GROWN]} grown, "
+                                        f"{counts[SET_CHANGE_SHRUNK]} shrunk, {unchanged_count} unchanged and {len(resolved)} resolved set(s)."))
+        if self.master.winfo_exists():
+            self.master.after(0, self._apply_set_changes, changes)
+
+    def _apply_set_changes(self, changes):
+        """ Stores a comparison result and switches the results list to the changed sets. """
+        self.set_changes = changes
+        self.show_changes_only_var.set(True)
+        self._on_show_changes_only_toggle()
+
+    def _on_show_changes_only_toggle(self):
+        """ Repopulates the results list when 'Show Only New or Changed Sets' changes. """
+        if self.duplicate_sets and self._ui_mode in ('initial', 'normal'):
+            self.populate_treeview()
+
+    def _displayed_sets(self):
+        """ The duplicate sets the results list shows: all of them, or only changed ones when filtering. """
+        if self.show_changes_only_var.get() and self.set_changes is not None:
+            changes = self.set_changes
+            return {sha1: files for sha1, files in self.duplicate_sets.items() if sha1 in changes}
+        return self.duplicate_sets
 
     # <<< REMOVED: _parse_filter_extensions helper >>>
     # <<< REMOVED: _matches_filter helper >>>
@@ -2209,6 +5357,7 @@ class DuplicateFinderApp:
         Stores ALL results and updates GUI. (No type filtering at this stage).
         """
         if not self.master.winfo_exists(): return
+        self._invalidate_rule_cache()
 
         # --- Store ALL found results ---
         # No filtering step here anymore. all_found_duplicates contains sets with >1 file.
@@ -2219,7 +5368,8 @@ class DuplicateFinderApp:
         if self.duplicate_sets:
             # Use the updated translation key
             self.log_message(self._("find_complete_found", count_total=initial_count, default=f"Scan complete. Found {initial_count} potential duplicate sets."))
-            self.populate_treeview() # Populate with ALL data
+            self.populate_treeview() # Populate with ALL data (UI state restored when population ends)
+            return
         else:
             # Clear treeview if it had previous data
             tree = self.widgets.get("treeview")
@@ -2237,8 +5387,12 @@ class DuplicateFinderApp:
         """Clears the treeview, stored duplicate data, rule selection, and resets sort."""
         self.log_message(self._("status_clearing_tree", default="Clearing results list and rule selection..."))
 
+        self._cancel_population()
+        self._invalidate_rule_cache()
         self.duplicate_sets = {} # Clear stored sets
+        self.set_changes = None
         self.treeview_item_map = {}
+        self.results_model = ResultsModel()
         self.deletion_rule_var.set("")
         self.suffix_entry_var.set("")
         self._last_sort_col = None
@@ -2250,132 +5404,257 @@ class DuplicateFinderApp:
                 if tree.get_children(): tree.delete(*tree.get_children())
                 self.setup_treeview_headings() # Reset headers
             except tk.TclError: pass
+        self._clear_similar_results()
 
         # Set state *after* clearing rule var
         self.set_ui_state('normal')
 
 
     def populate_treeview(self):
-        """ Populates the treeview with found duplicate sets (ALL video types found). """
+        """
+        Populates the treeview with found duplicate sets (ALL video types found).
+        Display rows are prepared in a background thread, then inserted in time-sliced
+        chunks scheduled with after() so the window stays responsive. Progress is shown
+        next to the action buttons and population can be aborted.
+        """
         tree = self.widgets.get("treeview")
         if not tree or not tree.winfo_exists():
             self.log_message("Error: Treeview widget not available. Cannot display results.")
+            self.set_ui_state('normal')
             return
 
-        # self.duplicate_sets now contains ALL found video duplicates
-        count = len(self.duplicate_sets)
+        self._cancel_population() # Stop any population still in flight
+
+        # self.duplicate_sets now contains ALL found video duplicates (optionally narrowed to changed sets)
+        displayed_sets = self._displayed_sets()
+        count = len(displayed_sets)
+        if displayed_sets is not self.duplicate_sets:
+            self.log_message(self._("status_showing_changes", shown=count, total=len(self.duplicate_sets),
+                                    default=f"Showing {count} of {len(self.duplicate_sets)} duplicate sets (new or changed since the compared snapshot)."))
         if count == 0:
              self.log_message("No duplicate sets found to display.") # Adjusted message
              try:
                  if tree.get_children(): tree.delete(*tree.get_children())
              except tk.TclError: pass
              self.treeview_item_map.clear()
+             self.results_model = ResultsModel()
+             self.set_ui_state('normal')
              return
 
         self.log_message(self._("status_populating_tree", count=count, default=f"Populating list with {count} duplicate sets..."))
-        start_time = time.time()
 
         try:
             if tree.get_children(): tree.delete(*tree.get_children())
         except tk.TclError:
             self.log_message("Error clearing treeview before population.")
+            self.set_ui_state('normal')
             return
         self.treeview_item_map.clear()
+        self.results_model = ResultsModel()
 
-        set_index = 0
-        items_inserted = 0
-        items_failed = 0
-        sorted_sha1s = sorted(self.duplicate_sets.keys())
+        generation = self._populate_generation
+        self._populate_abort_requested = False
+        self.set_ui_state('populating')
+        self._show_progress(self._("status_preparing_rows", count=count, default=f"Preparing {count} duplicate sets for display..."), 0, 1)
 
-        for sha1 in sorted_sha1s:
-            files_in_set = self.duplicate_sets[sha1]
-            if not isinstance(files_in_set, list) or len(files_in_set) < 2:
-                continue # Safety check
+        # Translate the set column template once; the worker formats it per row
+        set_id_template = self._("tree_set_col_value", default="{index}")
+        thread = threading.Thread(target=self._prepare_tree_rows_worker,
+                                  args=(generation, displayed_sets, set_id_template),
+                                  daemon=True)
+        thread.start()
 
-            set_index += 1
-            sorted_files = sorted(files_in_set, key=lambda x: x.get('path', ''))
+    def _prepare_tree_rows_worker(self, generation, duplicate_sets, set_id_template):
+        """ Worker thread: sorts sets and precomputes display strings, then hands off to the GUI thread. """
+        start_time = time.time()
+        try:
+            model = ResultsModel.from_duplicate_sets(duplicate_sets, set_id_template)
+        except Exception as e:
+            self.log_message(f"Unexpected error preparing results for display: {e}")
+            self.log_message(traceback.format_exc(limit=2))
+            model = ResultsModel()
+        if self.master.winfo_exists():
+            self.master.after(0, self._begin_tree_insert, generation, model, start_time)
+
+    def _begin_tree_insert(self, generation, model, start_time):
+        """ Starts chunked insertion of a prepared model (runs in main thread). """
+        if generation != self._populate_generation or not self.master.winfo_exists():
+            return # Superseded by a newer population or a clear
+        self.results_model = model
+        self._insert_tree_chunk(generation, 0, model.skipped, start_time)
+
+    def _insert_tree_chunk(self, generation, position, items_failed, start_time):
+        """ Inserts rows until the time slice is used up, then reschedules itself. """
+        self._populate_job = None
+        if generation != self._populate_generation:
+            return
+        tree = self.widgets.get("treeview")
+        model = self.results_model
+        total = len(model)
+        if not tree or not tree.winfo_exists():
+            return
 
-            for file_info in sorted_files:
-                try:
-                    path = file_info.get('path')
-                    if not path:
-                         self.log_message(f"Warning: Skipping file in set {set_index} (SHA1: {sha1[:8]}...) due to missing path.")
-                         items_failed += 1
-                         continue
-
-                    mod_time = file_info.get('modified')
-                    mod_time_str = mod_time.strftime(DATE_FORMAT) if isinstance(mod_time, datetime) else "N/A"
-                    size = file_info.get('size')
-                    size_mb = size / (1024 * 1024) if isinstance(size, (int, float)) and size > 0 else 0.0
-                    set_id_str = self._("tree_set_col_value", index=set_index, default=f"{set_index}")
-
-                    # Initial Action is empty, no initial tag
-                    values = ("", path, mod_time_str, f"{size_mb:.2f}", set_id_str)
-                    item_id = path # Use path as the unique item ID
-
-                    if not tree.exists(item_id):
-                         # Store the Set ID within the file_info for easier lookup later
-                         file_info['_set_id_display'] = set_id_str
-                         tree.insert("", tk.END, iid=item_id, values=values, tags=())
-                         self.treeview_item_map[item_id] = file_info
-                         items_inserted += 1
-                    else:
-                         self.log_message(f"Warning: Item with path '{path}' already exists in tree. Skipping duplicate insertion.")
-                         items_failed += 1
-
-                except tk.TclError as e:
-                     item_id_str = item_id if 'item_id' in locals() and item_id else path if 'path' in locals() and path else 'Unknown'
-                     self.log_message(f"Error inserting item with path '{item_id_str}' into tree: {e}")
-                     items_failed += 1
-                     if 'item_id' in locals() and item_id in self.treeview_item_map:
-                         try: del self.treeview_item_map[item_id]
-                         except KeyError: pass
-                except Exception as e:
-                     path_str = file_info.get('path', 'Unknown') if 'file_info' in locals() else 'Unknown'
-                     self.log_message(f"Unexpected error processing file '{path_str}' for treeview: {e}")
-                     self.log_message(traceback.format_exc(limit=2))
-                     items_failed += 1
+        if self._populate_abort_requested:
+            self._finish_population(position, items_failed, start_time, aborted=True)
+            return
+
+        deadline = time.perf_counter() + POPULATE_SLICE_SECONDS
+        insert = tree.insert
+        item_map = self.treeview_item_map
+        try:
+            while position < total:
+                item_id = model.item_ids[position]
+                insert("", tk.END, iid=item_id, values=model.values[position], tags=())
+                item_map[item_id] = model.file_infos[position]
+                position += 1
+                if time.perf_counter() >= deadline:
+                    break
+        except tk.TclError as e:
+            self.log_message(f"Error inserting item with path '{model.item_ids[position]}' into tree: {e}")
+            self._finish_population(position, items_failed + 1, start_time, aborted=True)
+            return
+
+        if position >= total:
+            self._finish_population(position, items_failed, start_time, aborted=False)
+            return
 
-        end_time = time.time()
-        duration = end_time - start_time
+        self._show_progress(self._("status_populate_progress", done=position, total=total, default=f"Loading results: {position}/{total} files"), position, total)
+        self._populate_job = self.master.after(POPULATE_RESCHEDULE_MS, self._insert_tree_chunk,
+                                               generation, position, items_failed, start_time)
+
+    def _finish_population(self, items_inserted, items_failed, start_time, aborted):
+        """ Logs the population summary and restores the normal UI state. """
+        total = len(self.results_model)
+        if aborted:
+            # Keep the model consistent with what is actually displayed
+            self.results_model.truncate(items_inserted)
+            self.log_message(self._("status_populate_aborted", done=items_inserted, total=total, default=f"Loading stopped. {items_inserted} of {total} files shown."))
+
+        duration = time.time() - start_time
         log_summary = self._("status_tree_populated", default="Results list populated.")
         log_summary += f" ({items_inserted} items displayed"
         if items_failed > 0: log_summary += f", {items_failed} skipped due to errors"
         log_summary += f" in {duration:.2f}s)"
         self.log_message(log_summary)
 
+        self._populate_abort_requested = False
+        self._hide_progress()
         self._last_sort_col = None
         self._sort_ascending = True
         self.setup_treeview_headings()
+        self.set_ui_state('normal')
+        if self.deletion_rule_var.get(): # Repopulated (e.g. changed-sets filter): re-mark from the selected rule
+            self._apply_rule_to_treeview(log_update=False)
+
+    def abort_population(self):
+        """ Requests that the running treeview population stops after the current chunk. """
+        self._populate_abort_requested = True
+
+    def _cancel_population(self):
+        """ Invalidates any in-flight population without logging (used before clearing/repopulating). """
+        self._populate_generation += 1
+        self._populate_abort_requested = False
+        self._cancel_pending_render()
+        if self._populate_job is not None:
+            try: self.master.after_cancel(self._populate_job)
+            except tk.TclError: pass
+            self._populate_job = None
+        self._hide_progress()
+
+    def _on_progress_abort(self):
+        """ The progress indicator's stop button: stops deletion, report export or treeview population, whichever is running. """
+        if self._ui_mode == 'deleting':
+            if not self._delete_stop_event.is_set():
+                self._delete_stop_event.set()
+                self.log_message(self._("status_delete_stopping", default="Stopping deletion once the files in progress finish..."))
+        elif self._ui_mode == 'exporting':
+            self._export_stop_event.set()
+        else:
+            self.abort_population()
+
+    def _show_progress(self, text, value, maximum, abort_text_key="abort_populate_button"):
+        """ Shows the progress indicator next to the action buttons. """
+        frame = self.widgets.get("progress_frame")
+        if not frame or not frame.winfo_exists():
+            return
+        try:
+            if not frame.winfo_manager():
+                frame.pack(side=tk.RIGHT, padx=(10, 0))
+            self.widgets["abort_populate_button"].config(text=self._(abort_text_key))
+            self.widgets["progress_label"].config(text=text)
+            self.widgets["progress_bar"].config(maximum=max(maximum, 1), value=value)
+        except tk.TclError: pass
+
+    def _hide_progress(self):
+        """ Hides the progress indicator. """
+        frame = self.widgets.get("progress_frame")
+        if frame and frame.winfo_exists():
+            try: frame.pack_forget()
+            except tk.TclError: pass
 
 
     def _on_rule_change(self):
         """Called when a deletion rule radio button is selected. Applies the rule as a suggestion."""
         selected_rule = self.deletion_rule_var.get()
 
-        # Update suffix entry state
-        is_suffix_rule = (selected_rule == RULE_KEEP_SUFFIX)
-        can_enable_suffix = (is_suffix_rule and
-                             self.finder is not None and self.finder.fs is not None and
-                             bool(self.duplicate_sets)) # Check displayed sets
-        suffix_widgets_state = tk.NORMAL if can_enable_suffix else tk.DISABLED
-
-        suffix_label = self.widgets.get("suffix_label")
-        if suffix_label and suffix_label.winfo_exists():
-            try: suffix_label.config(state=suffix_widgets_state)
-            except tk.TclError: pass
-        suffix_entry = self.widgets.get("suffix_entry")
-        if suffix_entry and suffix_entry.winfo_exists():
-            try: suffix_entry.config(state=suffix_widgets_state)
-            except tk.TclError: pass
+        # Update suffix/policy entry state
+        can_enable_argument = bool(self.duplicate_sets) # Check displayed sets (also offline results)
+        self._set_rule_argument_widgets_state(selected_rule if can_enable_argument else None)
 
-        if not is_suffix_rule:
+        if selected_rule != RULE_KEEP_SUFFIX and self.suffix_entry_var.get():
             self.suffix_entry_var.set("")
+        # The rule is applied right away; a debounced re-apply queued by the entry traces would repeat it
+        self._cancel_rule_argument_job()
 
         # Apply the selected rule to the treeview as a suggestion
         self._apply_rule_to_treeview()
 
 
+    def _invalidate_rule_cache(self):
+        """ Marks duplicate_sets as changed; cached rule suggestions for older versions are dropped. """
+        self._dataset_version += 1
+        self._rule_cache.clear()
+
+    def _set_rule_argument_widgets_state(self, active_rule):
+        """ Enables the label/entry belonging to `active_rule` (if it takes an argument), disables the others. """
+        for rule, (w_key, _t_key) in self.RULE_ARGUMENT_WIDGETS.items():
+            state = tk.NORMAL if rule == active_rule else tk.DISABLED
+            for widget_key in (f"{w_key}_label", f"{w_key}_entry"):
+                widget = self.widgets.get(widget_key)
+                if widget and widget.winfo_exists():
+                    try: widget.config(state=state)
+                    except tk.TclError: pass
+
+    def _current_rule_argument(self, rule):
+        """ Returns the suffix or policy text the given rule is evaluated with (None for plain rules). """
+        if rule == RULE_KEEP_SUFFIX:
+            return self.suffix_entry_var.get()
+        if rule == RULE_KEEP_CUSTOM:
+            return self.policy_entry_var.get().strip()
+        return None
+
+    def _cancel_rule_argument_job(self):
+        if self._rule_argument_job is not None:
+            try: self.master.after_cancel(self._rule_argument_job)
+            except tk.TclError: pass
+            self._rule_argument_job = None
+
+    def _on_rule_argument_change(self, *_args):
+        """ Re-applies the suffix/policy rule shortly after its entry stops changing. """
+        self._cancel_rule_argument_job()
+        selected_rule = self.deletion_rule_var.get()
+        if selected_rule not in self.RULE_ARGUMENT_WIDGETS or not (self._current_rule_argument(selected_rule) or "").strip():
+            return
+        self._rule_argument_job = self.master.after(RULE_ARGUMENT_APPLY_DELAY_MS, self._apply_rule_argument_now)
+
+    def _apply_rule_argument_now(self):
+        """ Debounced target of _on_rule_argument_change. """
+        self._rule_argument_job = None
+        selected_rule = self.deletion_rule_var.get()
+        if selected_rule in self.RULE_ARGUMENT_WIDGETS and (self._current_rule_argument(selected_rule) or "").strip():
+            self._apply_rule_to_treeview()
+
+
     def _apply_rule_to_treeview(self, log_update=True):
         """
         Updates the 'Action' column and highlighting in the treeview based on the
@@ -2402,42 +5681,30 @@ class DuplicateFinderApp:
             self.log_message(self._("status_applying_rule", rule_name=rule_name_display, count=len(self.duplicate_sets), default=f"Applying suggestion rule '{rule_name_display}'..."))
         start_time = time.time()
 
-        keep_text = self._("tree_action_keep", default="Keep")
-        delete_text = self._("tree_action_delete", default="Delete")
-        suffix_to_keep = self.suffix_entry_var.get() if selected_rule == RULE_KEEP_SUFFIX else None
+        rule_argument = self._current_rule_argument(selected_rule)
         delete_count = 0
         application_error = False
-        files_to_delete_list = [] # Store paths suggested for deletion by the rule
 
         try:
-            # Determine the *suggestions* based on the rule, using the displayed sets
-            files_to_delete_list = self._determine_files_to_delete(self.duplicate_sets, selected_rule, suffix_to_keep)
-            files_to_delete_paths_set = set(files_to_delete_list)
+            # Determine the *suggestions* based on the rule, using the displayed sets.
+            files_to_delete_paths_set = self._rule_suggestion(selected_rule, rule_argument, rule_name_display if log_update else None)
             delete_count = len(files_to_delete_paths_set)
 
-            tree_update_start = time.time()
             if not tree.winfo_exists():
                 raise tk.TclError("Treeview destroyed during rule application")
 
-            # Iterate through all items in the treeview and update Action/Tags
-            # Using list() to avoid issues if map changes during iteration (shouldn't here)
-            for item_id in list(self.treeview_item_map.keys()):
-                 if tree.exists(item_id) and item_id in self.treeview_item_map:
-                     file_info = self.treeview_item_map[item_id]
-                     path = file_info.get('path')
-                     if not path: continue
-
-                     is_marked_for_delete = (path in files_to_delete_paths_set)
-                     action_text = delete_text if is_marked_for_delete else keep_text
-                     item_tags = ('delete',) if is_marked_for_delete else ('keep',)
+            # Diff the new Keep/Delete vector against the model; only changed rows are redrawn
+            model = self.results_model
+            new_actions = [ACTION_DELETE if item_id in files_to_delete_paths_set else ACTION_KEEP
+                           for item_id in model.item_ids]
+            changed_items = model.apply_actions(new_actions)
+            self._queue_tree_render(changed_items)
 
-                     tree.set(item_id, "action", action_text)
-                     tree.item(item_id, tags=item_tags)
-                 # else: Item might have been removed already, ignore.
-
-            tree_update_end = time.time()
             if log_update:
                 self.log_message(self._("status_rule_applied", delete_count=delete_count, default=f"Rule suggestion applied. {delete_count} files initially marked for deletion. Click 'Action' column to change."))
+                duration = time.time() - start_time
+                self.log_message(self._("log_debug_rule_evaluated", duration=duration, count=len(changed_items),
+                                        default=f"[Debug] Rule evaluated in {duration:.2f}s; {len(changed_items)} row(s) changed."))
 
         except ValueError as ve: # Catch specific error from _determine_files_to_delete
              self.log_message(f"Rule Suggestion Error: {ve}")
@@ -2459,43 +5726,104 @@ class DuplicateFinderApp:
             # Update UI state which might enable/disable delete button based on tree content
             self.set_ui_state('normal')
 
+    def _rule_suggestion(self, rule, rule_argument, rule_name_display=None):
+        """
+        Returns the frozenset of paths the rule suggests deleting. Results are memoized per
+        (rule, suffix/policy, dataset version); a cache hit is logged when `rule_name_display` is given.
+        Raises: ValueError from _determine_files_to_delete.
+        """
+        cache_key = (rule, rule_argument, self._dataset_version)
+        files_to_delete_paths_set = self._rule_cache.get(cache_key)
+        if files_to_delete_paths_set is None:
+            files_to_delete_list = self._determine_files_to_delete(self.duplicate_sets, rule, rule_argument)
+            files_to_delete_paths_set = frozenset(files_to_delete_list)
+            self._rule_cache[cache_key] = files_to_delete_paths_set
+        elif rule_name_display:
+            self.log_message(self._("status_rule_cache_hit", rule_name=rule_name_display, default=f"Reusing previously computed suggestion for '{rule_name_display}'."))
+        return files_to_delete_paths_set
+
     def _get_set_id_for_item(self, item_id):
-        """ Helper to safely get the set ID string from a treeview item. """
-        tree = self.widgets.get("treeview")
-        if tree and tree.winfo_exists() and tree.exists(item_id):
-            try:
-                return tree.set(item_id, "set_id")
-            except tk.TclError:
-                return None
-        return None
+        """ Helper to get the set number of a treeview item from the model's membership index. """
+        return self.results_model.set_of(item_id)
+
+    def _action_display_texts(self):
+        """ Returns {action code: translated Action column text}. """
+        return {
+            ACTION_KEEP: self._("tree_action_keep", default="Keep"),
+            ACTION_DELETE: self._("tree_action_delete", default="Delete"),
+            None: "",
+        }
 
-    def _update_treeview_tags_from_action(self):
-        """ Updates treeview item tags based on the current value in the 'Action' column. """
+    def _render_tree_rows(self, item_ids, action_texts=None):
+        """
+        Writes the model's action (text and tag) for the given items into the treeview,
+        using one Tk call per row. Items not currently in the tree are ignored.
+        """
         tree = self.widgets.get("treeview")
         if not tree or not tree.winfo_exists():
             return
+        model = self.results_model
+        if action_texts is None:
+            action_texts = self._action_display_texts()
+        failed_items = model.failed_items
+        for item_id in item_ids:
+            row = model.row_of.get(item_id)
+            if row is None: continue
+            action = model.actions[row]
+            tags = (action,) if action else ()
+            if item_id in failed_items: tags += ('failed',)
+            try:
+                tree.item(item_id, values=(action_texts[action],) + tuple(model.values[row][1:]), tags=tags)
+            except tk.TclError:
+                pass # Item not displayed (e.g. population aborted)
 
-        keep_text = self._("tree_action_keep", default="Keep")
-        delete_text = self._("tree_action_delete", default="Delete")
+    def _queue_tree_render(self, item_ids):
+        """
+        Queues rows for re-rendering and drains the queue in time-sliced batches via after(),
+        so large rule changes never block the main loop in one long Tk update.
+        """
+        pending = self._pending_render
+        for item_id in item_ids:
+            pending[item_id] = None
+        if pending and self._render_job is None:
+            self._render_job = self.master.after(0, self._render_pending_batch)
+
+    def _render_pending_batch(self):
+        """ Renders queued rows until the time slice is used up, then reschedules itself. """
+        self._render_job = None
+        pending = self._pending_render
+        action_texts = self._action_display_texts()
+        deadline = time.perf_counter() + POPULATE_SLICE_SECONDS
+        while pending and time.perf_counter() < deadline:
+            batch = list(itertools.islice(pending, RENDER_BATCH_SIZE))
+            for item_id in batch:
+                del pending[item_id]
+            self._render_tree_rows(batch, action_texts)
+        if pending:
+            self._render_job = self.master.after(POPULATE_RESCHEDULE_MS, self._render_pending_batch)
+
+    def _cancel_pending_render(self):
+        """ Drops queued row renders (used when the tree is cleared or repopulated). """
+        self._pending_render.clear()
+        if self._render_job is not None:
+            try: self.master.after_cancel(self._render_job)
+            except tk.TclError: pass
+            self._render_job = None
 
+    def _update_treeview_tags_from_action(self):
+        """ Re-renders Action text and tags for every row from the model (e.g. after a language change). """
         try:
-            for item_id in tree.get_children(''):
-                if not tree.exists(item_id): continue
-                action_text = tree.set(item_id, "action")
-                if action_text == keep_text:
-                    tree.item(item_id, tags=('keep',))
-                elif action_text == delete_text:
-                    tree.item(item_id, tags=('delete',))
-                else:
-                    tree.item(item_id, tags=())
-        except tk.TclError as e:
-            self.log_message(f"Error updating tree tags: {e}")
+            self._render_tree_rows(self.results_model.item_ids)
         except Exception as e:
             self.log_message(f"Unexpected error updating tree tags: {e}")
 
 
     def _on_tree_click(self, event):
-        """ Handles clicks on the treeview, specifically toggling Keep/Delete in the Action column. """
+        """
+        Handles clicks on the treeview, specifically toggling Keep/Delete in the Action column.
+        Siblings are found through the model's set-membership index, so a click only touches
+        the rows of the clicked file's own set.
+        """
         tree = self.widgets.get("treeview")
         if not tree or not tree.winfo_exists(): return
 
@@ -2510,83 +5838,134 @@ class DuplicateFinderApp:
         if col_id != "#1" or not item_id:
             return
 
+        self._toggle_item_action(item_id)
+
+    def _on_tree_right_click(self, event):
+        """ Shows the bulk-marking context menu for the row under the pointer. """
+        tree = self.widgets.get("treeview")
+        if not tree or not tree.winfo_exists(): return
+        item_id = tree.identify_row(event.y)
+        if not item_id or self._ui_mode != 'normal' or self.results_model.set_of(item_id) is None:
+            return
+        try:
+            # Right-clicking outside the current selection selects just that row (like file managers)
+            if item_id not in tree.selection():
+                tree.selection_set(item_id)
+            menu = self._build_tree_context_menu(tree, item_id)
+        except tk.TclError as e:
+            self.log_message(f"Error showing results context menu: {e}")
+            return
+        try:
+            menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            menu.grab_release()
+
+    def _build_tree_context_menu(self, tree, item_id):
+        """ Builds the right-click menu: folder cascades for every ancestor folder, plus rule-on-selection. """
+        model = self.results_model
+        menu = Menu(tree, tearoff=0)
+        # Ancestor folders, deepest first: /a/b/c/file.mkv -> /a/b/c, /a/b, /a
+        folders = []
+        folder = item_id.rpartition("/")[0]
+        while folder:
+            folders.append(folder)
+            folder = folder.rpartition("/")[0]
+
+        for action, label_key in ((ACTION_DELETE, "ctx_mark_folder_delete"), (ACTION_KEEP, "ctx_mark_folder_keep")):
+            submenu = Menu(menu, tearoff=0)
+            for folder in folders:
+                count = len(model.items_under_folder(folder))
+                submenu.add_command(label=self._("ctx_folder_entry", folder=folder, count=count, default=f"{folder}  ({count} files)"),
+                                    command=lambda f=folder, a=action: self._mark_folder(f, a))
+            menu.add_cascade(label=self._(label_key), menu=submenu, state=tk.NORMAL if folders else tk.DISABLED)
+
+        menu.add_separator()
+        selected_sets = {model.set_of(selected_id) for selected_id in tree.selection()} - {None}
+        menu.add_command(label=self._("ctx_apply_rule_selected", count=len(selected_sets), default=f"Apply Current Rule to Selected Sets ({len(selected_sets)})"),
+                         command=self._apply_rule_to_selected_sets,
+                         state=tk.NORMAL if selected_sets and self.deletion_rule_var.get() else tk.DISABLED)
+        return menu
+
+    def _mark_folder(self, folder, action):
+        """ Marks every file under `folder` with `action` in one batch, keeping one Keep per set. """
+        model = self.results_model
+        targets = model.items_under_folder(folder)
+        planned, conflicts = model.plan_bulk_mark(targets, action)
+        changed_items = model.update_actions(planned)
+        self._queue_tree_render(changed_items)
+
+        action_text = self._action_display_texts()[action]
+        self.log_message(self._("status_folder_marked", count=len(targets), folder=folder, action=action_text, changed=len(changed_items),
+                                default=f"Marked {len(targets)} file(s) under '{folder}' as {action_text}; {len(changed_items)} row(s) changed."))
+        if conflicts:
+            conflict_key = "info_folder_whole_set" if action == ACTION_DELETE else "info_folder_multiple_keep"
+            self.log_message(self._(conflict_key, count=conflicts, folder=folder))
+        self.set_ui_state('normal')
+
+    def _apply_rule_to_selected_sets(self):
+        """ Applies the current rule suggestion only to the sets that have a selected row. """
+        tree = self.widgets.get("treeview")
+        if not tree or not tree.winfo_exists(): return
+        selected_rule = self.deletion_rule_var.get()
+        if not selected_rule:
+            self.log_message(self._("info_select_rule_first", default="Select a suggestion rule first."))
+            return
+        model = self.results_model
+        selected_sets = {model.set_of(item_id) for item_id in tree.selection()} - {None}
+        if not selected_sets: return
+
+        rule_name_display = self._(f"rule_{selected_rule}", default=selected_rule.replace('_', ' ').title())
         try:
-            if not tree.exists(item_id): return # Item might have been deleted
+            files_to_delete_paths_set = self._rule_suggestion(selected_rule, self._current_rule_argument(selected_rule))
+        except ValueError as ve:
+            self.log_message(f"Rule Suggestion Error: {ve}")
+            if self.master.winfo_exists(): messagebox.showerror(self._("error_rule_title", default="Rule Error"), str(ve), master=self.master)
+            return
 
-            current_action = tree.set(item_id, "action")
-            keep_text = self._("tree_action_keep", default="Keep")
-            delete_text = self._("tree_action_delete", default="Delete")
-            clicked_set_id_str = self._get_set_id_for_item(item_id)
+        planned = {item_id: ACTION_DELETE if item_id in files_to_delete_paths_set else ACTION_KEEP
+                   for set_number in selected_sets for item_id in model.members_of_set(set_number)}
+        changed_items = model.update_actions(planned)
+        self._queue_tree_render(changed_items)
+        self.log_message(self._("status_rule_applied_selected", rule_name=rule_name_display, sets=len(selected_sets), changed=len(changed_items),
+                                default=f"Applied '{rule_name_display}' to {len(selected_sets)} selected set(s); {len(changed_items)} row(s) changed."))
+        self.set_ui_state('normal')
 
-            if not clicked_set_id_str:
+    def _toggle_item_action(self, item_id):
+        """ Toggles Keep/Delete for one item while keeping exactly one Keep per set. """
+        if self._ui_mode != 'normal': return # E.g. rows still being added: set_ui_state('normal') would end that mode early
+        model = self.results_model
+        try:
+            set_number = model.set_of(item_id)
+            if set_number is None:
                  self.log_message(f"Warning: Could not determine Set ID for clicked item '{item_id}'. Cannot toggle action.")
                  return
 
-            # --- Find siblings in the same set ---
-            siblings = []
-            current_keep_item = None
-            keep_count_in_set = 0
-            for sibling_id in tree.get_children(''):
-                 if tree.exists(sibling_id):
-                     set_id_val = self._get_set_id_for_item(sibling_id)
-                     if set_id_val == clicked_set_id_str:
-                         siblings.append(sibling_id)
-                         action = tree.set(sibling_id, "action")
-                         if action == keep_text:
-                             keep_count_in_set += 1
-                             # Keep track of the *other* keep item if it exists
-                             if sibling_id != item_id: # Don't count self if it's currently Keep
-                                 current_keep_item = sibling_id
+            current_action = model.get_action(item_id)
+            siblings = model.members_of_set(set_number)
+            other_keep_items = [sibling_id for sibling_id in siblings
+                                if sibling_id != item_id and model.get_action(sibling_id) == ACTION_KEEP]
 
             # --- Logic: Toggle Keep/Delete, ensuring one Keep per set ---
-            new_action = ""
-            new_tag = ()
-            other_action_changed = False # Flag if we changed another item
-
-            if current_action == keep_text:
+            changed_items = [item_id]
+            if current_action == ACTION_KEEP:
                 # Trying to change Keep -> Delete
-                if keep_count_in_set <= 1:
+                if not other_keep_items:
                     # Prevent deleting the last 'Keep' item in the set
                     filename = os.path.basename(item_id)
-                    set_num_match = re.search(r'\d+', clicked_set_id_str)
-                    set_num = set_num_match.group(0) if set_num_match else clicked_set_id_str
-                    log_msg = self._("info_last_keep_in_set", filename=filename, set_id=set_num, default=f"Info: Cannot mark '{filename}' for deletion as it's the only file marked 'Keep' in Set {set_num}.")
+                    log_msg = self._("info_last_keep_in_set", filename=filename, set_id=set_number, default=f"Info: Cannot mark '{filename}' for deletion as it's the only file marked 'Keep' in Set {set_number}.")
                     self.log_message(log_msg)
                     return # Do nothing
-                else:
-                    # Allow change: Keep -> Delete
-                    new_action = delete_text
-                    new_tag = ('delete',)
-            elif current_action == delete_text:
-                # Trying to change Delete -> Keep
-                new_action = keep_text
-                new_tag = ('keep',)
-                # Also change the *other* Keep item in this set to Delete
-                if current_keep_item and tree.exists(current_keep_item):
-                    tree.set(current_keep_item, "action", delete_text)
-                    tree.item(current_keep_item, tags=('delete',))
-                    other_action_changed = True
-            else: # If current action is blank or something else, treat as changing to Keep
-                new_action = keep_text
-                new_tag = ('keep',)
-                # Also change the *other* Keep item in this set to Delete (if one exists)
-                if current_keep_item and tree.exists(current_keep_item):
-                    tree.set(current_keep_item, "action", delete_text)
-                    tree.item(current_keep_item, tags=('delete',))
-                    other_action_changed = True
-
-
-            # Apply the change to the clicked item
-            if new_action:
-                tree.set(item_id, "action", new_action)
-                tree.item(item_id, tags=new_tag)
+                model.set_action(item_id, ACTION_DELETE)
+            else:
+                # Delete (or no suggestion yet) -> Keep; any other Keep in this set becomes Delete
+                model.set_action(item_id, ACTION_KEEP)
+                for other_id in other_keep_items:
+                    model.set_action(other_id, ACTION_DELETE)
+                changed_items.extend(other_keep_items)
 
+            self._render_tree_rows(changed_items)
             # Update the UI state (e.g., enable/disable Delete button)
-            # Needs to run slightly later if another item was also changed
-            if other_action_changed:
-                 self.master.after(10, self.set_ui_state, 'normal')
-            else:
-                 self.set_ui_state('normal')
+            self.set_ui_state('normal')
 
         except tk.TclError as e:
             self.log_message(f"Error handling tree click for item '{item_id}': {e}")
@@ -2595,129 +5974,50 @@ class DuplicateFinderApp:
             self.log_message(traceback.format_exc(limit=2))
 
 
-    def _determine_files_to_delete(self, duplicate_sets, rule, suffix_value):
+    def _determine_files_to_delete(self, duplicate_sets, rule, rule_argument):
         """
         Determines which files to delete based on the selected rule *suggestion* and the
         provided duplicate sets (which should be ALL found duplicates).
-        Handles tie-breaking using shortest path as default. Logs warnings via self.log_message.
+        Built-in rules and custom policies are both evaluated by KeepPolicy; remaining
+        ties keep the shortest path. Tie-breaks and fallbacks are logged once as a summary.
+        `rule_argument` is the suffix (RULE_KEEP_SUFFIX) or policy text (RULE_KEEP_CUSTOM).
         Returns: list: A list of full file paths (str) suggested for deletion.
-        Raises: ValueError: If rule is invalid or suffix is missing when required.
+        Raises: ValueError: If rule is invalid or suffix/policy is missing or malformed.
         """
         # This function operates on the full duplicate_sets
         if not isinstance(duplicate_sets, dict) or not duplicate_sets: return []
         if not rule: raise ValueError(self._("delete_no_rule_selected", default="No deletion rule selected."))
-        if rule == RULE_KEEP_SUFFIX and not suffix_value: raise ValueError(self._("delete_suffix_missing", default="Suffix is required for the 'Keep Suffix' rule suggestion."))
-        valid_rules = {RULE_KEEP_SHORTEST, RULE_KEEP_LONGEST, RULE_KEEP_OLDEST, RULE_KEEP_NEWEST, RULE_KEEP_SUFFIX}
-        if rule not in valid_rules: raise ValueError(f"Internal Error: Unknown deletion rule '{rule}'.")
-
-        files_to_delete = []
-        log_func = self.log_message
-        tie_break_prefix = self._("tie_break_log_prefix", default="Tie-Break:")
-
-        def tie_break_shortest_path(candidates, reason_for_tiebreak):
-             if not candidates: return None
-             if len(candidates) == 1: return candidates[0]
-             # Sort primarily by path length, secondarily by path string itself for stability
-             sorted_candidates = sorted(candidates, key=lambda f: (len(f.get('path', '')), f.get('path', '')))
-             winner = sorted_candidates[0]
-             log_func(self._("warning_tie_break", prefix=tie_break_prefix, reason=reason_for_tiebreak, filename=os.path.basename(winner.get('path','N/A')), detail=f"Shortest path of {len(candidates)}", default=f"{tie_break_prefix} {reason_for_tiebreak}. Kept '{os.path.basename(winner.get('path','N/A'))}' (Shortest path of {len(candidates)})."))
-             return winner
-
-        # Determine the display index for each set ID string for logging consistency with treeview
-        set_id_map = {}
-        current_index = 0
-        # Sort keys to ensure consistent set numbering if sets are re-processed
-        sorted_sha1s_for_index = sorted(duplicate_sets.keys())
-        for sha1 in sorted_sha1s_for_index:
-             # Check length again just in case
-             if len(duplicate_sets[sha1]) > 1:
-                 current_index += 1
-                 set_id_str = self._("tree_set_col_value", index=current_index, default=f"{current_index}")
-                 set_id_map[sha1] = set_id_str
-
-        for sha1, files_in_set in duplicate_sets.items():
-            if not isinstance(files_in_set, list) or len(files_in_set) < 2: continue
-            keep_file_info = None
-            # Use the pre-calculated display index for logging consistency
-            set_id_for_log = set_id_map.get(sha1, f"SHA1: {sha1[:8]}...")
+        if rule == RULE_KEEP_SUFFIX and not rule_argument: raise ValueError(self._("delete_suffix_missing", default="Suffix is required for the 'Keep Suffix' rule suggestion."))
+        if rule == RULE_KEEP_CUSTOM and not rule_argument: raise ValueError(self._("delete_policy_missing", default="A keep policy is required for the custom rule."))
 
+        if rule == RULE_KEEP_CUSTOM:
             try:
-                candidates = []
-                reason_for_tiebreak = ""
-
-                # --- Apply Rule Logic to find candidate(s) to keep ---
-                if rule == RULE_KEEP_SHORTEST:
-                    valid_files = [f for f in files_in_set if f.get('path') is not None]
-                    if not valid_files: continue
-                    min_len = min(len(f.get('path', '')) for f in valid_files)
-                    candidates = [f for f in valid_files if len(f.get('path', '')) == min_len]
-                    reason_for_tiebreak = f"Multiple files have min path length ({min_len})"
-                elif rule == RULE_KEEP_LONGEST:
-                    valid_files = [f for f in files_in_set if f.get('path') is not None]
-                    if not valid_files: continue
-                    max_len = max(len(f.get('path', '')) for f in valid_files)
-                    candidates = [f for f in valid_files if len(f.get('path', '')) == max_len]
-                    reason_for_tiebreak = f"Multiple files have max path length ({max_len})"
-                elif rule == RULE_KEEP_OLDEST:
-                    valid_files = [f for f in files_in_set if isinstance(f.get('modified'), datetime)]
-                    if not valid_files:
-                        log_func(self._("warning_rule_no_date", set_id=set_id_for_log, rule=rule, default=f"Warning: {set_id_for_log} - Cannot apply suggestion '{rule}': No valid dates. Defaulting to shortest path."))
-                        candidates = list(files_in_set) # Fallback to all files for tie-break
-                        reason_for_tiebreak = "No valid dates found"
-                    else:
-                        min_date = min(f['modified'] for f in valid_files)
-                        candidates = [f for f in valid_files if f['modified'] == min_date]
-                        reason_for_tiebreak = f"Multiple files have oldest date ({min_date.strftime(DATE_FORMAT)})"
-                elif rule == RULE_KEEP_NEWEST:
-                    valid_files = [f for f in files_in_set if isinstance(f.get('modified'), datetime)]
-                    if not valid_files:
-                        log_func(self._("warning_rule_no_date", set_id=set_id_for_log, rule=rule, default=f"Warning: {set_id_for_log} - Cannot apply suggestion '{rule}': No valid dates. Defaulting to shortest path."))
-                        candidates = list(files_in_set) # Fallback to all files for tie-break
-                        reason_for_tiebreak = "No valid dates found"
-                    else:
-                        max_date = max(f['modified'] for f in valid_files)
-                        candidates = [f for f in valid_files if f['modified'] == max_date]
-                        reason_for_tiebreak = f"Multiple files have newest date ({max_date.strftime(DATE_FORMAT)})"
-                elif rule == RULE_KEEP_SUFFIX:
-                    suffix_lower = suffix_value.lower()
-                    candidates = [f for f in files_in_set if f.get('path', '').lower().endswith(suffix_lower)]
-                    if not candidates:
-                         log_func(self._("warning_rule_no_suffix_match", set_id=set_id_for_log, suffix=suffix_value, default=f"Warning: {set_id_for_log} - No files match suffix '{suffix_value}'. Defaulting to shortest path."))
-                         candidates = list(files_in_set) # Fallback to all files for tie-break
-                         reason_for_tiebreak = f"No files match suffix '{suffix_value}'"
-                    else:
-                         reason_for_tiebreak = f"Multiple files match suffix '{suffix_value}'"
-
-                # --- Tie-breaking or selecting the single candidate ---
-                if len(candidates) > 1 or (not candidates and rule in [RULE_KEEP_OLDEST, RULE_KEEP_NEWEST, RULE_KEEP_SUFFIX]):
-                    # If rule failed to find *any* candidate (e.g., no dates, no suffix match),
-                    # candidates might be empty, so use original files_in_set for tie-break.
-                    effective_candidates = candidates if candidates else list(files_in_set)
-                    if not effective_candidates: continue # Skip if set was somehow empty
-                    full_reason = f"{set_id_for_log} - {reason_for_tiebreak}"
-                    keep_file_info = tie_break_shortest_path(effective_candidates, full_reason)
-                elif len(candidates) == 1:
-                     keep_file_info = candidates[0]
-                else: # Should only happen if valid_files was empty initially (e.g., no paths)
-                     keep_file_info = None
-
-                # --- Add files *not* kept to the delete list ---
-                if keep_file_info and keep_file_info.get('path'):
-                    keep_path = keep_file_info['path']
-                    for f_info in files_in_set:
-                        path = f_info.get('path')
-                        if path and path != keep_path:
-                            files_to_delete.append(path)
-                else:
-                     # This case should be rare now due to fallbacks, but log if it happens
-                     log_func(self._("warning_rule_failed_selection", set_id=set_id_for_log, rule=rule, default=f"Internal Warning: {set_id_for_log} - Rule '{rule}' failed to select file to keep. Skipping suggestion for this set."))
-
-            except Exception as e:
-                 log_func(self._("error_rule_application", set_id=set_id_for_log, rule=rule, error=e, default=f"Error applying suggestion rule '{rule}' to {set_id_for_log}: {e}. Skipping suggestion for this set."))
-                 log_func(traceback.format_exc(limit=2))
+                policy = KeepPolicy.parse(rule_argument)
+            except ValueError as e:
+                raise ValueError(self._("error_policy_invalid", error=e, default=f"Invalid keep policy: {e}")) from e
+        else:
+            policy = KeepPolicy.for_rule(rule, rule_argument)
 
+        files_to_delete, summary_counts = policy.select(duplicate_sets)
+        self._log_rule_summary(rule, rule_argument, summary_counts)
         return files_to_delete
 
+    def _log_rule_summary(self, rule, rule_argument, summary_counts):
+        """ Logs one line per tie-break/fallback category instead of one line per set. """
+        for stat_key, count in summary_counts.items():
+            if not stat_key.startswith("miss:"): continue
+            criterion = stat_key[len("miss:"):]
+            if rule == RULE_KEEP_CUSTOM:
+                self.log_message(self._("summary_policy_miss", count=count, criterion=criterion, default=f"Note: {count} set(s) had no file satisfying '{criterion}'; later criteria decided."))
+            elif criterion == "suffix":
+                self.log_message(self._("summary_rule_no_suffix_match", count=count, suffix=rule_argument, default=f"Warning: {count} set(s) have no file matching suffix '{rule_argument}'. Defaulted to shortest path."))
+            else:
+                self.log_message(self._("summary_rule_no_date", count=count, rule=rule, default=f"Warning: {count} set(s) have no valid dates for rule '{rule}'. Defaulted to shortest path."))
+        if summary_counts.get('tie'):
+            count = summary_counts['tie']
+            prefix = self._("tie_break_log_prefix", default="Tie-Break:")
+            self.log_message(self._("summary_tie_break", prefix=prefix, count=count, default=f"{prefix} {count} set(s) had several equally ranked files; kept the shortest path in each."))
+
     # <<< NEW: Dialog for selecting file types before deletion >>>
     def _prompt_delete_types(self, initial_delete_list):
         """
@@ -2842,27 +6142,38 @@ class DuplicateFinderApp:
         return result["selected_types"] # Return the set of selected extensions or None
 
 
-    def start_delete_selected_thread(self):
-        """ Handles 'Delete Marked Files' click. Validates, confirms, prompts for types, starts worker thread. """
+    def start_quarantine_selected_thread(self):
+        """ Handles 'Move Marked to Quarantine': same flow as deletion, but files are moved, not removed. """
+        quarantine_path = self.string_vars["quarantine_path"].get().strip()
+        if not quarantine_path:
+            self.log_message(self._("quarantine_missing_path", default="Set a quarantine folder first."))
+            return
+        if self.finder and self.finder.fs and not self._check_quarantine_path(quarantine_path):
+            return
+        self.start_delete_selected_thread(REMOVAL_QUARANTINE)
+
+    def _check_quarantine_path(self, quarantine_path):
+        """ Refuses (log + error dialog) a quarantine folder that would put scanned files at risk. Returns True if usable. """
+        path_error = self.finder.quarantine_path_error(quarantine_path)
+        if not path_error:
+            return True
+        self.log_message(path_error)
+        if self.master.winfo_exists(): messagebox.showerror(self._("error_input_title", default="Input Error"), path_error, master=self.master)
+        return False
+
+    def start_delete_selected_thread(self, removal_action=REMOVAL_DELETE):
+        """
+        Handles 'Delete Marked Files' click. Validates, confirms, prompts for types, starts worker thread.
+        With REMOVAL_QUARANTINE the files are moved into the quarantine folder instead.
+        """
+        quarantine_path = self.string_vars["quarantine_path"].get().strip() if removal_action == REMOVAL_QUARANTINE else None
         tree = self.widgets.get("treeview")
         if not tree or not tree.winfo_exists():
             self.log_message("Error: Cannot delete, results list is not available.")
             return
 
-        # Collect files to delete directly from treeview
-        initial_delete_list = []
-        delete_text = self._("tree_action_delete", default="Delete")
-        try:
-            for item_id in tree.get_children(''):
-                if tree.exists(item_id) and tree.set(item_id, "action") == delete_text:
-                    # item_id is the file path
-                    initial_delete_list.append(item_id)
-        except tk.TclError as e:
-            self.log_message(f"Error reading items to delete from list: {e}")
-            return
-        except Exception as e:
-             self.log_message(f"Unexpected error collecting items for deletion: {e}")
-             return
+        # Collect files marked Delete from the results model (item IDs are file paths)
+        initial_delete_list = self.results_model.items_with_action(ACTION_DELETE)
 
         if not initial_delete_list:
              if self.master.winfo_exists():
@@ -2874,13 +6185,18 @@ class DuplicateFinderApp:
              return
 
         num_files_to_delete = len(initial_delete_list)
-        confirm_msg_template = self._("delete_confirm_msg", default="Permanently delete all files marked 'Delete' in the list?\nTHIS ACTION CANNOT BE UNDONE.")
+        if removal_action == REMOVAL_QUARANTINE:
+            confirm_msg_template = self._("quarantine_confirm_msg", path=quarantine_path, default=f"Move all files marked 'Delete' into the quarantine folder '{quarantine_path}'?")
+            confirm_title = self._("quarantine_confirm_title", default="Confirm Quarantine")
+        else:
+            confirm_msg_template = self._("delete_confirm_msg", default="Permanently delete all files marked 'Delete' in the list?\nTHIS ACTION CANNOT BE UNDONE.")
+            confirm_title = self._("delete_confirm_title", default="Confirm Deletion")
         confirm_msg = f"{confirm_msg_template}\n\n({num_files_to_delete} files marked 'Delete' found)"
 
         confirm = False
         if self.master.winfo_exists():
             confirm = messagebox.askyesno(
-                title=self._("delete_confirm_title", default="Confirm Deletion"),
+                title=confirm_title,
                 message=confirm_msg,
                 icon='warning',
                 default='no',
@@ -2936,35 +6252,156 @@ class DuplicateFinderApp:
         # confirm_final = messagebox.askyesno(...)
         # if not confirm_final: return
 
-        self.log_message(self._("delete_starting_selected", default="Starting deletion of manually marked files..."))
-        self.set_ui_state("deleting")
+        if removal_action == REMOVAL_QUARANTINE:
+            self.log_message(self._("quarantine_starting", path=quarantine_path, default=f"Starting to move marked files into quarantine '{quarantine_path}'..."))
+        else:
+            self.log_message(self._("delete_starting_selected", default="Starting deletion of manually marked files..."))
+
+        # Sizes let the finder delete the largest files first
+        file_sizes = {path: self.treeview_item_map.get(path, {}).get('size', 0) for path in final_files_to_delete}
+
+        # Write the plan to disk before anything is deleted so an interrupted run can be resumed
+        try:
+            journal = DeletionJournal.create(DELETION_JOURNAL_DIR, self._build_deletion_plan(final_files_to_delete, file_sizes),
+                                             action=removal_action, target=quarantine_path)
+        except OSError as e:
+            error_msg = self._("error_journal_write", error=e, default=f"Could not write the deletion plan file: {e}\nDeletion cancelled.")
+            self.log_message(error_msg)
+            if self.master.winfo_exists(): messagebox.showerror(self._("error_title", default="Error"), error_msg, master=self.master)
+            self.set_ui_state('normal')
+            return
+        self.log_message(self._("status_journal_created", file=os.path.basename(journal.path), sets=len(journal.sets), count=count_final,
+                                default=f"Deletion plan written to {os.path.basename(journal.path)} ({len(journal.sets)} sets, {count_final} files)."))
 
         # Pass the FINAL filtered list
-        thread = threading.Thread(target=self._delete_worker, args=(final_files_to_delete,), daemon=True)
+        self._start_delete_thread(final_files_to_delete, file_sizes, journal)
+
+    def _build_deletion_plan(self, files_to_delete, file_sizes):
+        """ Groups the files to delete by duplicate set, recording each set's kept file(s) for the journal. """
+        model = self.results_model
+        delete_by_set = {}
+        for path in files_to_delete:
+            delete_by_set.setdefault(model.set_of(path), []).append(path)
+        plan_sets = []
+        for set_number, delete_paths in delete_by_set.items():
+            members = model.members_of_set(set_number)
+            keep_paths = [member for member in members if model.get_action(member) == ACTION_KEEP]
+            sizes = {path: file_sizes.get(path, 0) for path in delete_paths}
+            # Kept files' scanned sizes let the pre-removal check confirm they are unchanged
+            sizes.update((path, model.file_infos[model.row_of[path]].get('size')) for path in keep_paths)
+            # Scanned hashes per file: copies linked through different hash kinds are verified by their own
+            hashes = {path: model.file_infos[model.row_of[path]].get('hashes') for path in itertools.chain(keep_paths, delete_paths)}
+            plan_sets.append({
+                "sha1": model.set_keys[model.row_of[members[0]]] if members else None,
+                "keep": keep_paths,
+                "delete": delete_paths,
+                "sizes": sizes,
+                "hashes": {path: file_hashes for path, file_hashes in hashes.items() if file_hashes},
+            })
+        return plan_sets
+
+    def _start_delete_thread(self, files_to_delete, file_sizes, journal):
+        """ Switches the UI to 'deleting' and runs _delete_worker in a background thread. """
+        self._delete_stop_event.clear()
+        self.set_ui_state("deleting")
+        self._show_progress(self._("status_delete_progress_short", done=0, total=len(files_to_delete), default=f"Deleting 0/{len(files_to_delete)}"),
+                            0, len(files_to_delete), abort_text_key="abort_delete_button")
+        thread = threading.Thread(target=self._delete_worker, args=(files_to_delete, file_sizes, journal), daemon=True)
         thread.start()
 
+    def _refresh_resumable_journal(self):
+        """ Looks for the newest unfinished deletion plan (enables 'Resume Deletion'). """
+        self._resumable_journal = DeletionJournal.find_resumable(DELETION_JOURNAL_DIR)
+
+    def start_resume_deletion(self):
+        """ Handles 'Resume Deletion': continues (or discards) the newest unfinished deletion plan. """
+        self._refresh_resumable_journal()
+        journal = self._resumable_journal
+        if journal is None:
+            self.log_message(self._("resume_no_journal", default="No unfinished deletion plan found."))
+            self.set_ui_state('normal')
+            return
+        remaining = journal.remaining_paths()
+        journal_name = os.path.basename(journal.path)
+        answer = None
+        if self.master.winfo_exists():
+            answer = messagebox.askyesnocancel(
+                title=self._("resume_confirm_title", default="Resume Deletion"),
+                message=self._("resume_confirm_msg", created=journal.created, remaining=len(remaining), total=journal.total_count,
+                               default=f"Unfinished deletion plan from {journal.created}: {len(remaining)} of {journal.total_count} files still to delete."),
+                icon='warning', master=self.master)
+        if answer is None:
+            return
+        if answer is False:
+            try:
+                journal.finish("discarded")
+                self.log_message(self._("status_journal_discarded", file=journal_name, default=f"Deletion plan {journal_name} discarded."))
+            except OSError as e:
+                self.log_message(f"Warning: Could not update deletion plan file: {e}")
+            self._refresh_resumable_journal()
+            self.set_ui_state('normal')
+            return
+
+        if not self.finder or not self.finder.fs:
+            self.log_message(self._("error_not_connected", default="Error: Not connected to CloudDrive."))
+            return
+        self.log_message(self._("status_resume_starting", file=journal_name, remaining=len(remaining),
+                                default=f"Resuming deletion plan {journal_name}: {len(remaining)} file(s) remaining."))
+        self._start_delete_thread(remaining, journal.sizes(), journal)
+
 
-    def _delete_worker(self, files_to_delete):
-        """ Worker thread for deleting files based on the provided (filtered) list. """
+    def _delete_worker(self, files_to_delete, file_sizes=None, journal=None):
+        """
+        Worker thread for deleting files based on the provided (filtered) list.
+        Each outcome is appended to `journal` (if given) as soon as the file finishes.
+        """
         if not self.finder or not self.finder.fs:
             self.log_message(self._("error_not_connected", default="Error: Connection lost before Deletion."))
-            if self.master.winfo_exists(): self.master.after(0, self.set_ui_state, 'normal')
+            if journal: journal.close()
+            if self.master.winfo_exists(): self.master.after(0, self._finish_deletion_ui)
             return
 
+        total_files = len(files_to_delete)
+        progress = {"done": 0, "next_update": 0.0}
+        removed_paths, failed_paths = [], []
+        def on_file_done(path, error):
+            if journal: journal.record(path, error)
+            (failed_paths if error else removed_paths).append(path)
+            progress["done"] += 1
+            now = time.time()
+            if now >= progress["next_update"] or progress["done"] == total_files:
+                progress["next_update"] = now + 0.25 # Throttle GUI updates
+                done = progress["done"]
+                if self.master.winfo_exists():
+                    self.master.after(0, lambda d=done: self._show_progress(
+                        self._("status_delete_progress_short", done=d, total=total_files, default=f"Deleting {d}/{total_files}"),
+                        d, total_files, abort_text_key="abort_delete_button"))
+
         deleted_count = 0
         total_attempted = len(files_to_delete)
         deletion_error_occurred = False
-        should_clear_results = False
 
         try:
+            if journal and files_to_delete:
+                # The scan may be hours old: re-check the plan's sets before touching anything
+                rejected = self.finder.verify_plan(journal.sets, only_paths=files_to_delete)
+                for path, reason in rejected.items():
+                    journal.skip(path, reason)
+                    failed_paths.append(path)
+                if rejected:
+                    files_to_delete = [path for path in files_to_delete if path not in rejected]
+                    progress["done"] += len(rejected) # Skipped files count as processed
             if not files_to_delete:
                 self.log_message(self._("delete_no_files_marked", default="No files to delete.") + " (Worker check)")
             else:
                 # Delete the files passed (which are already filtered by type)
-                deleted_count, total_attempted = self.finder.delete_files(files_to_delete)
+                if journal and journal.action == REMOVAL_QUARANTINE:
+                    deleted_count, total_attempted = self.finder.quarantine_files(files_to_delete, journal.target, file_sizes=file_sizes,
+                                                                                  result_callback=on_file_done, stop_event=self._delete_stop_event)
+                else:
+                    deleted_count, total_attempted = self.finder.delete_files(files_to_delete, file_sizes=file_sizes, result_callback=on_file_done,
+                                                                              stop_event=self._delete_stop_event)
                 if deleted_count < total_attempted: deletion_error_occurred = True
-            # Clear results only if deletion was attempted and potentially successful
-            if total_attempted > 0: should_clear_results = True
 
         except Exception as e:
             deletion_error_occurred = True
@@ -2974,24 +6411,103 @@ class DuplicateFinderApp:
             if self.master.winfo_exists():
                 error_title = self._("error_title", default="Deletion Error")
                 self.master.after(10, lambda et=error_title, em=err_msg: messagebox.showerror(et, em, master=self.master))
-            # Don't clear results if a major error occurred during the process
-            should_clear_results = False
         finally:
+            if journal:
+                try:
+                    if not journal.remaining_paths():
+                        journal.finish("complete")
+                        self.log_message(self._("status_journal_complete", file=os.path.basename(journal.path), default=f"Deletion plan {os.path.basename(journal.path)} completed."))
+                    else:
+                        journal.close() # Unfinished: stays resumable
+                except OSError as e:
+                    self.log_message(f"Warning: Could not finalize deletion plan file: {e}")
             if self.master.winfo_exists():
-                if should_clear_results:
-                     # Use after() to ensure GUI updates happen in the main thread
-                    self.master.after(10, self.clear_results) # Clear data and UI elements
-                    self.master.after(20, lambda: self.log_message(self._("delete_results_cleared", default="Deletion finished. Results cleared."))) # Log after clearing
-                    # Set UI state back to normal *after* clearing is scheduled
-                    self.master.after(30, self.set_ui_state, 'normal')
-                else:
-                    # If deletion wasn't attempted or failed badly, just reset UI state
-                    self.master.after(0, self.set_ui_state, 'normal')
+                # Whatever finished (even before an unexpected error) is reflected in the results list
+                if removed_paths or failed_paths:
+                    self.master.after(0, self._apply_removal_results, removed_paths, failed_paths)
+                self.master.after(0, self._finish_deletion_ui)
+
+    def _apply_removal_results(self, removed_paths, failed_paths):
+        """
+        Updates results in place after a deletion/quarantine run (main thread): removed files leave
+        the model, duplicate_sets and the tree; sets left with a single file are dropped; failed
+        files stay listed and highlighted. The selected rule and remaining marks are kept.
+        """
+        model = self.results_model
+        removed_by_set = model.set_keys_of(removed_paths)
+        removed_count = sum(len(paths) for paths in removed_by_set.values())
+        model.remove_items(removed_paths)
+
+        # Sets with a single surviving file are no longer duplicates
+        singletons = model.singleton_items()
+        dropped_by_set = model.set_keys_of(singletons)
+        model.remove_items(singletons)
+
+        for sha1 in set(removed_by_set) | set(dropped_by_set):
+            gone = set(removed_by_set.get(sha1, ())) | set(dropped_by_set.get(sha1, ()))
+            remaining = [info for info in self.duplicate_sets.get(sha1, []) if info.get('path') not in gone]
+            if len(remaining) > 1:
+                self.duplicate_sets[sha1] = remaining
+            else:
+                self.duplicate_sets.pop(sha1, None)
+        for item_id in itertools.chain(removed_paths, singletons):
+            self.treeview_item_map.pop(item_id, None)
+
+        tree = self.widgets.get("treeview")
+        if tree and tree.winfo_exists():
+            try:
+                gone_items = [item_id for item_id in itertools.chain(removed_paths, singletons) if tree.exists(item_id)]
+                if gone_items: tree.delete(*gone_items)
+            except tk.TclError: pass
+
+        failed_in_model = [path for path in failed_paths if path in model.row_of]
+        model.failed_items.update(failed_in_model)
+        self._queue_tree_render(failed_in_model)
+        self._invalidate_rule_cache()
+        self.log_message(self._("delete_results_updated", removed=removed_count, sets=len(dropped_by_set), failed=len(failed_in_model),
+                                default=f"Results updated: removed {removed_count} file(s); {len(dropped_by_set)} set(s) no longer have duplicates. {len(failed_in_model)} failed file(s) remain highlighted."))
+
+    def start_purge_quarantine_thread(self):
+        """ Handles 'Purge Quarantine': confirms, then removes the whole quarantine folder in a background thread. """
+        quarantine_path = self.string_vars["quarantine_path"].get().strip()
+        if not quarantine_path:
+            self.log_message(self._("quarantine_missing_path", default="Set a quarantine folder first."))
+            return
+        if not self.finder or not self.finder.fs:
+            self.log_message(self._("error_not_connected", default="Error: Not connected to CloudDrive."))
+            return
+        if not self._check_quarantine_path(quarantine_path):
+            return
+        confirm = False
+        if self.master.winfo_exists():
+            confirm = messagebox.askyesno(
+                title=self._("purge_confirm_title", default="Purge Quarantine"),
+                message=self._("purge_confirm_msg", path=quarantine_path, default=f"Permanently delete the quarantine folder '{quarantine_path}' and everything in it?"),
+                icon='warning', default='no', master=self.master)
+        if not confirm:
+            return
+        self.set_ui_state("deleting")
+        thread = threading.Thread(target=self._purge_quarantine_worker, args=(quarantine_path,), daemon=True)
+        thread.start()
+
+    def _purge_quarantine_worker(self, quarantine_path):
+        """ Worker thread for purging the quarantine folder. """
+        try:
+            self.finder.purge_quarantine(quarantine_path)
+        finally:
+            if self.master.winfo_exists():
+                self.master.after(0, self.set_ui_state, 'normal')
+
+    def _finish_deletion_ui(self):
+        """ Main-thread cleanup after a deletion run: hides progress and re-checks for resumable plans. """
+        self._hide_progress()
+        self._refresh_resumable_journal()
+        self.set_ui_state('normal')
 
 
     # --- Methods related to Report Saving and Charting ---
     def save_duplicates_report(self):
-        """ Saves the report of FOUND duplicate file sets (as displayed) to a text file. """
+        """ Saves the report of FOUND duplicate file sets (as displayed) as text, CSV or JSON Lines (optionally gzipped) in the background. """
         # self.duplicate_sets contains ALL displayed duplicates now
         if not self.duplicate_sets:
             if self.master.winfo_exists(): messagebox.showinfo(self._("save_list_button", default="Save Report"), self._("save_report_no_data", default="No duplicates to save."), master=self.master)
@@ -3003,7 +6519,9 @@ class DuplicateFinderApp:
         file_path = None
         try:
             file_path = filedialog.asksaveasfilename(
-                defaultextension=".txt", filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+                defaultextension=".txt",
+                filetypes=[("Text files", "*.txt"), ("CSV files", "*.csv"), ("JSON Lines", "*.jsonl"),
+                           ("Compressed (gzip)", "*.txt.gz *.csv.gz *.jsonl.gz"), ("All files", "*.*")],
                 title=self._("save_list_button", default="Save Duplicates Report As..."),
                 initialfile=initial_filename, parent=self.master
             )
@@ -3013,16 +6531,130 @@ class DuplicateFinderApp:
             return
 
         if file_path:
-            # Pass the currently displayed sets to the writer function
-            success = self.finder.write_duplicates_report(self.duplicate_sets, file_path)
-            if success and self.master.winfo_exists():
-                messagebox.showinfo(
-                    self._("save_list_button", default="Report Saved"),
-                    self._("save_report_saved", file=os.path.basename(file_path), default="Report saved."),
-                    master=self.master)
+            total_sets = len(self.duplicate_sets)
+            self.log_message(self._("save_report_starting", count=total_sets, file=os.path.basename(file_path),
+                                    default=f"Exporting {total_sets} duplicate sets to {os.path.basename(file_path)}..."))
+            self._export_stop_event.clear()
+            self.set_ui_state("exporting")
+            self._show_progress(self._("save_report_progress", done=0, total=total_sets, default=f"Exporting 0/{total_sets} sets"),
+                                0, total_sets, abort_text_key="abort_export_button")
+            # Pass a snapshot of the currently displayed sets; the UI stays locked while exporting
+            thread = threading.Thread(target=self._save_report_worker, args=(dict(self.duplicate_sets), file_path), daemon=True)
+            thread.start()
         else:
             self.log_message("Save report operation cancelled.")
 
+    def _save_report_worker(self, duplicate_sets, file_path):
+        """ Worker thread for exporting the duplicates report. """
+        def on_progress(done, total):
+            if self.master.winfo_exists():
+                self.master.after(0, lambda d=done, t=total: self._show_progress(
+                    self._("save_report_progress", done=d, total=t, default=f"Exporting {d}/{t} sets"), d, t, abort_text_key="abort_export_button"))
+        success = False
+        try:
+            success = self.finder.write_duplicates_report(duplicate_sets, file_path, progress_callback=on_progress,
+                                                          stop_event=self._export_stop_event)
+        finally:
+            if self.master.winfo_exists():
+                self.master.after(0, self._finish_report_export, success, file_path)
+
+    def _finish_report_export(self, success, file_path):
+        """ Main-thread cleanup after a report export. """
+        self._hide_progress()
+        self.set_ui_state('normal')
+        if success and self.master.winfo_exists():
+            messagebox.showinfo(
+                self._("save_list_button", default="Report Saved"),
+                self._("save_report_saved", file=os.path.basename(file_path), default="Report saved."),
+                master=self.master)
+
+    def start_find_similar_thread(self):
+        """ Handles 'Find Similar Videos': searches the last scan's files for near-duplicates in a worker thread. """
+        if self._ui_mode not in ('initial', 'normal'): return
+        if not self.finder.last_inventory:
+            self.log_message(self._("near_dup_no_inventory", default="Run a scan first: similar videos are searched among the files of the last scan."))
+            return
+        previous_mode = self._ui_mode
+        self.set_ui_state("finding")
+        thread = threading.Thread(target=self._find_similar_worker, args=(previous_mode,), daemon=True)
+        thread.start()
+
+    def _find_similar_worker(self, previous_mode):
+        """ Worker thread for the near-duplicate pass; the groups are shown on the main thread. """
+        try:
+            groups = self.finder.find_near_duplicates()
+        except Exception as e:
+            self.log_message(self._("near_dup_error", error=e, default=f"Error while searching for similar videos: {e}"))
+            self.log_message(traceback.format_exc())
+            if self.master.winfo_exists(): self.master.after(0, self.set_ui_state, previous_mode)
+            return
+        if self.master.winfo_exists():
+            self.master.after(0, self._show_similar_results, groups, previous_mode)
+
+    def _clear_similar_results(self):
+        self._similar_generation += 1 # Stops an in-flight chunked fill
+        if self._similar_job is not None:
+            try: self.master.after_cancel(self._similar_job)
+            except tk.TclError: pass
+            self._similar_job = None
+        similar_tree = self.widgets.get("similar_treeview")
+        if similar_tree and similar_tree.winfo_exists():
+            try:
+                if similar_tree.get_children(): similar_tree.delete(*similar_tree.get_children())
+            except tk.TclError: pass
+
+    def _show_similar_results(self, groups, previous_mode):
+        """ Fills the Similar Videos tab (the NEAR_DUP_MAX_DISPLAY_GROUPS largest groups) and switches to it. """
+        if not self.master.winfo_exists(): return
+        self._clear_similar_results()
+        similar_tree = self.widgets.get("similar_treeview")
+        if len(groups) > NEAR_DUP_MAX_DISPLAY_GROUPS:
+            self.log_message(self._("near_dup_display_limit", count=NEAR_DUP_MAX_DISPLAY_GROUPS,
+                                    default=f"Showing the {NEAR_DUP_MAX_DISPLAY_GROUPS} largest groups of similar videos."))
+        if not similar_tree or not similar_tree.winfo_exists() or not groups:
+            self.set_ui_state(previous_mode)
+            return
+        try: self.widgets["results_notebook"].select(self.widgets["similar_frame"])
+        except tk.TclError: pass
+        rows = self._similar_rows(groups[:NEAR_DUP_MAX_DISPLAY_GROUPS])
+        self._insert_similar_chunk(self._similar_generation, rows, previous_mode)
+
+    def _similar_rows(self, groups):
+        """ Yields (values, tags) for every file of the given similar-video groups, in display order. """
+        for group_index, group in enumerate(groups, start=1):
+            percent = round(group['similarity'] * 100)
+            if group['match'] == NEAR_MATCH_NAME:
+                match_text = self._("near_dup_match_name", percent=percent, default=f"Name {percent}%")
+            elif group['match'] == NEAR_MATCH_SIZE:
+                match_text = self._("near_dup_match_size", default="Size")
+            else:
+                match_text = self._("near_dup_match_both", percent=percent, default=f"Name {percent}% + Size")
+            tags = ('group_alt',) if group_index % 2 == 0 else ()
+            for file_info in group['files']:
+                mod_time, size = file_info.get('modified'), file_info.get('size')
+                mod_time_str = mod_time.strftime(DATE_FORMAT) if isinstance(mod_time, datetime) else "N/A"
+                size_mb = size / (1024 * 1024) if isinstance(size, (int, float)) and size > 0 else 0.0
+                yield (group_index, file_info['path'], mod_time_str, f"{size_mb:.2f}", match_text), tags
+
+    def _insert_similar_chunk(self, generation, rows, previous_mode):
+        """ Inserts Similar Videos rows until the time slice is used up, then reschedules itself. """
+        self._similar_job = None
+        if generation != self._similar_generation or not self.master.winfo_exists():
+            return # Cleared meanwhile
+        similar_tree = self.widgets.get("similar_treeview")
+        deadline = time.perf_counter() + POPULATE_SLICE_SECONDS
+        try:
+            if similar_tree and similar_tree.winfo_exists():
+                insert = similar_tree.insert
+                for values, tags in rows:
+                    insert("", tk.END, values=values, tags=tags)
+                    if time.perf_counter() >= deadline:
+                        self._similar_job = self.master.after(POPULATE_RESCHEDULE_MS, self._insert_similar_chunk,
+                                                              generation, rows, previous_mode)
+                        return
+        except tk.TclError: pass
+        self.set_ui_state(previous_mode)
+
     def show_cloud_file_types(self):
         """ Handles 'Show Cloud File Types' click. Validates prerequisites and starts worker thread. """
         if not MATPLOTLIB_AVAILABLE:
@@ -3079,6 +6711,8 @@ class DuplicateFinderApp:
                     self.log_message(f"Chart Scan: Skipping invalid path entry '{raw_scan_path_entry}'.")
                     any_scan_error = True # Treat path calculation error as a scan error for this path
                     continue
+                if self.finder.extra_sources: # Several sources: the paths in the window belong to the main connection
+                    fs_dir_path = self.finder.fs.tag_path(self.finder.source_name, fs_dir_path)
 
                 self.log_message(self._("chart_status_scanning_cloud", path=fs_dir_path, default=f"Scanning '{fs_dir_path}' for file types..."))
                 scan_start_time = time.time()
@@ -3260,6 +6894,16 @@ class DuplicateFinderApp:
 
 # --- Main Execution Block ---
 if __name__ == "__main__":
+    # Headless rule benchmark: python code.py --benchmark-rules 1000000
+    if "--benchmark-rules" in sys.argv:
+        arg_index = sys.argv.index("--benchmark-rules")
+        try:
+            bench_set_count = int(sys.argv[arg_index + 1]) if len(sys.argv) > arg_index + 1 else 100000
+        except ValueError:
+            sys.exit("Usage: --benchmark-rules <number of sets>")
+        benchmark_keep_policies(bench_set_count)
+        sys.exit(0)
+
     try:
         from ctypes import windll
         try: windll.shcore.SetProcessDpiAwareness(1)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+import os
+
+import pytest
+
+pytest.importorskip("clouddrive")
+
+# code.py shares its name with the standard library module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "dedup_app", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code.py"))
+app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app)
+
+SHA1 = "A" * 40
+MD5 = "C" * 32
+
+
+class StoredHashesBackend(app.StorageBackend):
+    """ Serves fixed attributes; the file to delete only has an MD5. """
+
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+    def attr(self, path):
+        return self.attrs[path]
+
+
+def _plan():
+    return [{
+        "sha1": SHA1,
+        "keep": ["/v/keep.mkv"],
+        "delete": ["/v/copy.mkv"],
+        "sizes": {"/v/keep.mkv": 100, "/v/copy.mkv": 100},
+        "hashes": {"/v/keep.mkv": {"2": SHA1, "1": MD5}, "/v/copy.mkv": {"1": MD5}},
+    }]
+
+
+def _finder():
+    finder = app.DuplicateFileFinder()
+    finder.fs = StoredHashesBackend({
+        "/v/keep.mkv": {"size": 100, "fileHashes": {"2": SHA1, "1": MD5}},
+        "/v/copy.mkv": {"size": 100, "fileHashes": {"1": MD5}},
+    })
+    return finder
+
+
+def test_loaded_plan_keeps_per_file_hashes(tmp_path):
+    journal = app.DeletionJournal.create(str(tmp_path), _plan())
+    journal.close()
+    loaded = app.DeletionJournal.load(journal.path)
+    assert loaded.sets == _plan()
+
+
+def test_loaded_plan_verifies_like_the_fresh_plan(tmp_path):
+    finder = _finder()
+    assert finder.verify_plan(_plan()) == {}
+    journal = app.DeletionJournal.create(str(tmp_path), _plan())
+    journal.close()
+    loaded = app.DeletionJournal.load(journal.path)
+    assert finder.verify_plan(loaded.sets, only_paths=loaded.remaining_paths()) == {}
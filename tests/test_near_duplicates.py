@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+import os
+
+import pytest
+
+pytest.importorskip("clouddrive")
+
+# code.py shares its name with the standard library module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "dedup_app", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code.py"))
+app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app)
+
+GiB = 1024 ** 3
+
+RELEASES = [
+    "Inception.2010.1080p.WEB-DL.DDP5.1.H.264-NTb.mkv",
+    "Inception.2010.720p.BluRay.x264-SPARKS.mkv",
+    "Inception.2010.2160p.UHD.BluRay.REMUX.HDR.HEVC.TrueHD.7.1.Atmos-FGT.mkv",
+    "Inception 2010 1080p BluRay DTS-HD.MA.5.1 x264.mkv",
+    "Inception.2010.1080p.BluRay.AAC2.0.x264.mp4",
+]
+
+
+def _inventory(names_and_sizes):
+    return {f"hash{i}": [{"path": "/Movies/" + name, "size": size, "modified": None}]
+            for i, (name, size) in enumerate(names_and_sizes)}
+
+
+@pytest.mark.parametrize("name", RELEASES)
+def test_release_tags_and_channels_are_removed(name):
+    assert app._title_tokens("/Movies/" + name) == frozenset({"inception", "2010"})
+
+
+def test_titles_without_release_tags_keep_their_words():
+    assert app._title_tokens("/Movies/Spider-Man.2002.mkv") == frozenset({"spider", "man", "2002"})
+    assert app._title_tokens("/Movies/Toy.Story.2.1999.mkv") == frozenset({"toy", "story", "2", "1999"})
+
+
+def test_encodes_of_one_release_form_one_group():
+    sizes = [10 * GiB, 5 * GiB, 60 * GiB, 15 * GiB, 4 * GiB]
+    groups = app.find_near_duplicate_groups(_inventory(zip(RELEASES, sizes)))
+    assert len(groups) == 1
+    assert sorted(f["path"] for f in groups[0]["files"]) == sorted("/Movies/" + name for name in RELEASES)
+
+
+def test_different_episodes_are_not_paired():
+    groups = app.find_near_duplicate_groups(_inventory([
+        ("Show.S01E02.1080p.WEB-DL.DD+5.1.H.264-NTb.mkv", 2 * GiB),
+        ("Show.S01E03.1080p.WEB-DL.DD+5.1.H.264-NTb.mkv", 2 * GiB),
+    ]))
+    assert groups == []
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import importlib.util
+import json
+import os
+
+import pytest
+
+pytest.importorskip("clouddrive")
+
+# code.py shares its name with the standard library module, so it is loaded from its path
+_spec = importlib.util.spec_from_file_location(
+    "dedup_app", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code.py"))
+app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(app)
+
+SHA1_A = "A" * 40
+SHA1_B = "B" * 40
+MD5 = "C" * 32
+
+
+def test_files_keep_their_own_hashes(tmp_path):
+    # Two SHA1s and an MD5-only copy, linked through the shared MD5
+    set_key = "MD5:" + MD5
+    groups = {set_key: [
+        {"path": "/v/a.mkv", "size": 5, "modified": None, "hashes": {"2": SHA1_A, "1": MD5}},
+        {"path": "/v/b.mkv", "size": 5, "modified": None, "hashes": {"2": SHA1_B, "1": MD5}},
+        {"path": "/v/c.mkv", "size": 5, "modified": None, "hashes": {"1": MD5}},
+    ]}
+    path = str(tmp_path / "scan.ddsnap")
+    app.ScanSnapshot.write(path, groups)
+    with app.ScanSnapshot.open(path) as snapshot:
+        loaded = snapshot.duplicate_sets()
+    files = {info["path"]: info for info in loaded[set_key]}
+    assert files["/v/a.mkv"]["hashes"] == {"2": SHA1_A, "1": MD5}
+    assert files["/v/b.mkv"]["sha1"] == SHA1_B
+    assert files["/v/c.mkv"]["hashes"] == {"1": MD5}
+    assert files["/v/c.mkv"]["sha1"] is None
+    assert {info["set_key"] for info in loaded[set_key]} == {set_key}
+
+
+def test_version_1_files_fall_back_to_the_set_key(tmp_path):
+    ss = app.ScanSnapshot
+    strings = (SHA1_A + "/v/a.mkv/v/b.mkv").encode("utf-8")
+    sets = ss._SET.pack(0, 40, 0, 2)
+    files = ss._FILE_V1.pack(5, float("nan"), 40, 8) + ss._FILE_V1.pack(5, float("nan"), 48, 8)
+    sets_offset = ss._HEADER.size
+    files_offset = sets_offset + len(sets)
+    strings_offset = files_offset + len(files)
+    header = ss._HEADER.pack(ss.MAGIC, 1, 0, 1, 2, sets_offset, files_offset, strings_offset, strings_offset + len(strings))
+    path = tmp_path / "old.ddsnap"
+    path.write_bytes(header + sets + files + strings + json.dumps({}).encode("utf-8"))
+    with ss.open(str(path)) as snapshot:
+        loaded = snapshot.duplicate_sets()
+    assert [info["path"] for info in loaded[SHA1_A]] == ["/v/a.mkv", "/v/b.mkv"]
+    assert all(info["hashes"] == {"2": SHA1_A} for info in loaded[SHA1_A])